@@ -0,0 +1,44 @@
+"""
+SQLite backend for concurrent writers.
+
+Adds two `OPTIONS` keys to Django's SQLite backend:
+
+- `pragmas`: `PRAGMA name = value` statements run on every new connection.
+- `transaction_mode`: how `transaction.atomic()` begins, e.g. `"IMMEDIATE"` to take
+  the write lock up front instead of upgrading a read lock mid-transaction, which
+  fails with "database is locked" without waiting for the busy timeout. Django 5.1
+  supports the same option natively.
+"""
+from django.db.backends.signals import connection_created
+from django.db.backends.sqlite3 import base
+from django.dispatch import receiver
+
+
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pragmas", None)
+        mode = params.pop("transaction_mode", None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ValueError(f"transaction_mode must be one of {TRANSACTION_MODES}, not {mode!r}.")
+        self.transaction_mode = mode.upper() if mode else None
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    pragmas = connection.settings_dict.get("OPTIONS", {}).get("pragmas", {})
+    if connection.vendor != "sqlite" or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
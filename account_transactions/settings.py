@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost, so it times the whole request
+    'accounts.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,13 +79,68 @@ WSGI_APPLICATION = 'account_transactions.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Selected with the DATABASE_PROFILE environment variable.
+SQLITE_PROFILES = {
+    # Django's stock SQLite setup: rollback journal, new connection per request
+    'default': {},
+    # for concurrent writers on one host (see account_transactions/backends/sqlite3)
+    'production': {
+        'ENGINE': 'account_transactions.backends.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                # readers no longer block the writer, and vice versa
+                'journal_mode': 'WAL',
+                # durable at checkpoints instead of every commit; safe from corruption in WAL mode
+                'synchronous': 'NORMAL',
+                # milliseconds a writer waits for the lock before "database is locked"
+                'busy_timeout': 20_000,
+                'mmap_size': 256 * 1024 * 1024,
+                # negative: KiB of page cache per connection
+                'cache_size': -64_000,
+                'temp_store': 'MEMORY',
+            },
+        },
+    },
+}
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'default')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        **SQLITE_PROFILES[DATABASE_PROFILE],
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Cached accounts are expired by whichever process writes them, including management
+# commands and background import jobs, so the cache must be shared by all of them.
+# Files are shared on one host; use e.g. Redis when workers run on several hosts.
+# A per-process cache (LocMemCache) serves stale accounts for up to ACCOUNT_CACHE["timeout"].
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            # a third of the entries is evicted past this size
+            'MAX_ENTRIES': 10_000,
+        },
     }
 }
 
+ACCOUNT_CACHE = {
+    "alias": "default",
+    "timeout": 300,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -131,7 +189,92 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 5,
 }
 
+PAGINATION = {
+    "max_page_size": 1000,
+}
+
+
+ROLLUPS = {
+    "rebuild_batch_size": 5000,
+    # rollup rows locked per query
+    "write_batch_size": 1000,
+    # rows each day's (and account day's) volume is spread over, so concurrent transfers
+    # rarely lock the same one
+    "slots": 8,
+    "top_accounts": 10,
+}
+
+ADMIN_PAGINATION = {
+    # filtered admin lists stop counting here
+    "count_limit": 10_000,
+}
 
 UPLOADED_FILES = {
-    "supported_formats": ["csv", "json"],
-}
\ No newline at end of file
+    "supported_formats": ["csv", "json", "ndjson", "xlsx", "ods"],
+    "batch_size": 5000,
+    "read_chunk_size": 64 * 1024,
+    # invalid rows listed in an import's response; all of them are counted
+    "max_reported_errors": 1000,
+    # background import jobs
+    "jobs_dir": BASE_DIR / "import_jobs",
+    "job_workers": 1,
+    "job_parse_processes": 2,
+    "job_chunk_size": 4 * 1024 * 1024,
+    # seconds without progress after which recover_import_jobs takes a running job for dead
+    "job_stale_after": 15 * 60,
+}
+
+
+METRICS = {
+    # directory shared by all worker processes; None keeps metrics per process
+    "dir": os.environ.get("METRICS_DIR"),
+    # seconds between writes of a process's metrics to the directory
+    "flush_interval": 5,
+}
+
+
+EXPORTS = {
+    # rows fetched from the database and written to the response at a time
+    "chunk_size": 2000,
+}
+
+
+IDEMPOTENCY = {
+    # seconds a stored response can be replayed for
+    "ttl": 24 * 60 * 60,
+    "purge_batch_size": 1000,
+}
+
+
+RECONCILIATION = {
+    "batch_size": 5000,
+    # drifted accounts listed in a report; all of them are counted and repaired
+    "report_limit": 1000,
+    # transactions younger than this are left to the next run, in case older ones haven't committed yet
+    "settle_seconds": 60,
+}
+
+
+ARCHIVE = {
+    # transactions older than this many days are moved to the archive tables
+    "horizon_days": 365,
+    # transactions moved per database transaction
+    "batch_size": 5000,
+}
+
+
+ACCOUNTS = {
+    # accounts per POST /accounts/ array
+    "batch_max_size": 50_000,
+    "batch_write_size": 1000,
+}
+
+TRANSFERS = {
+    "batch_max_size": 50_000,
+    "batch_write_size": 1000,
+    # commit concurrent POST /accounts/transfer/ requests together (see accounts/group_commit.py)
+    "group_commit": os.environ.get("TRANSFERS_GROUP_COMMIT") == "1",
+    # seconds a group waits for more transfers after its first one
+    "group_commit_max_wait": 0.002,
+    "group_commit_max_size": 200,
+}
@@ -1,13 +1,42 @@
-from django.contrib import admin
-from django.db import transaction
+from uuid import UUID
+
+from django import forms
+from django.contrib import admin, messages
+from django.db import connections
+from django.db.models import Q
+from django.http import HttpResponseRedirect
 from import_export.admin import ImportExportModelAdmin
 from import_export.fields import Field
 from import_export.resources import ModelResource
 
 from account_transactions.settings import UPLOADED_FILES
 
+from .buckets import reset_buckets
+from .cache import invalidate_accounts
 from .forms import TransactionAdminForm
-from .models import Account, Transaction
+from .ledger import checkpoint_accounts
+from .models import Account, ArchivedTransaction, Transaction
+from .pagination import EstimatedCountPaginator
+from .transfers import TransferError, execute_transfer
+
+
+def _uuid(term: str) -> UUID | None:
+    try:
+        return UUID(term)
+    except ValueError:
+        return None
+
+
+def prefix_filter(field: str, prefix: str, using: str) -> Q:
+    """
+    Case-sensitive `field` prefix match that an ordinary index on `field` can serve.
+
+    SQLite's LIKE ignores case and so can't use a plain index; the equivalent range can.
+    PostgreSQL serves `startswith` from the pattern index Django adds to indexed CharFields.
+    """
+    if connections[using].vendor == "sqlite":
+        return Q(**{f"{field}__gte": prefix, f"{field}__lt": prefix + "\U0010ffff"})
+    return Q(**{f"{field}__startswith": prefix})
 
 
 class AccountResource(ModelResource):
@@ -18,33 +47,112 @@ class AccountResource(ModelResource):
     class Meta:
         model = Account
 
+    def after_save_instance(self, instance, using_transactions, dry_run):
+        # the imported balance replaces whatever a bucketed account held in its buckets
+        reset_buckets([instance.pk])
+        checkpoint_accounts([instance.pk])
+        invalidate_accounts([instance.pk])
+
 
 @admin.register(Account)
 class AccountAdmin(ImportExportModelAdmin):
-    list_display = ["id", "name", "balance"]
+    list_display = ["id", "name", "total_balance", "buckets"]
     list_per_page = 10
-    search_fields = ["name", "id"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # an account id, or the start of a name; see get_search_results
+    search_fields = ["name"]
+    search_help_text = "Account id, or the beginning of the name (case-sensitive)."
+    # changed with the set_account_buckets command, which also moves the balance
+    readonly_fields = ["buckets"]
 
     resource_class = AccountResource
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_total_balance()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        pk = _uuid(term)
+        if pk is not None:
+            return queryset.filter(pk=pk), False
+        return queryset.filter(prefix_filter("name", term, queryset.db)), False
+
+    @admin.display(description="balance", ordering="total_balance")
+    def total_balance(self, obj):
+        return obj.total_balance
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "balance" in form.changed_data:
+            reset_buckets([obj.pk])
+            checkpoint_accounts([obj.pk])
+        invalidate_accounts([obj.pk])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_accounts([obj.pk])
+
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ["id", "src_account", "dest_account", "amount", "created_at"]
     list_per_page = 10
     list_select_related = True
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # a transaction id, or an account id for all of its transfers
+    search_fields = ["id"]
+    search_help_text = "Transaction id, or account id."
     autocomplete_fields = ["src_account", "dest_account"]
-    ordering = ["-created_at"]
+    ordering = ["-created_at", "-id"]
 
     form = TransactionAdminForm
 
+    def has_change_permission(self, request, obj=None):
+        # a saved transfer has moved its balance already; editing it would move it again
+        return obj is None and super().has_change_permission(request, obj)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        pk = _uuid(term)
+        if pk is None:
+            return queryset.none(), False
+        return queryset.filter(Q(pk=pk) | Q(src_account=pk) | Q(dest_account=pk)), False
+
     def save_model(self, request, obj, form, change):
-        self.update_accounts(obj)
-        super().save_model(request, obj, form, change)
+        try:
+            execute_transfer(obj)
+        except TransferError as error:
+            # the form checked the balance, but a concurrent transfer may have spent it since
+            self.message_user(request, str(error), messages.ERROR)
+
+    def log_addition(self, request, obj, message):
+        if not obj._state.adding:
+            return super().log_addition(request, obj, message)
+
+    def response_add(self, request, obj, post_url_continue=None):
+        if obj._state.adding:
+            # the transfer failed and nothing was saved
+            return HttpResponseRedirect(request.path)
+        return super().response_add(request, obj, post_url_continue)
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(TransactionAdmin):
+    """Transactions moved out of the hot table by `archive_transactions`; read-only."""
+    form = forms.ModelForm
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
-    def update_accounts(self, obj: Transaction):
-        with transaction.atomic():
-            obj.src_account.balance -= obj.amount
-            obj.dest_account.balance += obj.amount
-            obj.src_account.save()
-            obj.dest_account.save()
+    def has_delete_permission(self, request, obj=None):
+        # archived rows go together with their ledger entries, or not at all
+        return False
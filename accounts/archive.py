@@ -0,0 +1,121 @@
+"""
+Hot/cold partitioning of the transaction history.
+
+`archive_transactions` moves transactions older than `ARCHIVE["horizon_days"]`, with
+their ledger entries, to `ArchivedTransaction` and `ArchivedLedgerEntry`, oldest first.
+The archive is therefore always an older `(created_at, id)` range than what is left, so
+listings read both tables as one keyset (see `KeysetChain`), and the hot tables stay
+small. Archived rows keep their PROTECT foreign keys to `Account`.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from account_transactions.settings import ARCHIVE
+
+from .ledger import balance_at
+from .models import (
+    ArchivedLedgerEntry,
+    ArchivedTransaction,
+    BalanceCheckpoint,
+    LedgerEntry,
+    ReconciliationRun,
+    Transaction,
+)
+from .pagination import keyset_after
+from .reconciliation import WATERMARK_FIELDS
+
+
+@dataclass
+class ArchiveResult:
+    before: datetime
+    transactions: int = 0
+    ledger_entries: int = 0
+    checkpoints: int = 0
+
+
+def archive_transactions(before: datetime | None = None, batch_size: int | None = None) -> ArchiveResult:
+    """
+    Move the transactions created before `before` (the horizon by default) to the archive.
+
+    Each batch is moved in its own transaction, so locks are short and an interrupted
+    run keeps what it archived. Before a batch's ledger entries are deleted, every
+    account it touched gets a balance checkpoint at its last archived entry, so
+    `balance_at` keeps answering from the hot tables. Only transactions a reconciliation
+    has already covered are archived, so the next run still sees every transfer newer
+    than its watermark.
+    """
+    before = before or timezone.now() - timedelta(days=ARCHIVE["horizon_days"])
+    batch_size = batch_size or ARCHIVE["batch_size"]
+    result = ArchiveResult(before)
+
+    reconciled = _reconciled()
+    if reconciled is None:
+        return result
+    eligible = Transaction.objects.filter(reconciled, created_at__lt=before).order_by("created_at", "id")
+    while True:
+        with transaction.atomic():
+            moved = _archive_batch(eligible[:batch_size], result)
+        if moved < batch_size:
+            return result
+
+
+def _reconciled() -> Q | None:
+    """Transactions at or before the latest reconciliation watermark; None when there are none."""
+    run = ReconciliationRun.objects.order_by("-id").first()
+    if run is None:
+        # never reconciled: the first run baselines current balances, whatever was archived
+        return Q()
+    if run.watermark_created_at is None:
+        return None
+    return ~keyset_after(WATERMARK_FIELDS, [run.watermark_created_at, run.watermark_id])
+
+
+def _archive_batch(batch, result: ArchiveResult) -> int:
+    transactions = list(batch)
+    if not transactions:
+        return 0
+    ids = [t.pk for t in transactions]
+    entries = list(LedgerEntry.objects.filter(transaction_id__in=ids).order_by("created_at", "id"))
+
+    last_entries = {entry.account_id: entry for entry in entries}
+    BalanceCheckpoint.objects.bulk_create(
+        BalanceCheckpoint(
+            account_id=entry.account_id,
+            # a bucketed account's entry may not have its balance, which is replayed while the history is still hot
+            balance=balance_at(entry.account_id, entry.created_at) if entry.balance is None else entry.balance,
+            created_at=entry.created_at,
+        )
+        for entry in last_entries.values()
+    )
+    ArchivedTransaction.objects.bulk_create(
+        ArchivedTransaction(
+            id=t.pk,
+            src_account_id=t.src_account_id,
+            dest_account_id=t.dest_account_id,
+            amount=t.amount,
+            created_at=t.created_at,
+        )
+        for t in transactions
+    )
+    ArchivedLedgerEntry.objects.bulk_create(
+        ArchivedLedgerEntry(
+            id=entry.pk,
+            account_id=entry.account_id,
+            transaction_id=entry.transaction_id,
+            amount=entry.amount,
+            balance=entry.balance,
+            created_at=entry.created_at,
+        )
+        for entry in entries
+    )
+    LedgerEntry.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+    Transaction.objects.filter(pk__in=ids).delete()
+
+    result.transactions += len(transactions)
+    result.ledger_entries += len(entries)
+    result.checkpoints += len(last_entries)
+    return len(transactions)
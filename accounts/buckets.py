@@ -0,0 +1,111 @@
+import random
+from decimal import ROUND_DOWN, Decimal
+from typing import Iterable
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Round
+
+from .cache import invalidate_accounts
+from .models import CENT, DECIMAL_PLACES, Account, BalanceBucket, BalanceCheckpoint
+
+
+def set_buckets(account_id: UUID, buckets: int) -> Account:
+    """
+    Spread an account's balance evenly over `buckets` sub-balance rows (0 turns bucketing off).
+
+    The cent left over from an uneven split stays in the account row, which debits
+    fall back to once no single bucket can cover them.
+    """
+    with transaction.atomic():
+        account = Account.objects.select_for_update().get(pk=account_id)
+        total = account.balance + sum(locked_bucket_totals([account.pk]).values())
+        share = (total / buckets).quantize(CENT, rounding=ROUND_DOWN) if buckets else Decimal(0)
+
+        BalanceBucket.objects.filter(account=account).delete()
+        BalanceBucket.objects.bulk_create(
+            BalanceBucket(account=account, index=i, balance=share) for i in range(buckets)
+        )
+        account.balance = total - share * buckets
+        account.buckets = buckets
+        account.save(update_fields=["balance", "buckets"])
+        # single transfers don't record a bucketed account's running balance, so balance_at replays them from here
+        BalanceCheckpoint.objects.create(account=account, balance=total)
+        invalidate_accounts([account.pk])
+    return account
+
+
+def credit_buckets(account_id: UUID, amount: Decimal) -> bool:
+    """Credit a random bucket of the account; False if the account doesn't exist."""
+    buckets = Account.objects.filter(pk=account_id).values_list("buckets", flat=True).first()
+    if buckets is None:
+        return False
+    if not buckets:
+        return Account.objects.filter(pk=account_id).update(balance=Round(F("balance") + amount, DECIMAL_PLACES)) > 0
+
+    return BalanceBucket.objects.filter(account_id=account_id, index=random.randrange(buckets)).update(
+        balance=Round(F("balance") + amount, DECIMAL_PLACES)
+    ) > 0
+
+
+def debit_buckets(account_id: UUID, amount: Decimal) -> bool:
+    """
+    Debit a bucketed account; False if its total balance doesn't cover `amount`.
+
+    Buckets are tried from a random one onwards with the same conditional update as
+    plain accounts, then the account row. Only when the funds are split so that no
+    single row covers the debit are the buckets locked and merged into the account row.
+    """
+    buckets = Account.objects.filter(pk=account_id).values_list("buckets", flat=True).first()
+    if not buckets:
+        return False
+
+    start = random.randrange(buckets)
+    for i in range(buckets):
+        debited = (
+            BalanceBucket.objects
+            .filter(account_id=account_id, index=(start + i) % buckets, balance__gte=amount)
+            .update(balance=Round(F("balance") - amount, DECIMAL_PLACES))
+        )
+        if debited:
+            return True
+
+    if _debit_account_row(account_id, amount):
+        return True
+    consolidate_buckets([account_id])
+    return _debit_account_row(account_id, amount)
+
+
+def locked_bucket_totals(account_ids: Iterable[UUID]) -> dict[UUID, Decimal]:
+    """Sum of each account's buckets, locking them until the current transaction ends."""
+    totals: dict[UUID, Decimal] = {}
+    buckets = BalanceBucket.objects.select_for_update().filter(account_id__in=list(account_ids))
+    for account_id, balance in buckets.values_list("account_id", "balance"):
+        totals[account_id] = totals.get(account_id, Decimal(0)) + balance
+    return totals
+
+
+def consolidate_buckets(account_ids: Iterable[UUID]) -> None:
+    """Move the buckets' balances into their account rows, keeping the accounts bucketed."""
+    account_ids = list(account_ids)
+    with transaction.atomic():
+        accounts = Account.objects.select_for_update().in_bulk(account_ids)
+        totals = locked_bucket_totals(account_ids)
+        for pk, total in totals.items():
+            accounts[pk].balance += total
+        Account.objects.bulk_update([accounts[pk] for pk in totals], ["balance"])
+        reset_buckets(totals)
+
+
+def reset_buckets(account_ids: Iterable[UUID]) -> None:
+    """Empty the buckets of accounts whose account row now holds their whole balance."""
+    account_ids = list(account_ids)
+    if account_ids:
+        BalanceBucket.objects.filter(account_id__in=account_ids).update(balance=0)
+
+
+def _debit_account_row(account_id: UUID, amount: Decimal) -> bool:
+    return Account.objects.filter(pk=account_id, balance__gte=amount).update(
+        balance=Round(F("balance") - amount, DECIMAL_PLACES)
+    ) > 0
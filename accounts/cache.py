@@ -0,0 +1,53 @@
+from typing import Iterable
+from uuid import UUID, uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+
+from account_transactions.settings import ACCOUNT_CACHE
+
+
+def _cache():
+    return caches[ACCOUNT_CACHE["alias"]]
+
+
+# ids may arrive as strings in any UUID spelling, e.g. from imported files
+def _generation_key(pk) -> str:
+    return f"account:{UUID(str(pk))}:generation"
+
+
+def _entry_key(pk) -> str:
+    return f"account:{UUID(str(pk))}"
+
+
+def get_account(pk: UUID) -> tuple[str, dict | None]:
+    """
+    Return the account's current generation token and its cached representation, if valid.
+
+    Entries are stored together with the generation they were read under. Writers drop
+    the generation after committing, so an entry filled from a read that raced with a
+    write can never match the fresh token the next reader creates.
+    """
+    cache = _cache()
+    values = cache.get_many([_generation_key(pk), _entry_key(pk)])
+    generation = values.get(_generation_key(pk))
+    if generation is None:
+        # expires with the entries, so a write this cache didn't see is served for a bounded time
+        cache.add(_generation_key(pk), uuid4().hex, timeout=ACCOUNT_CACHE["timeout"])
+        return cache.get(_generation_key(pk)), None
+
+    entry = values.get(_entry_key(pk))
+    if entry is not None and entry[0] == generation:
+        return generation, entry[1]
+    return generation, None
+
+
+def set_account(pk: UUID, generation: str, data: dict) -> None:
+    _cache().set(_entry_key(pk), (generation, data), timeout=ACCOUNT_CACHE["timeout"])
+
+
+def invalidate_accounts(pks: Iterable) -> None:
+    """Expire cached accounts once the current transaction (if any) commits."""
+    keys = [key for pk in pks for key in (_generation_key(pk), _entry_key(pk))]
+    if keys:
+        transaction.on_commit(lambda: _cache().delete_many(keys))
@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Iterator
+
+from django.db import models
+from django.db.models import Expression
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from account_transactions.settings import EXPORTS
+
+from .fast_serializers import isoformat
+
+
+class CSVRenderer(BaseRenderer):
+    """Selects the CSV export through content negotiation; rows are streamed by `stream_export`."""
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Selects the NDJSON export through content negotiation; rows are streamed by `stream_export`."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+
+def stream_export(
+    queryset,
+    fields: list[str],
+    renderer: BaseRenderer,
+    filename: str,
+    expressions: dict[str, Expression] | None = None,
+) -> StreamingHttpResponse:
+    """Stream `fields` of every row in `queryset` as CSV or NDJSON; `expressions` computes some columns in SQL."""
+    lines = iter_csv if renderer.format == CSVRenderer.format else iter_ndjson
+    columns = [(field, (expressions or {}).get(field, field)) for field in fields]
+    response = StreamingHttpResponse(
+        lines(queryset, columns),
+        content_type=f"{renderer.media_type}; charset={renderer.charset}",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{renderer.format}"'
+    return response
+
+
+def iter_rows(queryset, columns: list[tuple[str, str | Expression]], chunk_size: int | None = None) -> Iterator[list[tuple]]:
+    chunk_size = chunk_size or EXPORTS["chunk_size"]
+    rows = queryset.values_list(*[column for _, column in columns]).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def iter_csv(queryset, columns: list[tuple[str, str | Expression]], chunk_size: int | None = None) -> Iterator[str]:
+    formatters = [_csv_formatter(field) for field in _output_fields(queryset, columns)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow([name for name, _ in columns])
+    yield _drain(buffer)
+    for chunk in iter_rows(queryset, columns, chunk_size):
+        writer.writerows([[fmt(value) for fmt, value in zip(formatters, row)] for row in chunk])
+        yield _drain(buffer)
+
+
+def iter_ndjson(queryset, columns: list[tuple[str, str | Expression]], chunk_size: int | None = None) -> Iterator[str]:
+    keys = [json.dumps(name) + ":" for name, _ in columns]
+    formatters = [_json_formatter(field) for field in _output_fields(queryset, columns)]
+
+    for chunk in iter_rows(queryset, columns, chunk_size):
+        yield "".join(
+            "{" + ",".join(key + fmt(value) for key, fmt, value in zip(keys, formatters, row)) + "}\n"
+            for row in chunk
+        )
+
+
+def _drain(buffer: io.StringIO) -> str:
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text
+
+
+def _output_fields(queryset, columns: list[tuple[str, str | Expression]]) -> list[models.Field]:
+    fields = []
+    for _, column in columns:
+        if isinstance(column, str):
+            field = queryset.model._meta.get_field(column)
+            fields.append(field.target_field if field.is_relation else field)
+        else:
+            fields.append(column.output_field)
+    return fields
+
+
+def _quantizer(field: models.DecimalField) -> Callable:
+    # computed decimals come back from SQLite without the field's decimal places
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+    return lambda value: str(value.quantize(exponent))
+
+
+def _csv_formatter(field: models.Field) -> Callable:
+    if isinstance(field, models.DateTimeField):
+        return lambda value: value if value is None else isoformat(value)
+    if isinstance(field, models.DecimalField):
+        quantize = _quantizer(field)
+        return lambda value: value if value is None else quantize(value)
+    return lambda value: value
+
+
+def _json_formatter(field: models.Field) -> Callable[..., str]:
+    # decimals are written as exact number literals, never through float
+    if isinstance(field, models.DecimalField):
+        encode = _quantizer(field)
+    elif isinstance(field, models.DateTimeField):
+        encode = lambda value: f'"{isoformat(value)}"'
+    elif isinstance(field, models.UUIDField):
+        encode = lambda value: f'"{value}"'
+    else:
+        encode = json.dumps
+    return lambda value: "null" if value is None else encode(value)
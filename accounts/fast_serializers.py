@@ -0,0 +1,139 @@
+"""
+Read-only fast path for list endpoints.
+
+`FastSerializer` reads `.values()` rows and turns each one into the same data a
+`ModelSerializer` would produce, plus that data's JSON, formatted field by field
+with encoders chosen once from the model fields. `FastListMixin` renders a whole
+page this way when the client accepts plain JSON and falls back to the regular
+serializer otherwise (e.g. for the browsable API), so both paths return the same bytes.
+"""
+import json
+from typing import Callable
+
+from django.db import models
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def isoformat(value) -> str:
+    # same representation as DRF's DateTimeField
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def _encode_str(value) -> str:
+    return json.dumps(value, ensure_ascii=JSONRenderer.ensure_ascii)
+
+
+def _encode_decimal(value) -> str:
+    # JSONEncoder renders Decimals through float
+    return f'"{value}"' if type(value) is str else repr(float(value))
+
+
+class FastSerializer:
+    def __init__(self, serializer_class: type[serializers.ModelSerializer], sources: dict[str, str] | None = None):
+        """`sources` reads some fields from another column or annotation, as `source=` would."""
+        meta = serializer_class.Meta
+        sources = sources or {}
+        self.fields = list(meta.fields)
+        self.columns = [sources.get(name, name) for name in self.fields]
+        self.keys = [json.dumps(name) + ":" for name in self.fields]
+        self.converters, self.encoders = [], []
+        for name in self.fields:
+            converter, encoder = self._compile(meta.model._meta.get_field(name))
+            self.converters.append(converter)
+            self.encoders.append(encoder)
+
+    def _compile(self, field: models.Field) -> tuple[Callable, Callable[..., str]]:
+        if field.is_relation:
+            # PrimaryKeyRelatedField returns the related pk as is
+            return _nullable(lambda value: value), _nullable(lambda value: f'"{value}"')
+        if isinstance(field, models.UUIDField):
+            return _nullable(str), _nullable(lambda value: f'"{value}"')
+        if isinstance(field, models.DecimalField):
+            decimal_field = serializers.DecimalField(max_digits=field.max_digits, decimal_places=field.decimal_places)
+            # quantized, and a string if COERCE_DECIMAL_TO_STRING is set, as the serializer's field does
+            return _nullable(decimal_field.to_representation), _nullable(_encode_decimal)
+        if isinstance(field, models.DateTimeField):
+            return _nullable(isoformat), _nullable(lambda value: f'"{value}"')
+        if isinstance(field, (models.CharField, models.TextField)):
+            return _nullable(lambda value: value), _nullable(_encode_str)
+        return _nullable(lambda value: value), _nullable(lambda value: json.dumps(value, cls=JSONEncoder))
+
+    def rows(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, rows: list[dict]) -> list[dict]:
+        return [
+            {name: convert(row[column]) for name, column, convert in zip(self.fields, self.columns, self.converters)}
+            for row in rows
+        ]
+
+    def encode(self, data: list[dict]) -> str:
+        return "[" + ",".join(
+            "{" + ",".join(key + encode(item[name]) for key, name, encode in zip(self.keys, self.fields, self.encoders)) + "}"
+            for item in data
+        ) + "]"
+
+
+def _nullable(func: Callable) -> Callable:
+    return lambda value: None if value is None else func(value)
+
+
+class PreRenderedResponse(Response):
+    """A Response whose JSON body was already built; `data` stays available to tests and middleware."""
+
+    def __init__(self, data, content: bytes, **kwargs):
+        super().__init__(data, **kwargs)
+        self.prerendered_content = content
+
+    @property
+    def rendered_content(self):
+        self["Content-Type"] = JSONRenderer.media_type
+        return self.prerendered_content
+
+
+class FastListMixin:
+    fast_serializer: FastSerializer
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.fast_serializer.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        data = self.fast_serializer.to_representation(rows)
+        results = self.fast_serializer.encode(data)
+
+        if page is None:
+            return PreRenderedResponse(data, self._finish(results))
+        envelope = self.get_paginated_response(data).data
+        body = "{" + ",".join(
+            json.dumps(key) + ":" + (results if key == "results" else self._dumps(value))
+            for key, value in envelope.items()
+        ) + "}"
+        return PreRenderedResponse(envelope, self._finish(body))
+
+    def use_fast_list(self, request) -> bool:
+        return (
+            self.fast_list
+            and type(request.accepted_renderer) is JSONRenderer
+            and "indent" not in (request.accepted_media_type or "")
+            and api_settings.COMPACT_JSON
+        )
+
+    @staticmethod
+    def _dumps(value) -> str:
+        return json.dumps(value, cls=JSONEncoder, ensure_ascii=JSONRenderer.ensure_ascii, separators=(",", ":"))
+
+    @staticmethod
+    def _finish(body: str) -> bytes:
+        # as JSONRenderer does
+        return body.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029").encode()
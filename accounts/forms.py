@@ -1,17 +1,24 @@
-from decimal import Decimal
 from typing import Any
 
 from django import forms
 from django.core.exceptions import ValidationError
 
-from .models import Account
+from .transfers import INSUFFICIENT_BALANCE_ERROR, SAME_ACCOUNT_ERROR
 
 
 class TransactionAdminForm(forms.ModelForm):
     def clean(self) -> dict[str, Any]:
-        src_account = Account.objects.get(pk=self.data["src_account"])
-        if self.data["src_account"] == self.data["dest_account"]:
-            raise ValidationError("Transfer must be done between two different accounts.")
-        if src_account.balance < Decimal(self.data["amount"]):
-            raise ValidationError("Source account doesn't have enough balance to transfer the specified amount.")
-        return super().clean()
+        cleaned_data = super().clean()
+        # the accounts were already loaded by their fields' validation
+        src_account = cleaned_data.get("src_account")
+        dest_account = cleaned_data.get("dest_account")
+        amount = cleaned_data.get("amount")
+        if src_account is None or dest_account is None or amount is None:
+            return cleaned_data
+
+        if src_account.pk == dest_account.pk:
+            raise ValidationError(SAME_ACCOUNT_ERROR)
+        # a pre-check for a friendly error; the transfer's conditional update is what guards the balance
+        if src_account.total_balance < amount:
+            raise ValidationError(INSUFFICIENT_BALANCE_ERROR)
+        return cleaned_data
@@ -0,0 +1,78 @@
+"""
+Group commit for single transfers.
+
+With `TRANSFERS["group_commit"]` on, `POST /accounts/transfer/` hands its transfer to
+a writer thread instead of committing it itself. The writer takes the oldest waiting
+transfer, keeps collecting for up to `TRANSFERS["group_commit_max_wait"]` seconds or
+`TRANSFERS["group_commit_max_size"]` transfers, applies them with `apply_transfers`
+in one transaction and hands every request its own result. Each transfer waits up to
+the maximum wait longer, and in exchange a whole group shares one commit (one fsync on
+SQLite) instead of queueing for the database lock one commit at a time.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.db import close_old_connections
+
+from account_transactions.settings import TRANSFERS
+
+from .transfers import Transfer, TransferResult, apply_transfers
+
+
+class GroupCommitWriter:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.queue: queue.SimpleQueue[tuple[Transfer, Future]] = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="transfer-group-commit", daemon=True)
+        self.thread.start()
+
+    def submit(self, transfer: Transfer) -> TransferResult:
+        """Queue a transfer and wait until the group it joined is committed or rejected."""
+        future: Future = Future()
+        self.queue.put((transfer, future))
+        return future.result()
+
+    def _run(self) -> None:
+        while True:
+            group = self._collect()
+            try:
+                # as at the start of a request: drop a connection that broke or aged out
+                close_old_connections()
+                # best effort: an invalid transfer is rejected alone, the rest still commit
+                results = apply_transfers(list(enumerate(t for t, _ in group)), atomic=False)
+            except Exception as e:
+                for _, future in group:
+                    future.set_exception(e)
+                continue
+            for result in results:
+                group[result.index][1].set_result(result)
+
+    def _collect(self) -> list[tuple[Transfer, Future]]:
+        group = [self.queue.get()]
+        deadline = time.monotonic() + TRANSFERS["group_commit_max_wait"]
+        while len(group) < TRANSFERS["group_commit_max_size"]:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                group.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return group
+
+
+_writer: GroupCommitWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def submit(transfer: Transfer) -> TransferResult:
+    """Apply a transfer through this process's writer, starting it on first use."""
+    global _writer
+    with _writer_lock:
+        # a forked worker doesn't inherit its parent's thread
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = GroupCommitWriter()
+    return _writer.submit(transfer)
@@ -0,0 +1,98 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from account_transactions.settings import IDEMPOTENCY
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def idempotent(handler):
+    """
+    Make a successful POST replayable under an `Idempotency-Key` header.
+
+    The key, a fingerprint of the request and the response are stored in the same
+    database transaction as the handler's writes, so a retry either replays the
+    stored response with one indexed read or runs the handler for the first time.
+    Failed requests are not stored and can be retried as they are.
+    """
+    def wrapper(view, request: Request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not key or len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            return Response(f"Invalid {HEADER} header.", status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        stored = find_key(key)
+        if stored is not None:
+            return replay(stored, fingerprint)
+
+        try:
+            with transaction.atomic():
+                response = handler(view, request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    IdempotencyKey.objects.create(
+                        key=key,
+                        fingerprint=fingerprint,
+                        status_code=response.status_code,
+                        response=response.data,
+                    )
+        except IntegrityError:
+            # a concurrent request with the same key committed first
+            stored = find_key(key)
+            if stored is None:
+                raise
+            return replay(stored, fingerprint)
+        return response
+
+    return wrapper
+
+
+def request_fingerprint(request: Request) -> str:
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def find_key(key: str) -> IdempotencyKey | None:
+    stored = IdempotencyKey.objects.filter(pk=key).first()
+    if stored is not None and stored.created_at < expiry_cutoff():
+        stored.delete()
+        return None
+    return stored
+
+
+def replay(stored: IdempotencyKey, fingerprint: str) -> Response:
+    if stored.fingerprint != fingerprint:
+        return Response(
+            f"{HEADER} was already used with a different request.",
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(stored.response, status=stored.status_code, headers={REPLAYED_HEADER: "true"})
+
+
+def expiry_cutoff():
+    return timezone.now() - timedelta(seconds=IDEMPOTENCY["ttl"])
+
+
+def purge_expired_keys(batch_size: int | None = None) -> int:
+    """Delete expired keys in batches so the table is never locked for long."""
+    batch_size = batch_size or IDEMPOTENCY["purge_batch_size"]
+    cutoff = expiry_cutoff()
+    purged = 0
+    while True:
+        keys = list(IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list("pk", flat=True)[:batch_size])
+        if not keys:
+            return purged
+        purged += IdempotencyKey.objects.filter(pk__in=keys).delete()[0]
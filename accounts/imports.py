@@ -0,0 +1,551 @@
+import codecs
+import csv
+import json
+import os
+import zipfile
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from itertools import islice
+from typing import IO, Iterable, Iterator
+from uuid import UUID
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from account_transactions.settings import UPLOADED_FILES
+
+from .buckets import reset_buckets
+from .cache import invalidate_accounts
+from .ledger import checkpoint_accounts
+from .models import CENT, DECIMAL_MAX_DIGITS, DECIMAL_PLACES, Account, ReconciledBalance, total_balance_expression
+
+
+ACCOUNT_KEYS = ["id", "name", "balance"]
+
+# import modes
+MERGE = "merge"
+REPLACE = "replace"
+MAX_JSON_ITEM_SIZE = 1 << 20
+
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ODS = "application/vnd.oasis.opendocument.spreadsheet"
+CONTENT_TYPES = ["text/csv", "application/json", "application/x-ndjson", XLSX, ODS]
+
+# OpenDocument content.xml names
+TABLE = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}table"
+TABLE_ROW = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}table-row"
+TABLE_CELL = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}table-cell"
+COVERED_TABLE_CELL = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}covered-table-cell"
+ROWS_REPEATED = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}number-rows-repeated"
+COLUMNS_REPEATED = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}number-columns-repeated"
+VALUE_TYPE = "{urn:oasis:names:tc:opendocument:xmlns:office:1.0}value-type"
+VALUE = "{urn:oasis:names:tc:opendocument:xmlns:office:1.0}value"
+PARAGRAPH = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}p"
+NUMERIC_VALUE_TYPES = ["float", "percentage", "currency"]
+
+NAME_MAX_LENGTH = Account._meta.get_field("name").max_length
+MAX_BALANCE = Decimal(10) ** (DECIMAL_MAX_DIGITS - DECIMAL_PLACES)
+
+NOT_AN_OBJECT_ERROR = "Expected an object with id, name and balance."
+REQUIRED_ERROR = "This field is required."
+DUPLICATE_ID_ERROR = "Duplicate id, already in an earlier row of the batch."
+INVALID_ID_ERROR = "Must be a valid UUID."
+INVALID_NAME_ERROR = "Not a valid string."
+NAME_LENGTH_ERROR = f"Ensure this field has no more than {NAME_MAX_LENGTH} characters."
+INVALID_NUMBER_ERROR = "A valid number is required."
+NEGATIVE_BALANCE_ERROR = "Ensure this value is greater than or equal to 0."
+WHOLE_DIGITS_ERROR = f"Ensure that there are no more than {DECIMAL_MAX_DIGITS - DECIMAL_PLACES} digits before the decimal point."
+DECIMAL_PLACES_ERROR = f"Ensure that there are no more than {DECIMAL_PLACES} decimal places."
+
+
+class ImportFileError(Exception):
+    pass
+
+
+@dataclass
+class RowError:
+    row: int
+    field: str
+    error: str
+
+
+def check_content_type(content_type: str) -> None:
+    if content_type not in CONTENT_TYPES:
+        raise ImportFileError(
+            f"File format not supported. Supported formats are: {UPLOADED_FILES['supported_formats']}"
+        )
+
+
+def read_accounts(file: IO[bytes], content_type: str) -> Iterator[dict]:
+    """Yield account rows from an uploaded file without loading it into memory."""
+    check_content_type(content_type)
+    text = codecs.getreader("utf-8")(file)
+
+    if content_type == "text/csv":
+        return iter_csv(text)
+    if content_type == "application/json":
+        return iter_json_array(text)
+    if content_type == XLSX:
+        return iter_xlsx(file)
+    if content_type == ODS:
+        return iter_ods(file)
+    return iter_ndjson(text)
+
+
+def read_csv_header(line: bytes) -> list[str]:
+    return next(csv.reader([line.decode("utf-8")]))
+
+
+def iter_csv(text: IO[str], keys: list[str] = ACCOUNT_KEYS) -> Iterator[dict]:
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None or not set(keys) <= set(reader.fieldnames):
+        raise KeyError(keys)
+    yield from reader
+
+
+def iter_xlsx(file: IO[bytes]) -> Iterator[dict]:
+    """Stream the rows of a workbook's first sheet with openpyxl's read-only mode."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("XLSX imports need openpyxl installed.")
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise ImportFileError(f"Invalid XLSX file: {e}")
+
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        # spreadsheets store numbers as floats; their shortest repr is what the user typed
+        yield from iter_sheet([Decimal(repr(v)) if type(v) is float else v for v in row] for row in rows)
+    finally:
+        workbook.close()
+
+
+def iter_ods(file: IO[bytes]) -> Iterator[dict]:
+    """
+    Stream the rows of a spreadsheet's first table from its content.xml.
+
+    odfpy (which tablib uses) builds the whole document tree, so the XML is parsed
+    incrementally instead and each row is dropped once read.
+    """
+    try:
+        from defusedxml.ElementTree import iterparse
+    except ImportError:
+        from xml.etree.ElementTree import iterparse
+
+    try:
+        archive = zipfile.ZipFile(file)
+        content = archive.open("content.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ImportFileError(f"Invalid ODS file: {e}")
+
+    with archive, content:
+        yield from iter_sheet(_ods_rows(iterparse(content, events=("start", "end"))))
+
+
+def _ods_rows(events: Iterator) -> Iterator[list]:
+    table = None
+    row: list = []
+    # empty cells are only added once a value follows them, so trailing ones padding
+    # a row to the sheet's width (often thousands, as one repeated cell) are never built
+    blanks = 0
+    try:
+        for event, element in events:
+            if event == "start":
+                if element.tag == TABLE and table is None:
+                    table = element
+                continue
+            if element.tag in (TABLE_CELL, COVERED_TABLE_CELL):
+                value = _ods_value(element)
+                repeated = int(element.get(COLUMNS_REPEATED, 1))
+                if value is None:
+                    blanks += repeated
+                else:
+                    row += [None] * blanks + [value] * repeated
+                    blanks = 0
+            elif element.tag == TABLE_ROW:
+                if row:
+                    for _ in range(int(element.get(ROWS_REPEATED, 1))):
+                        yield row
+                row, blanks = [], 0
+                # rows in header or group elements leave an empty shell behind, rows directly
+                # in the table nothing
+                element.clear()
+                table.clear()
+            elif element.tag == TABLE:
+                return
+    except (SyntaxError, ValueError) as e:
+        raise ImportFileError(f"Invalid ODS file: {e}")
+
+
+def _ods_value(cell) -> Decimal | str | None:
+    value_type = cell.get(VALUE_TYPE)
+    if value_type is None:
+        return None
+    if value_type in NUMERIC_VALUE_TYPES:
+        # left as text if malformed, for validation to reject
+        number = _to_decimal(cell.get(VALUE))
+        return cell.get(VALUE) if number is None else number
+    return "\n".join("".join(child.itertext()) for child in cell if child.tag == PARAGRAPH)
+
+
+def iter_sheet(rows: Iterator[list]) -> Iterator[dict]:
+    """Map the rows after a spreadsheet's header row to dicts, skipping empty rows."""
+    header = next(rows, None)
+    if header is None or not set(ACCOUNT_KEYS) <= set(header):
+        raise KeyError(ACCOUNT_KEYS)
+    for values in rows:
+        if any(value not in (None, "") for value in values):
+            yield dict(zip(header, values))
+
+
+def iter_ndjson(text: IO[str]) -> Iterator[dict]:
+    for line in text:
+        if line.strip():
+            yield json.loads(line, parse_float=Decimal)
+
+
+def iter_json_array(text: IO[str], chunk_size: int | None = None) -> Iterator:
+    """
+    Incrementally decode the items of a top-level JSON array.
+
+    Only the current item plus one read chunk is held in memory. An item is only
+    accepted once something follows it in the buffer, so a number split across two
+    chunks is never decoded prematurely.
+    """
+    chunk_size = chunk_size or UPLOADED_FILES["read_chunk_size"]
+    decoder = json.JSONDecoder(parse_float=Decimal)
+    buffer, pos, eof = "", 0, False
+    state = "open"  # open -> first -> (value -> separator)* -> closed
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+
+        item = end = None
+        if pos < len(buffer) and state in ("first", "value") and buffer[pos] != "]":
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                pass
+
+        need_more = pos == len(buffer) or (
+            state in ("first", "value") and buffer[pos] != "]" and (end is None or end == len(buffer))
+        )
+        if need_more and not eof:
+            if len(buffer) - pos > MAX_JSON_ITEM_SIZE:
+                raise ImportFileError("JSON item is too large or malformed.")
+            chunk = text.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        if pos == len(buffer):
+            raise ImportFileError("Unexpected end of JSON file.")
+
+        char = buffer[pos]
+        if state == "open":
+            if char != "[":
+                raise ImportFileError("JSON file must contain an array of accounts.")
+            state, pos = "first", pos + 1
+        elif state == "separator" or (state == "first" and char == "]"):
+            if char == "]":
+                return
+            if char != ",":
+                raise ImportFileError(f"Expected ',' or ']' in JSON file, got {char!r}.")
+            state, pos = "value", pos + 1
+        elif end is None:
+            raise ImportFileError("Malformed JSON file.")
+        else:
+            state, pos = "separator", end
+            yield item
+
+
+def line_ranges(path: str, start: int, chunk_size: int) -> Iterator[tuple[int, int]]:
+    """Split a line-delimited file into byte ranges of about `chunk_size` ending on line boundaries."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        while start < size:
+            f.seek(start + chunk_size)
+            f.readline()
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+
+def parse_line_range(path: str, start: int, end: int, content_type: str, fieldnames: list[str] | None) -> tuple[list[dict], int]:
+    """
+    Parse the CSV or NDJSON rows in `[start, end)` of a file, returning the rows that
+    carry every account key and the number of rejected ones.
+
+    Runs in worker processes, so it only takes picklable arguments.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        lines = f.read(end - start).decode("utf-8").splitlines()
+
+    if content_type == "text/csv":
+        candidates = csv.DictReader(lines, fieldnames=fieldnames)
+    else:
+        candidates = (_loads_or_none(line) for line in lines if line.strip())
+
+    rows, rejected = [], 0
+    for row in candidates:
+        if is_account_row(row):
+            rows.append(row)
+        else:
+            rejected += 1
+    return rows, rejected
+
+
+def is_account_row(row) -> bool:
+    return isinstance(row, dict) and all(row.get(key) not in (None, "") for key in ACCOUNT_KEYS)
+
+
+def _loads_or_none(line: str):
+    try:
+        return json.loads(line, parse_float=Decimal)
+    except ValueError:
+        return None
+
+
+def validate_accounts(rows: list, first_row: int = 1) -> tuple[list[tuple[UUID, str, Decimal]], list[RowError]]:
+    """
+    Validate a batch of raw account rows column by column.
+
+    Each column is checked in one pass with a cheap test (one `UUID` conversion for
+    ids, one `Decimal` conversion and range checks for balances); only values failing
+    it take the slow path that parses them properly or works out why they are invalid.
+    An id repeated within the batch is invalid after its first row. Returns the valid
+    rows as `(id, name, balance)` and the errors of the others, numbered from `first_row`.
+    """
+    records = [row if isinstance(row, dict) else None for row in rows]
+    problems = [(i, NON_FIELD_ERRORS, NOT_AN_OBJECT_ERROR) for i, record in enumerate(records) if record is None]
+
+    raw_ids = [None if record is None else record.get("id") for record in records]
+    # parsed once, so differently written copies of an id are still duplicates
+    try:
+        ids = list(map(UUID, raw_ids))
+    except (AttributeError, TypeError, ValueError):
+        ids = [_to_uuid(v) for v in raw_ids]
+    for i in _failed(ids, records):
+        ids[i], error = _parse_id(raw_ids[i])
+        if error:
+            problems.append((i, "id", error))
+
+    raw_names = [None if record is None else record.get("name") for record in records]
+    names = [v if type(v) is str and 0 < len(v) <= NAME_MAX_LENGTH else None for v in raw_names]
+    for i in _failed(names, records):
+        names[i], error = _parse_name(raw_names[i])
+        if error:
+            problems.append((i, "name", error))
+
+    raw_balances = [None if record is None else record.get("balance") for record in records]
+    try:
+        balances = list(map(Decimal, raw_balances))
+    except (ArithmeticError, TypeError, ValueError):
+        balances = [_to_decimal(v) for v in raw_balances]
+    balances = [
+        d if d is not None and type(v) is not bool and d.is_finite() and 0 <= d < MAX_BALANCE and d == d.quantize(CENT) else None
+        for v, d in zip(raw_balances, balances)
+    ]
+    for i in _failed(balances, records):
+        problems.append((i, "balance", _balance_error(raw_balances[i])))
+
+    first: dict[UUID, int] = {}
+    for i, pk in enumerate(ids):
+        if pk is not None and first.setdefault(pk, i) != i:
+            problems.append((i, "id", DUPLICATE_ID_ERROR))
+
+    invalid = {i for i, _, _ in problems}
+    valid = [(ids[i], names[i], balances[i]) for i in range(len(records)) if i not in invalid]
+    errors = [RowError(first_row + i, field, error) for i, field, error in sorted(problems, key=lambda p: p[0])]
+    return valid, errors
+
+
+def _failed(values: list, records: list) -> list[int]:
+    return [i for i, value in enumerate(values) if value is None and records[i] is not None]
+
+
+def _to_uuid(value) -> UUID | None:
+    try:
+        return UUID(value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _parse_id(value) -> tuple[UUID | None, str | None]:
+    if value in (None, ""):
+        return None, REQUIRED_ERROR
+    try:
+        return Account._meta.pk.to_python(value), None
+    except ValidationError:
+        return None, INVALID_ID_ERROR
+
+
+def _parse_name(value) -> tuple[str | None, str | None]:
+    if value in (None, ""):
+        return None, REQUIRED_ERROR
+    if type(value) not in (str, int, Decimal):
+        return None, INVALID_NAME_ERROR
+    name = str(value)
+    if len(name) > NAME_MAX_LENGTH:
+        return None, NAME_LENGTH_ERROR
+    return name, None
+
+
+def _to_decimal(value) -> Decimal | None:
+    try:
+        return Decimal(value)
+    except (ArithmeticError, TypeError, ValueError):
+        return None
+
+
+def _balance_error(value) -> str:
+    if value is None or (type(value) is str and not value.strip()):
+        return REQUIRED_ERROR
+    d = None if type(value) is bool else _to_decimal(value)
+    if d is None or not d.is_finite():
+        return INVALID_NUMBER_ERROR
+    if d < 0:
+        return NEGATIVE_BALANCE_ERROR
+    if d >= MAX_BALANCE:
+        return WHOLE_DIGITS_ERROR
+    return DECIMAL_PLACES_ERROR
+
+
+def import_accounts(rows: Iterable[dict], mode: str = MERGE, dry_run: bool = False, batch_size: int | None = None) -> dict:
+    """
+    Apply an import, returning what it changed.
+
+    `merge` inserts new accounts and updates changed ones, committing each batch on
+    its own so its row locks are released as it goes; if the file turns out to be
+    unreadable halfway, the batches before stay imported. `replace` also deletes the
+    accounts missing from the file, except those that other rows still reference
+    (transactions, ledger entries...), which are counted as `protected`; it runs in
+    one transaction, since deleting needs the whole file. Invalid rows are skipped and
+    reported (see `validate_accounts`). A dry run makes the same changes in one
+    transaction and rolls them back, so its counts are exact.
+    """
+    batch_size = batch_size or UPLOADED_FILES["batch_size"]
+    if mode == MERGE and not dry_run:
+        return {"mode": mode, "dry_run": dry_run, **upsert_accounts(rows, batch_size), "deleted": 0, "protected": 0}
+
+    seen: set[int] | None = set() if mode == REPLACE else None
+    with transaction.atomic():
+        result = upsert_accounts(rows, batch_size, seen=seen)
+        result["deleted"], result["protected"] = (0, 0) if seen is None else delete_missing_accounts(seen, batch_size)
+        if dry_run:
+            transaction.set_rollback(True)
+    return {"mode": mode, "dry_run": dry_run, **result}
+
+
+def upsert_accounts(rows: Iterable[dict], batch_size: int | None = None, seen: set[int] | None = None) -> dict:
+    """Insert new and update changed accounts one batch at a time, adding the ids read to `seen` if given."""
+    batch_size = batch_size or UPLOADED_FILES["batch_size"]
+    result = {"imported": 0, "batches": 0, "inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "errors": []}
+    row = 1
+
+    for batch in batched(rows, batch_size):
+        valid, errors = validate_accounts(batch, first_row=row)
+        accounts = {pk: Account(id=pk, name=name, balance=balance) for pk, name, balance in valid}
+        # a savepoint inside the caller's transaction, if any
+        with transaction.atomic():
+            existing = {
+                pk: (name, Decimal(balance).quantize(CENT))
+                for pk, name, balance in (
+                    Account.objects.select_for_update()
+                    .filter(pk__in=list(accounts))
+                    .values_list("pk", "name", total_balance_expression())
+                )
+            }
+
+            # unchanged rows aren't written, re-baselined or expired
+            inserted, rebalanced, renamed = [], [], []
+            for pk, account in accounts.items():
+                if pk not in existing:
+                    inserted.append(account)
+                elif account.balance != existing[pk][1]:
+                    rebalanced.append(account)
+                elif account.name != existing[pk][0]:
+                    renamed.append(account)
+
+            Account.objects.bulk_create(inserted)
+            Account.objects.bulk_update(rebalanced, ["name", "balance"])
+            Account.objects.bulk_update(renamed, ["name"])
+            changed = [account.pk for account in rebalanced]
+            # imported balances are new opening balances for reconciliation
+            ReconciledBalance.objects.filter(account_id__in=changed).delete()
+            # the imported balance replaces whatever bucketed accounts held in their buckets
+            reset_buckets(changed)
+            checkpoint_accounts(changed)
+            invalidate_accounts(changed + [account.pk for account in renamed])
+
+        if seen is not None:
+            # ints take less memory than UUIDs, for files of millions of accounts
+            seen.update(pk.int for pk in accounts)
+            # a rejected row still names its account, which a replace must not delete
+            seen.update(_rejected_ids(batch, errors, row))
+        row += len(batch)
+        result["imported"] += len(accounts)
+        result["rejected"] += len(batch) - len(accounts)
+        result["errors"] += map(asdict, errors[:UPLOADED_FILES["max_reported_errors"] - len(result["errors"])])
+        result["batches"] += 1
+        result["inserted"] += len(inserted)
+        result["updated"] += len(rebalanced) + len(renamed)
+        result["unchanged"] += len(accounts) - len(inserted) - len(rebalanced) - len(renamed)
+
+    return result
+
+
+def _rejected_ids(batch: list, errors: list[RowError], first_row: int) -> Iterator[int]:
+    for i in {error.row - first_row for error in errors}:
+        if isinstance(batch[i], dict):
+            pk, _ = _parse_id(batch[i].get("id"))
+            if pk is not None:
+                yield pk.int
+
+
+def delete_missing_accounts(seen: set[int], batch_size: int) -> tuple[int, int]:
+    """
+    Delete the accounts whose id isn't in `seen`, walking them in pk batches.
+
+    Returns how many were deleted and how many were kept because their transactions
+    or ledger entries (the rows with `on_delete=PROTECT`) still point to them.
+    """
+    deleted = protected = 0
+    referenced = _referenced_accounts()
+    last = None
+    while True:
+        accounts = Account.objects.order_by("pk")
+        if last is not None:
+            accounts = accounts.filter(pk__gt=last)
+        pks = list(accounts.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return deleted, protected
+        last = pks[-1]
+
+        missing = [pk for pk in pks if pk.int not in seen]
+        if not missing:
+            continue
+        deletable = list(Account.objects.filter(pk__in=missing).exclude(referenced).values_list("pk", flat=True))
+        Account.objects.filter(pk__in=deletable).delete()
+        invalidate_accounts(deletable)
+        deleted += len(deletable)
+        protected += len(missing) - len(deletable)
+
+
+def _referenced_accounts() -> Q:
+    condition = Q()
+    for relation in Account._meta.get_fields(include_hidden=True):
+        if relation.auto_created and not relation.concrete and relation.on_delete is models.PROTECT:
+            references = relation.related_model._base_manager.filter(**{relation.field.name: OuterRef("pk")})
+            condition |= Q(Exists(references))
+    return condition
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterator
+from uuid import UUID
+
+import django
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from account_transactions.settings import UPLOADED_FILES
+
+from .imports import (
+    batched,
+    check_content_type,
+    is_account_row,
+    line_ranges,
+    parse_line_range,
+    read_accounts,
+    read_csv_header,
+    upsert_accounts,
+)
+from .models import ImportJob
+
+
+LINE_DELIMITED_FORMATS = ["text/csv", "application/x-ndjson"]
+INTERRUPTED_ERROR = "Interrupted: the worker running this job stopped. Rows committed before are kept."
+
+_executor = ThreadPoolExecutor(max_workers=UPLOADED_FILES["job_workers"], thread_name_prefix="import-job")
+
+
+def create_import_job(file: UploadedFile) -> ImportJob:
+    """Copy the upload to the jobs directory so it outlives the request, and record the job."""
+    check_content_type(file.content_type)
+
+    jobs_dir = Path(UPLOADED_FILES["jobs_dir"])
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+
+    job = ImportJob(content_type=file.content_type, file_size=file.size)
+    job.file_path = str(jobs_dir / str(job.id))
+    with open(job.file_path, "wb") as dest:
+        for chunk in file.chunks():
+            dest.write(chunk)
+    job.save()
+    return job
+
+
+def submit_import_job(job: ImportJob) -> Future:
+    return _executor.submit(_run_in_worker, job.id)
+
+
+def recover_import_jobs() -> tuple[list[Future], int]:
+    """
+    Resubmit the pending jobs and fail the running ones that stopped making progress.
+
+    Jobs only live in their process's worker threads, so a restart leaves them
+    pending or running for good. A running job is taken for dead after
+    `UPLOADED_FILES["job_stale_after"]` seconds without a progress update. Returns
+    the futures of the resubmitted jobs and how many jobs were failed.
+    """
+    stale = ImportJob.objects.filter(
+        status=ImportJob.Status.RUNNING,
+        updated_at__lt=timezone.now() - timedelta(seconds=UPLOADED_FILES["job_stale_after"]),
+    )
+    failed = 0
+    for job in stale:
+        failed += ImportJob.objects.filter(pk=job.pk, status=ImportJob.Status.RUNNING).update(
+            status=ImportJob.Status.FAILED, error=INTERRUPTED_ERROR, finished_at=timezone.now(), updated_at=timezone.now()
+        )
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
+
+    pending = ImportJob.objects.filter(status=ImportJob.Status.PENDING).order_by("created_at")
+    return [submit_import_job(job) for job in pending], failed
+
+
+def _run_in_worker(job_id: UUID) -> None:
+    try:
+        run_import_job(job_id)
+    finally:
+        connection.close()
+
+
+def run_import_job(job_id: UUID) -> None:
+    """
+    Parse and apply an import job, committing and recording progress after each chunk.
+
+    Line-delimited files are split into byte ranges parsed in parallel processes;
+    JSON arrays are streamed. Rows are always written from this thread. A job
+    that isn't pending anymore (e.g. resubmitted by `recover_import_jobs` while
+    already claimed) is left alone.
+    """
+    claimed = ImportJob.objects.filter(pk=job_id, status=ImportJob.Status.PENDING).update(
+        status=ImportJob.Status.RUNNING, started_at=timezone.now(), updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = ImportJob.objects.get(pk=job_id)
+
+    try:
+        for rows, rejected, bytes_processed in _parsed_chunks(job):
+            with transaction.atomic():
+                result = upsert_accounts(rows)
+            job.rows_parsed += len(rows) + rejected
+            job.rows_upserted += result["imported"]
+            job.rows_rejected += rejected + result["rejected"]
+            job.bytes_processed = bytes_processed
+            job.save(update_fields=["rows_parsed", "rows_upserted", "rows_rejected", "bytes_processed", "updated_at"])
+        job.status = ImportJob.Status.SUCCEEDED
+    except Exception as e:
+        job.status = ImportJob.Status.FAILED
+        job.error = str(e)
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
+
+
+def _parsed_chunks(job: ImportJob) -> Iterator[tuple[list[dict], int, int]]:
+    if job.content_type not in LINE_DELIMITED_FORMATS:
+        yield from _parsed_stream_chunks(job)
+        return
+
+    start, fieldnames = 0, None
+    if job.content_type == "text/csv":
+        with open(job.file_path, "rb") as f:
+            header = f.readline()
+            start = f.tell()
+        # a quoted field may span lines, which splitting on line boundaries would cut
+        if _has_quotes(job.file_path, start):
+            yield from _parsed_stream_chunks(job)
+            return
+        fieldnames = read_csv_header(header)
+
+    ranges = line_ranges(job.file_path, start, UPLOADED_FILES["job_chunk_size"])
+    processes = UPLOADED_FILES["job_parse_processes"]
+
+    if not processes:
+        for begin, end in ranges:
+            yield *parse_line_range(job.file_path, begin, end, job.content_type, fieldnames), end
+        return
+
+    # spawn keeps the children clean of this process's threads and DB connections
+    with ProcessPoolExecutor(processes, multiprocessing.get_context("spawn"), initializer=django.setup) as pool:
+        pending: deque = deque()
+        for begin, end in ranges:
+            pending.append((end, pool.submit(parse_line_range, job.file_path, begin, end, job.content_type, fieldnames)))
+            # bound the parsed-but-unwritten rows held in memory
+            if len(pending) >= 2 * processes:
+                end, future = pending.popleft()
+                yield *future.result(), end
+        while pending:
+            end, future = pending.popleft()
+            yield *future.result(), end
+
+
+def _has_quotes(path: str, start: int) -> bool:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while chunk := f.read(UPLOADED_FILES["read_chunk_size"]):
+            if b'"' in chunk:
+                return True
+    return False
+
+
+def _parsed_stream_chunks(job: ImportJob) -> Iterator[tuple[list[dict], int, int]]:
+    # spreadsheets are zip archives read out of order, so their progress is approximate
+    with open(job.file_path, "rb") as f:
+        items = read_accounts(f, job.content_type)
+        for batch in batched(items, UPLOADED_FILES["batch_size"]):
+            rows = [item for item in batch if is_account_row(item)]
+            yield rows, len(batch) - len(rows), f.tell()
+
@@ -0,0 +1,159 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+from uuid import UUID
+
+from django.db.models import Q, Sum
+
+from .models import (
+    Account,
+    ArchivedLedgerEntry,
+    ArchivedTransaction,
+    BalanceCheckpoint,
+    LedgerEntry,
+    Transaction,
+    total_balance_expression,
+)
+
+
+def entries_for(obj: Transaction, src_balance: Decimal | None, dest_balance: Decimal | None) -> list[LedgerEntry]:
+    """Ledger entries of a transfer, given the balances it left both accounts with."""
+    return [
+        LedgerEntry(
+            account_id=obj.src_account_id,
+            transaction_id=obj.pk,
+            amount=-obj.amount,
+            balance=src_balance,
+            created_at=obj.created_at,
+        ),
+        LedgerEntry(
+            account_id=obj.dest_account_id,
+            transaction_id=obj.pk,
+            amount=obj.amount,
+            balance=dest_balance,
+            created_at=obj.created_at,
+        ),
+    ]
+
+
+def record_transfer(obj: Transaction) -> list[LedgerEntry]:
+    """
+    Append the ledger entries of a transfer whose balances were already moved in SQL.
+
+    Must run in the transfer's atomic block, after the balance updates, so the
+    balances read here are the ones the transfer produced. A bucketed account's
+    total also includes buckets other transfers may be changing concurrently, which
+    aren't locked, so its entry is left without a balance; `balance_at` replays it.
+    """
+    balances = {
+        pk: None if buckets else balance
+        for pk, buckets, balance in (
+            Account.objects
+            .filter(pk__in=[obj.src_account_id, obj.dest_account_id])
+            .values_list("pk", "buckets", "balance")
+        )
+    }
+    return LedgerEntry.objects.bulk_create(
+        entries_for(obj, balances[obj.src_account_id], balances[obj.dest_account_id])
+    )
+
+
+def balance_at(account_id: UUID, at: datetime) -> Decimal:
+    """
+    Balance of an account at a point in time.
+
+    Resolved from the newest ledger entry or checkpoint at or before `at` (one indexed
+    lookup each), looking in the archive only when no hot entry is old enough. When a
+    checkpoint is newer than the last ledger entry (e.g. after an import), or the entry
+    has no balance (see `record_transfer`), the transfers since the newest known
+    balance are replayed.
+    """
+    entry = _latest_entry(account_id, at)
+    checkpoint = (
+        BalanceCheckpoint.objects
+        .filter(account_id=account_id, created_at__lte=at)
+        .order_by("-created_at")
+        .values_list("created_at", "balance")
+        .first()
+    )
+    replay = entry is not None and entry[1] is None
+    if replay:
+        entry = _latest_entry(account_id, at, balance__isnull=False)
+
+    if entry and (not checkpoint or entry[0] >= checkpoint[0]):
+        return entry[1] + _net_flow(account_id, entry[0], at) if replay else entry[1]
+    if checkpoint:
+        return checkpoint[1] + _net_flow(account_id, checkpoint[0], at)
+
+    # no known balance before `at`: the balance is whatever preceded the first movement
+    for model in (ArchivedLedgerEntry, LedgerEntry):
+        first = (
+            model.objects
+            .filter(account_id=account_id)
+            .order_by("created_at", "id")
+            .values_list("balance", "amount")
+            .first()
+        )
+        if first and first[0] is not None:
+            return first[0] - first[1]
+        if first:
+            break
+    current = Account.objects.values_list(total_balance_expression(), flat=True).get(pk=account_id)
+    return current - _net_flow(account_id, at) if first else current
+
+
+def _latest_entry(account_id: UUID, at: datetime, **filters) -> tuple | None:
+    """`(created_at, balance)` of the newest entry at or before `at`, archived ones only if no hot one is."""
+    for model in (LedgerEntry, ArchivedLedgerEntry):
+        entry = (
+            model.objects
+            .filter(account_id=account_id, created_at__lte=at, **filters)
+            .order_by("-created_at", "-id")
+            .values_list("created_at", "balance")
+            .first()
+        )
+        if entry:
+            return entry
+    return None
+
+
+def _net_flow(account_id: UUID, since: datetime, until: datetime | None = None) -> Decimal:
+    window = Q(created_at__gt=since) if until is None else Q(created_at__gt=since, created_at__lte=until)
+    flow = Decimal(0)
+    for model in (ArchivedTransaction, Transaction):
+        inflow = model.objects.filter(window, dest_account_id=account_id).aggregate(total=Sum("amount"))["total"]
+        outflow = model.objects.filter(window, src_account_id=account_id).aggregate(total=Sum("amount"))["total"]
+        flow += (inflow or 0) - (outflow or 0)
+    return flow
+
+
+def checkpoint_accounts(account_ids: Iterable[UUID]) -> None:
+    """
+    Snapshot the balances of accounts just changed outside transfers (imports, repairs,
+    admin edits), so `balance_at` sees the change from then on. Call it in the
+    transaction that changed them.
+    """
+    account_ids = list(account_ids)
+    if account_ids:
+        BalanceCheckpoint.objects.bulk_create(
+            BalanceCheckpoint(account_id=pk, balance=balance)
+            for pk, balance in Account.objects.filter(pk__in=account_ids).values_list("pk", total_balance_expression())
+        )
+
+
+def checkpoint_balances(batch_size: int = 5000) -> int:
+    """Snapshot every account balance, returning how many were taken."""
+    created = 0
+    last_id = None
+    while True:
+        accounts = Account.objects.order_by("pk")
+        if last_id is not None:
+            accounts = accounts.filter(pk__gt=last_id)
+        batch = list(accounts.values_list("pk", total_balance_expression())[:batch_size])
+        if not batch:
+            return created
+        BalanceCheckpoint.objects.bulk_create(
+            BalanceCheckpoint(account_id=pk, balance=balance) for pk, balance in batch
+        )
+        created += len(batch)
+        last_id = batch[-1][0]
@@ -0,0 +1,73 @@
+import os
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.imports import iter_csv, iter_json_array, iter_ndjson
+from accounts.models import CENT, Account, total_balance_expression
+from accounts.serializers import BatchTransferSerializer
+from accounts.transfers import apply_transfers, net_transfers
+
+
+TRANSFER_KEYS = ["src_account", "dest_account", "amount"]
+READERS = {
+    ".csv": lambda text: iter_csv(text, TRANSFER_KEYS),
+    ".json": iter_json_array,
+    ".ndjson": iter_ndjson,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply a file of transfers (CSV, JSON array or NDJSON with src_account, dest_account "
+        "and amount) in order, netted into one balance update per account."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--best-effort", action="store_true", help="Skip invalid transfers instead of applying none.")
+        parser.add_argument("--dry-run", action="store_true", help="Print the net balance changes without writing them.")
+
+    def handle(self, *args, **options):
+        reader = READERS.get(os.path.splitext(options["path"])[1].lower())
+        if reader is None:
+            raise CommandError(f"Unsupported file type, expected one of: {', '.join(READERS)}")
+        try:
+            with open(options["path"], encoding="utf-8") as text:
+                valid, invalid = BatchTransferSerializer.validate_items(reader(text))
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+        except KeyError:
+            raise CommandError(f"CSV header must contain: {', '.join(TRANSFER_KEYS)}")
+
+        atomic = not options["best_effort"]
+        if options["dry_run"]:
+            account_ids = {t.src_account for _, t in valid} | {t.dest_account for _, t in valid}
+            balances = {
+                pk: Decimal(balance).quantize(CENT)
+                for pk, balance in Account.objects.filter(pk__in=account_ids).values_list("pk", total_balance_expression())
+            }
+            netting = net_transfers(valid, balances)
+            results = netting.results
+            deltas = netting.deltas
+        else:
+            results = [] if atomic and invalid else apply_transfers(valid, atomic=atomic)
+            deltas = None
+
+        failed = sorted(invalid + [r for r in results if not r.ok], key=lambda r: r.index)
+        for r in failed:
+            self.stdout.write(f"{r.index}: {r.errors}")
+        if atomic and failed:
+            raise CommandError(f"{len(failed)} invalid transfers, none applied.")
+
+        applied = len(valid) + len(invalid) - len(failed)
+        if deltas is None:
+            self.stdout.write(self.style.SUCCESS(f"{applied} transfers applied, {len(failed)} skipped."))
+            return
+        for pk, delta in deltas.items():
+            self.stdout.write(f"{pk}: {delta:+}")
+        self.stdout.write(
+            self.style.WARNING(
+                f"Dry run: {applied} transfers would change {len(deltas)} accounts, {len(failed)} skipped."
+            )
+        )
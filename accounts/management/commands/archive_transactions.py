@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.archive import archive_transactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Move transactions older than the archive horizon, with their ledger entries, "
+        "to the archive tables in batches."
+    )
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument("--before", help="Archive transactions created before this ISO 8601 datetime.")
+        cutoff.add_argument("--days", type=int, help="Archive transactions older than this many days.")
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        before = None
+        if options["before"]:
+            before = parse_datetime(options["before"])
+            if before is None:
+                raise CommandError(f"Invalid datetime: {options['before']}")
+            if timezone.is_naive(before):
+                before = timezone.make_aware(before)
+        elif options["days"] is not None:
+            before = timezone.now() - timedelta(days=options["days"])
+
+        result = archive_transactions(before=before, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.transactions} transactions created before {result.before.isoformat()} archived "
+            f"({result.ledger_entries} ledger entries, {result.checkpoints} balance checkpoints)."
+        ))
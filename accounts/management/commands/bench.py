@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks.suite import BENCHMARKS, Options, compare, run_benchmarks, to_json
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark transfers, account creation, file and spreadsheet imports, list pages and account lookups "
+        "against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("benchmarks", nargs="*", choices=[[], *BENCHMARKS], help="Default: all of them.")
+        parser.add_argument("--iterations", type=int, default=Options.iterations)
+        parser.add_argument("--import-sizes", type=int, nargs="+", default=list(Options.import_sizes))
+        parser.add_argument("--table-size", type=int, default=Options.table_size)
+        parser.add_argument("--output", type=Path, help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", type=Path, help="Fail if the results regress against this JSON file.")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2,
+            help="Fraction latency and throughput may regress by before failing (default: 0.2).",
+        )
+
+    def handle(self, *args, **options):
+        names = options["benchmarks"] or list(BENCHMARKS)
+        baseline = json.loads(options["baseline"].read_text()) if options["baseline"] else None
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            results = run_benchmarks(names, Options(
+                iterations=options["iterations"],
+                import_sizes=tuple(options["import_sizes"]),
+                table_size=options["table_size"],
+            ))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'benchmark':<24} {'throughput':>14} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak MiB':>9}")
+        for result in results:
+            throughput = f"{result.throughput:.0f} {result.unit}/s"
+            peak = "-" if result.peak_mib is None else f"{result.peak_mib:.1f}"
+            self.stdout.write(
+                f"{result.name:<24} {throughput:>14} {result.p50_ms:>9.2f} {result.p99_ms:>9.2f} {result.queries:>8} {peak:>9}"
+            )
+
+        output = to_json(results)
+        if options["output"]:
+            options["output"].write_text(output)
+
+        if baseline is not None:
+            regressions = compare(json.loads(output), baseline, options["threshold"])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
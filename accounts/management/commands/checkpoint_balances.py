@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.ledger import checkpoint_balances
+
+
+class Command(BaseCommand):
+    help = "Snapshot every account balance so point-in-time balance queries stay cheap."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        created = checkpoint_balances(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{created} balance checkpoints created."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys older than IDEMPOTENCY[\"ttl\"], in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        purged = purge_expired_keys(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{purged} expired idempotency keys purged."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the transfer volume rollups from every transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        read = rebuild_rollups(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt from {read} transactions."))
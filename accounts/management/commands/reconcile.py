@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from accounts.reconciliation import reconcile
+
+
+class Command(BaseCommand):
+    help = "Check account balances against the transactions since the last reconciliation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repair", action="store_true", help="Reset drifted balances to their expected value.")
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        report = reconcile(repair=options["repair"], batch_size=options["batch_size"])
+        run = report.run
+
+        self.stdout.write(
+            f"{run.transactions} transactions, {run.accounts_updated} accounts updated, "
+            f"{run.accounts_baselined} accounts baselined."
+        )
+        for drift in report.drifts:
+            self.stdout.write(f"{drift.account_id}: balance {drift.balance}, expected {drift.expected}")
+
+        if not run.drifted:
+            self.stdout.write(self.style.SUCCESS("No drifted accounts."))
+        elif run.repaired:
+            self.stdout.write(self.style.WARNING(f"{run.drifted} drifted accounts, {run.repaired} repaired."))
+        else:
+            self.stdout.write(self.style.ERROR(f"{run.drifted} drifted accounts."))
@@ -0,0 +1,16 @@
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+
+from accounts.jobs import recover_import_jobs
+
+
+class Command(BaseCommand):
+    help = "Run the import jobs left pending by a restart and fail the running ones that stopped."
+
+    def handle(self, *args, **options):
+        futures, failed = recover_import_jobs()
+        self.stdout.write(f"{failed} interrupted jobs failed, {len(futures)} pending jobs resubmitted.")
+        # the jobs run in this process's worker threads
+        wait(futures)
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,23 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.buckets import set_buckets
+from accounts.models import Account
+
+
+class Command(BaseCommand):
+    help = "Spread a hot account's balance over N sub-balance buckets (0 turns bucketing off)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("account_id")
+        parser.add_argument("buckets", type=int)
+
+    def handle(self, *args, **options):
+        if options["buckets"] < 0:
+            raise CommandError("The number of buckets can't be negative.")
+        try:
+            account = set_buckets(options["account_id"], options["buckets"])
+        except (Account.DoesNotExist, ValidationError):
+            raise CommandError(f"Account {options['account_id']} not found.")
+
+        self.stdout.write(self.style.SUCCESS(f"{account.id} now has {account.buckets} buckets."))
@@ -0,0 +1,227 @@
+"""
+Request metrics in the Prometheus text format.
+
+Each process keeps its metrics in memory and, when `METRICS["dir"]` is set, writes
+them to `<dir>/<pid>.json` at most every `METRICS["flush_interval"]` seconds.
+`/metrics` sums the files of every process, so it reports the same totals whichever
+worker serves it (other workers' figures lag by up to one flush interval). Files of
+exited workers are kept so counters never go down; clear the directory on deploy.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import connection
+from django.http import HttpResponse
+
+from account_transactions.settings import METRICS
+
+from .transfers import ACCOUNT_NOT_FOUND_ERROR, INSUFFICIENT_BALANCE_ERROR, SAME_ACCOUNT_ERROR
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# name: (type, help, histogram buckets)
+DEFINITIONS = {
+    "http_requests_total": ("counter", "Requests by view, method and status.", None),
+    "http_request_duration_seconds": ("histogram", "Request latency by view.", LATENCY_BUCKETS),
+    "http_response_size_bytes": ("histogram", "Response body size by view (streamed responses excluded).", SIZE_BUCKETS),
+    "db_queries_total": ("counter", "SQL queries run while handling requests, by view.", None),
+    "db_query_duration_seconds_total": ("counter", "Time spent in SQL queries, by view.", None),
+    "transfers_total": ("counter", "Transfers by result and rejection reason.", None),
+}
+
+REJECTION_REASONS = {
+    SAME_ACCOUNT_ERROR: "same_account",
+    INSUFFICIENT_BALANCE_ERROR: "insufficient_balance",
+}
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[tuple, float] = defaultdict(float)
+        # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self.histograms: dict[tuple, list[float]] = {}
+        self.flushed_at = time.monotonic()
+
+    def inc(self, name: str, labels: tuple, value: float = 1) -> None:
+        with self.lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        buckets = DEFINITIONS[name][2]
+        with self.lock:
+            series = self.histograms.get((name, labels))
+            if series is None:
+                series = self.histograms[(name, labels)] = [0.0] * (len(buckets) + 2)
+            series[bisect_left(buckets, value)] += 1
+            series[-1] += value
+
+    def dump(self) -> dict:
+        with self.lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, list(labels), series] for (name, labels), series in self.histograms.items()],
+            }
+
+    def merge(self, data: dict) -> None:
+        for name, labels, value in data["counters"]:
+            self.counters[(name, _labels(labels))] += value
+        for name, labels, series in data["histograms"]:
+            key = (name, _labels(labels))
+            merged = self.histograms.setdefault(key, [0.0] * len(series))
+            for i, value in enumerate(series):
+                merged[i] += value
+
+    def flush(self, force: bool = False) -> None:
+        """Write this process's metrics to the shared directory, if one is configured."""
+        if not METRICS["dir"]:
+            return
+        now = time.monotonic()
+        if not force and now - self.flushed_at < METRICS["flush_interval"]:
+            return
+        self.flushed_at = now
+
+        os.makedirs(METRICS["dir"], exist_ok=True)
+        path = os.path.join(METRICS["dir"], f"{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.dump(), f)
+        os.replace(f"{path}.tmp", path)
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
+
+
+def _labels(labels) -> tuple:
+    return tuple(tuple(pair) for pair in labels)
+
+
+def collect() -> Registry:
+    """Metrics of every process, or of this one when no shared directory is configured."""
+    if not METRICS["dir"]:
+        return registry
+
+    registry.flush(force=True)
+    total = Registry()
+    for entry in os.scandir(METRICS["dir"]):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                total.merge(json.load(f))
+        except (OSError, ValueError):
+            # the worker exited or is replacing the file
+            continue
+    return total
+
+
+def render(metrics: Registry) -> str:
+    series_by_name = defaultdict(list)
+    for (name, labels), value in metrics.counters.items():
+        series_by_name[name].append((labels, value))
+    for (name, labels), series in metrics.histograms.items():
+        series_by_name[name].append((labels, series))
+
+    lines = []
+    for name, (kind, help, buckets) in DEFINITIONS.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series_by_name.get(name, []), key=lambda s: s[0]):
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0.0
+            for bound, count in zip([*buckets, "+Inf"], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {_format_value(cumulative)}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def rejection_reason(errors) -> str:
+    """Label for a rejected transfer, from the validation errors it was rejected with."""
+    messages = errors.values() if isinstance(errors, dict) else [errors]
+    flat = [str(message) for group in messages for message in (group if isinstance(group, list) else [group])]
+    for message in flat:
+        if message in REJECTION_REASONS:
+            return REJECTION_REASONS[message]
+    not_found = ACCOUNT_NOT_FOUND_ERROR.split("{pk}")
+    if any(message.startswith(not_found[0]) and message.endswith(not_found[1]) for message in flat):
+        return "account_not_found"
+    return "invalid"
+
+
+def record_transfer_result(errors=None, rolled_back: bool = False) -> None:
+    """Count a transfer; valid transfers of a rolled back atomic batch are rejected too."""
+    if rolled_back:
+        registry.inc("transfers_total", (("result", "rejected"), ("reason", "rolled_back")))
+    elif errors is None:
+        registry.inc("transfers_total", (("result", "succeeded"),))
+    else:
+        registry.inc("transfers_total", (("result", "rejected"), ("reason", rejection_reason(errors))))
+
+
+class MetricsMiddleware:
+    """Records latency, response size and SQL queries of every request, by view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0, 0.0]
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = _view_name(request)
+        registry.inc("http_requests_total", (("view", view), ("method", request.method), ("status", str(response.status_code))))
+        registry.observe("http_request_duration_seconds", (("view", view),), elapsed)
+        registry.inc("db_queries_total", (("view", view),), queries[0])
+        registry.inc("db_query_duration_seconds_total", (("view", view),), queries[1])
+        if not response.streaming:
+            registry.observe("http_response_size_bytes", (("view", view),), len(response.content))
+        registry.flush()
+        return response
+
+
+def _view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return getattr(match.func, "view_class", match.func).__name__
+
+
+def metrics_view(request):
+    return HttpResponse(render(collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:40
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_transaction_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('content_type', models.CharField(max_length=64)),
+                ('file_path', models.CharField(max_length=1024)),
+                ('file_size', models.PositiveBigIntegerField(default=0)),
+                ('bytes_processed', models.PositiveBigIntegerField(default=0)),
+                ('rows_parsed', models.PositiveBigIntegerField(default=0)),
+                ('rows_upserted', models.PositiveBigIntegerField(default=0)),
+                ('rows_rejected', models.PositiveBigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at', 'id'], name='transaction_created_id_idx'),
+        ),
+    ]
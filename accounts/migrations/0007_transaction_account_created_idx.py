@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_transaction_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='dest_account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.account'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='src_account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.account'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['src_account', 'created_at', 'id'], name='transaction_src_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['dest_account', 'created_at', 'id'], name='transaction_dest_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.5 on 2026-10-18 08:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciledBalance',
+            fields=[
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='accounts.account')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watermark_created_at', models.DateTimeField(null=True)),
+                ('watermark_id', models.UUIDField(null=True)),
+                ('transactions', models.PositiveBigIntegerField(default=0)),
+                ('accounts_baselined', models.PositiveBigIntegerField(default=0)),
+                ('accounts_updated', models.PositiveBigIntegerField(default=0)),
+                ('drifted', models.PositiveBigIntegerField(default=0)),
+                ('repaired', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:05
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='buckets',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BalanceBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.account')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='balancebucket',
+            constraint=models.UniqueConstraint(fields=('account', 'index'), name='bucket_account_index_unique'),
+        ),
+    ]
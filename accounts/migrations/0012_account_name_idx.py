@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_balancebucket'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='account',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:23
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_account_name_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyVolume',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('transfers', models.PositiveBigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=20)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AccountDailyVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('transfers_in', models.PositiveBigIntegerField(default=0)),
+                ('transfers_out', models.PositiveBigIntegerField(default=0)),
+                ('inflow', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=20)),
+                ('outflow', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=20)),
+                ('account', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='account_volume_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='accountdailyvolume',
+            constraint=models.UniqueConstraint(fields=('account', 'day'), name='account_volume_account_day_unique'),
+        ),
+    ]
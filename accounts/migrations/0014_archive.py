@@ -0,0 +1,51 @@
+# Generated by Django 4.2.5 on 2026-10-18 10:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_volume_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('dest_account', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.account')),
+                ('src_account', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.account')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedLedgerEntry',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('account', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.account')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.archivedtransaction')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['created_at', 'id'], name='archived_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['src_account', 'created_at', 'id'], name='archived_src_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['dest_account', 'created_at', 'id'], name='archived_dest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedledgerentry',
+            index=models.Index(fields=['account', 'created_at', 'id'], name='archived_ledger_account_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def copy_daily_volume(apps, schema_editor):
+    old = apps.get_model("accounts", "OldDailyVolume")
+    new = apps.get_model("accounts", "DailyVolume")
+    new.objects.bulk_create(
+        (new(day=row.day, slot=0, transfers=row.transfers, amount=row.amount) for row in old.objects.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_archive'),
+        # RenameModel renames the model's content type too
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        # the day stops being the primary key, so the table is rebuilt
+        migrations.RenameModel('DailyVolume', 'OldDailyVolume'),
+        migrations.CreateModel(
+            name='DailyVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('slot', models.PositiveSmallIntegerField(default=0)),
+                ('transfers', models.PositiveBigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'slot'), name='volume_day_slot_unique')],
+            },
+        ),
+        migrations.RunPython(copy_daily_volume, migrations.RunPython.noop),
+        migrations.DeleteModel('OldDailyVolume'),
+        migrations.AddField(
+            model_name='accountdailyvolume',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RemoveConstraint(
+            model_name='accountdailyvolume',
+            name='account_volume_account_day_unique',
+        ),
+        migrations.AddConstraint(
+            model_name='accountdailyvolume',
+            constraint=models.UniqueConstraint(fields=('account', 'day', 'slot'), name='account_volume_day_slot_unique'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-18 10:20
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def checkpoint_bucketed_accounts(apps, schema_editor):
+    # their transfers stop recording running balances, and are replayed from here
+    Account = apps.get_model("accounts", "Account")
+    BalanceBucket = apps.get_model("accounts", "BalanceBucket")
+    BalanceCheckpoint = apps.get_model("accounts", "BalanceCheckpoint")
+    totals = dict(
+        BalanceBucket.objects.values("account_id").annotate(total=Sum("balance")).values_list("account_id", "total")
+    )
+    BalanceCheckpoint.objects.bulk_create(
+        BalanceCheckpoint(account_id=pk, balance=balance + totals.get(pk, 0))
+        for pk, balance in Account.objects.filter(buckets__gt=0).values_list("pk", "balance")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_rollup_slots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedledgerentry',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(checkpoint_bucketed_accounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-18 10:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_importjob_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accountdailyvolume',
+            name='account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.account'),
+        ),
+        migrations.AlterField(
+            model_name='balancecheckpoint',
+            name='account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.account'),
+        ),
+    ]
@@ -1,34 +1,252 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.utils.encoders import JSONEncoder
 from decimal import Decimal
 from uuid import uuid4
 
 
 DECIMAL_MAX_DIGITS = 10
 DECIMAL_PLACES = 2
+# sums of many amounts, e.g. a day's transfer volume
+TOTAL_MAX_DIGITS = 20
+CENT = Decimal(1).scaleb(-DECIMAL_PLACES)
+
+
+def total_balance_expression():
+    """An account's balance plus its sub-balance buckets, as SQL; plain accounts skip the bucket lookup."""
+    buckets = (
+        BalanceBucket.objects
+        .filter(account=OuterRef("pk"))
+        .values("account")
+        .annotate(total=Sum("balance"))
+        .values("total")
+    )
+    return Case(
+        When(buckets=0, then=F("balance")),
+        default=Round(F("balance") + Coalesce(Subquery(buckets), Value(Decimal(0))), DECIMAL_PLACES),
+        output_field=models.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES),
+    )
+
+
+class AccountQuerySet(models.QuerySet):
+    def with_total_balance(self):
+        return self.annotate(total_balance=total_balance_expression())
 
 
 class Account(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
-    name = models.CharField(max_length=255)
+    # indexed for the admin's prefix search
+    name = models.CharField(max_length=255, db_index=True)
     balance = models.DecimalField(
         max_digits=DECIMAL_MAX_DIGITS,
         decimal_places=DECIMAL_PLACES,
         default=Decimal(0),
         validators=[MinValueValidator(0)],
     )
+    # 0 keeps the whole balance in this row; N > 0 spreads it over N BalanceBucket rows
+    buckets = models.PositiveSmallIntegerField(default=0)
+
+    objects = AccountQuerySet.as_manager()
 
     def __str__(self) -> str:
-        return f"{self.name} ({self.balance})"
+        # a bucketed account's row holds only part of its balance
+        return self.name if self.buckets else f"{self.name} ({self.balance})"
+
+    @cached_property
+    def total_balance(self) -> Decimal:
+        """Balance including the buckets, read at most once per instance (or annotated up front)."""
+        if not self.buckets:
+            return self.balance
+        total = BalanceBucket.objects.filter(account=self).aggregate(total=Sum("balance"))["total"]
+        return self.balance + (total or 0)
 
 
 class Transaction(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
-    src_account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="+")
-    dest_account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="+")
+    # covered by the composite (account, created_at, id) indexes below
+    src_account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="+", db_index=False)
+    dest_account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="+", db_index=False)
     amount = models.DecimalField(
         max_digits=DECIMAL_MAX_DIGITS,
         decimal_places=DECIMAL_PLACES,
         validators=[MinValueValidator(1)],
     )
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="transaction_created_id_idx"),
+            models.Index(fields=["src_account", "created_at", "id"], name="transaction_src_created_idx"),
+            models.Index(fields=["dest_account", "created_at", "id"], name="transaction_dest_created_idx"),
+        ]
+
+
+class BalanceBucket(models.Model):
+    """
+    A share of a hot account's balance.
+
+    Transfers touching a bucketed account update one of its buckets instead of the
+    account row, so concurrent transfers to the same account rarely wait on one lock.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="+")
+    index = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(
+        max_digits=DECIMAL_MAX_DIGITS,
+        decimal_places=DECIMAL_PLACES,
+        default=Decimal(0),
+        validators=[MinValueValidator(0)],
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["account", "index"], name="bucket_account_index_unique"),
+        ]
+
+
+class ImportJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid4)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    content_type = models.CharField(max_length=64)
+    file_path = models.CharField(max_length=1024)
+    file_size = models.PositiveBigIntegerField(default=0)
+    bytes_processed = models.PositiveBigIntegerField(default=0)
+    rows_parsed = models.PositiveBigIntegerField(default=0)
+    rows_upserted = models.PositiveBigIntegerField(default=0)
+    rows_rejected = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # bumped with every progress update, so a job whose worker died can be told apart
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class LedgerEntry(models.Model):
+    """One balance movement of an account, with the balance it resulted in."""
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="+", db_index=False)
+    transaction = models.ForeignKey(Transaction, on_delete=models.PROTECT, related_name="+")
+    amount = models.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES)
+    # null when the balance wasn't known without locking all of a bucketed account's buckets
+    balance = models.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "created_at", "id"], name="ledger_account_created_idx"),
+        ]
+
+
+class BalanceCheckpoint(models.Model):
+    """Snapshot of an account balance, covering changes made outside transfers (e.g. imports)."""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="+", db_index=False)
+    balance = models.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "created_at"], name="checkpoint_account_created_idx"),
+        ]
+
+
+class ReconciledBalance(models.Model):
+    """Expected balance of an account as of the latest reconciliation watermark."""
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    balance = models.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES)
+
+
+class ReconciliationRun(models.Model):
+    watermark_created_at = models.DateTimeField(null=True)
+    watermark_id = models.UUIDField(null=True)
+    transactions = models.PositiveBigIntegerField(default=0)
+    accounts_baselined = models.PositiveBigIntegerField(default=0)
+    accounts_updated = models.PositiveBigIntegerField(default=0)
+    drifted = models.PositiveBigIntegerField(default=0)
+    repaired = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(max_length=255, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class DailyVolume(models.Model):
+    """
+    Part of the transfers made on a day (in TIME_ZONE), updated in the same transaction
+    as every transfer.
+
+    A day is spread over `ROLLUPS["slots"]` rows, each transfer adding to a random
+    one, so concurrent transfers rarely wait on the same row lock; reads sum them.
+    """
+    day = models.DateField()
+    slot = models.PositiveSmallIntegerField(default=0)
+    transfers = models.PositiveBigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=TOTAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES, default=Decimal(0))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "slot"], name="volume_day_slot_unique"),
+        ]
+
+
+class AccountDailyVolume(models.Model):
+    """Money an account received and sent on a day, maintained (and slotted) like `DailyVolume`."""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="+", db_index=False)
+    day = models.DateField()
+    slot = models.PositiveSmallIntegerField(default=0)
+    transfers_in = models.PositiveBigIntegerField(default=0)
+    transfers_out = models.PositiveBigIntegerField(default=0)
+    inflow = models.DecimalField(max_digits=TOTAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES, default=Decimal(0))
+    outflow = models.DecimalField(max_digits=TOTAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES, default=Decimal(0))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["account", "day", "slot"], name="account_volume_day_slot_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="account_volume_day_idx"),
+        ]
+
+
+class ArchivedTransaction(models.Model):
+    """A transaction moved out of `Transaction` by `archive_transactions`, with its original id."""
+    id = models.UUIDField(primary_key=True)
+    src_account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="+", db_index=False)
+    dest_account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="+", db_index=False)
+    amount = models.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="archived_created_id_idx"),
+            models.Index(fields=["src_account", "created_at", "id"], name="archived_src_created_idx"),
+            models.Index(fields=["dest_account", "created_at", "id"], name="archived_dest_created_idx"),
+        ]
+
+
+class ArchivedLedgerEntry(models.Model):
+    """A ledger entry archived together with its transaction."""
+    id = models.BigIntegerField(primary_key=True)
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="+", db_index=False)
+    transaction = models.ForeignKey(ArchivedTransaction, on_delete=models.PROTECT, related_name="+")
+    amount = models.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES)
+    balance = models.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES, null=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "created_at", "id"], name="archived_ledger_account_idx"),
+        ]
@@ -0,0 +1,215 @@
+import base64
+import binascii
+import itertools
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from account_transactions.settings import ADMIN_PAGINATION, PAGINATION
+
+
+def keyset_after(fields: list[str], values: list, descending: bool = False) -> Q:
+    """Lexicographic `(f1, f2, ...) > (v1, v2, ...)` (or `<` when descending)."""
+    lookup = "lt" if descending else "gt"
+    condition = Q()
+    for i, (field, value) in enumerate(zip(fields, values)):
+        term = Q(**{f"{field}__{lookup}": value})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            term &= Q(**{prev_field: prev_value})
+        condition |= term
+    # redundant bound on the leading field lets the database use an index range scan
+    return Q(**{f"{fields[0]}__{lookup}e": values[0]}) & condition
+
+
+class KeysetChain:
+    """
+    Querysets covering consecutive ranges of the same keyset, oldest first, such as
+    archived transactions followed by the hot table's.
+
+    `KeysetPagination` pages through them as one, reading a later part only when the
+    page isn't filled by the earlier ones.
+    """
+
+    def __init__(self, *querysets):
+        self.querysets = list(querysets)
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.querysets)
+
+    def count(self) -> int:
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def values(self, *fields) -> "KeysetChain":
+        return KeysetChain(*(queryset.values(*fields) for queryset in self.querysets))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique composite key such as `(created_at, id)`.
+
+    Pages are fetched with `WHERE (created_at, id) < cursor ORDER BY ... LIMIT n`,
+    so page N costs the same as page 1 given an index on the ordering fields, and
+    pages stay stable while new rows are written. The total count is optional.
+    """
+    ordering = ("-created_at", "-id")
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = PAGINATION["max_page_size"]
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.count = queryset.count() if self.include_count(request) else None
+
+        fields = [field.lstrip("-") for field in self.ordering]
+        descending = self.ordering[0].startswith("-")
+        reverse = cursor is not None and cursor["r"]
+        scan_descending = descending != reverse
+
+        parts = queryset.querysets if isinstance(queryset, KeysetChain) else [queryset]
+        if scan_descending:
+            parts = parts[::-1]
+
+        # later parts are only read once the earlier ones run out of rows
+        rows = []
+        for part in parts:
+            part = part.order_by(*[("-" if scan_descending else "") + field for field in fields])
+            if cursor is not None:
+                try:
+                    part = part.filter(keyset_after(fields, cursor["p"], scan_descending))
+                except ValidationError:
+                    raise NotFound(self.invalid_cursor_message)
+            rows.extend(part[:self.page_size + 1 - len(rows)])
+            if len(rows) > self.page_size:
+                break
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "count": {"type": "integer"},
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def include_count(self, request) -> bool:
+        return request.query_params.get(self.count_query_param, "true").lower() not in ("0", "false", "no")
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self) -> str | None:
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.position(self.page[0]), reverse=True)
+
+    def position(self, row) -> list[str]:
+        fields = [field.lstrip("-") for field in self.ordering]
+        values = [row[field] if isinstance(row, dict) else getattr(row, field) for field in fields]
+        return [value.isoformat() if hasattr(value, "isoformat") else str(value) for value in values]
+
+    def encode_cursor(self, position: list[str], reverse: bool) -> str:
+        token = base64.urlsafe_b64encode(json.dumps({"p": position, "r": reverse}).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request) -> dict | None:
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if len(cursor["p"]) != len(self.ordering) or not isinstance(cursor["r"], bool):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+
+def estimated_count(queryset) -> int:
+    """
+    Row count of the queryset's table from the database's own bookkeeping, without scanning it.
+
+    Up to `ADMIN_PAGINATION["count_limit"]` rows are counted exactly, so small tables
+    (and emptied ones) report their real size. Past that, PostgreSQL's planner
+    estimate, or the span of SQLite's rowids: exact while rows are only removed
+    oldest first, as archiving does, and otherwise an upper bound. Other databases,
+    and tables PostgreSQL hasn't analyzed yet, fall back to an exact count.
+    """
+    limit = ADMIN_PAGINATION["count_limit"]
+    counted = queryset.values("pk")[:limit].count()
+    if counted < limit:
+        return counted
+
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"SELECT MAX(rowid) - MIN(rowid) + 1 FROM {table}")
+            return max(cursor.fetchone()[0] or 0, counted)
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            estimate = cursor.fetchone()[0]
+            if estimate >= 0:
+                return max(estimate, counted)
+    return queryset.count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for tables too large to count on every page.
+
+    An unfiltered list is counted with `estimated_count`; a filtered one is counted up
+    to `ADMIN_PAGINATION["count_limit"]` rows, so the count never scans more than that.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if not queryset.query.where:
+            return estimated_count(queryset)
+        return queryset.values("pk")[:ADMIN_PAGINATION["count_limit"]].count()
@@ -0,0 +1,186 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from typing import Iterator
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from account_transactions.settings import RECONCILIATION
+
+from .buckets import locked_bucket_totals, reset_buckets
+from .cache import invalidate_accounts
+from .imports import batched
+from .ledger import checkpoint_accounts
+from .models import CENT, Account, ReconciledBalance, ReconciliationRun, Transaction, total_balance_expression
+from .pagination import keyset_after
+
+
+WATERMARK_FIELDS = ["created_at", "id"]
+
+
+@dataclass
+class Drift:
+    account_id: UUID
+    balance: Decimal
+    expected: Decimal
+
+
+@dataclass
+class ReconciliationReport:
+    run: ReconciliationRun
+    drifts: list[Drift] = field(default_factory=list)
+
+
+def reconcile(repair: bool = False, batch_size: int | None = None) -> ReconciliationReport:
+    """Check that every balance equals its opening balance plus the transactions since the last run."""
+    batch_size = batch_size or RECONCILIATION["batch_size"]
+    # created_at is set before a transfer commits, so recent ones could still commit behind the watermark
+    settled = timezone.now() - timedelta(seconds=RECONCILIATION["settle_seconds"])
+
+    with transaction.atomic():
+        previous = ReconciliationRun.objects.order_by("-id").first()
+        newest = (
+            Transaction.objects.filter(created_at__lte=settled)
+            .order_by("-created_at", "-id")
+            .values_list(*WATERMARK_FIELDS)
+            .first()
+        )
+        if newest is None and previous and previous.watermark_created_at:
+            # nothing settled since: keep the previous watermark
+            newest = (previous.watermark_created_at, previous.watermark_id)
+        run = ReconciliationRun(
+            watermark_created_at=newest[0] if newest else None,
+            watermark_id=newest[1] if newest else None,
+        )
+
+        # on the first run every account is baselined, so there is nothing to aggregate
+        if previous:
+            window = Transaction.objects.filter(created_at__lte=settled)
+            if previous.watermark_created_at:
+                window = window.filter(keyset_after(WATERMARK_FIELDS, [previous.watermark_created_at, previous.watermark_id]))
+            if newest:
+                # transfers committed while this run is in progress belong to the next one
+                window = window.exclude(keyset_after(WATERMARK_FIELDS, list(newest)))
+            flows, run.transactions = _net_flows(window)
+
+            # accounts without an expected balance yet are skipped here and baselined after
+            run.accounts_updated = _apply_flows(flows, batch_size)
+        run.accounts_baselined = _baseline_new_accounts(batch_size, newest)
+
+        report = ReconciliationReport(run)
+        for batch in _drifted_accounts(batch_size, newest):
+            run.drifted += len(batch)
+            report.drifts.extend(batch[:RECONCILIATION["report_limit"] - len(report.drifts)])
+            if repair:
+                repaired = _repair(batch, newest)
+                reset_buckets(repaired)
+                checkpoint_accounts(repaired)
+                invalidate_accounts(repaired)
+                run.repaired += len(repaired)
+
+        run.save()
+
+    return report
+
+
+def _repair(drifts: list[Drift], watermark: tuple | None) -> list[UUID]:
+    """
+    Set drifted accounts back to their expected balance, returning the ones changed.
+
+    The accounts and their buckets are locked, then checked again: a transfer
+    committed since the drift was found is neither overwritten nor taken for drift.
+    """
+    expected = {d.account_id: d.expected for d in drifts}
+    accounts = Account.objects.select_for_update().in_bulk(list(expected))
+    totals = locked_bucket_totals(accounts)
+
+    newer = _newer_than(watermark)
+    moved = set(newer.filter(src_account__in=accounts).values_list("src_account", flat=True))
+    moved.update(newer.filter(dest_account__in=accounts).values_list("dest_account", flat=True))
+
+    repaired = [
+        Account(pk=pk, balance=expected[pk])
+        for pk, account in accounts.items()
+        if pk not in moved and account.balance + totals.get(pk, 0) != expected[pk]
+    ]
+    Account.objects.bulk_update(repaired, ["balance"])
+    return [account.pk for account in repaired]
+
+
+def _baseline_new_accounts(batch_size: int, watermark: tuple | None) -> int:
+    new_accounts = (
+        Account.objects
+        .filter(~Exists(ReconciledBalance.objects.filter(account=OuterRef("pk"))))
+        .values_list("pk", total_balance_expression())
+    )
+    newer = _newer_than(watermark)
+    baselined = 0
+    while batch := list(new_accounts[:batch_size]):
+        # the balance already includes the transactions past the watermark, which the next run adds
+        pks = [pk for pk, _ in batch]
+        flows, _ = _net_flows(newer.filter(Q(src_account__in=pks) | Q(dest_account__in=pks)))
+        ReconciledBalance.objects.bulk_create(
+            ReconciledBalance(account_id=pk, balance=balance - flows.get(pk, 0)) for pk, balance in batch
+        )
+        baselined += len(batch)
+    return baselined
+
+
+def _net_flows(window) -> tuple[dict[UUID, Decimal], int]:
+    flows: dict[UUID, Decimal] = defaultdict(Decimal)
+    count = 0
+    debits = window.values("src_account").annotate(total=Sum("amount"), n=Count("id")).values_list("src_account", "total", "n")
+    for pk, total, n in debits.iterator():
+        flows[pk] -= total
+        count += n
+    credits = window.values("dest_account").annotate(total=Sum("amount")).values_list("dest_account", "total")
+    for pk, total in credits.iterator():
+        flows[pk] += total
+    return flows, count
+
+
+def _apply_flows(flows: dict[UUID, Decimal], batch_size: int) -> int:
+    updated = 0
+    for batch in batched((pk for pk, delta in flows.items() if delta), batch_size):
+        rows = ReconciledBalance.objects.in_bulk(batch)
+        for pk, row in rows.items():
+            row.balance += flows[pk]
+        ReconciledBalance.objects.bulk_update(rows.values(), ["balance"])
+        updated += len(rows)
+    return updated
+
+
+def _newer_than(watermark: tuple | None):
+    """Transactions a run with this watermark hasn't covered."""
+    if watermark is None:
+        return Transaction.objects.all()
+    return Transaction.objects.filter(keyset_after(WATERMARK_FIELDS, list(watermark)))
+
+
+def _drifted_accounts(batch_size: int, watermark: tuple | None) -> Iterator[list[Drift]]:
+    expected = ReconciledBalance.objects.filter(account=OuterRef("pk")).values("balance")
+    newer = _newer_than(watermark)
+    drifted = (
+        Account.objects
+        .with_total_balance()
+        .annotate(expected=Subquery(expected))
+        .exclude(total_balance=F("expected"))
+        # their expected balance doesn't include these transactions yet
+        .exclude(Exists(newer.filter(src_account=OuterRef("pk"))))
+        .exclude(Exists(newer.filter(dest_account=OuterRef("pk"))))
+        .order_by("pk")
+        .values_list("pk", "total_balance", "expected")
+    )
+    last_pk = None
+    while True:
+        page = drifted if last_pk is None else drifted.filter(pk__gt=last_pk)
+        # SQLite returns annotated decimals unquantized
+        batch = [Drift(pk, balance.quantize(CENT), expected.quantize(CENT)) for pk, balance, expected in page[:batch_size]]
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].account_id
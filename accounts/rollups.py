@@ -0,0 +1,187 @@
+"""
+Transfer volume rollups.
+
+`DailyVolume` and `AccountDailyVolume` are updated by `add_transfers` in the atomic
+block of every transfer, so the stats endpoint reads them instead of aggregating
+`Transaction`. Each day (and account day) is spread over `ROLLUPS["slots"]` rows and
+a transfer only locks a random one of them, so transfers don't all queue on today's
+row; reads sum the slots. `rebuild_rollups` recomputes both from scratch.
+"""
+import random
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Iterable
+from uuid import UUID
+
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from account_transactions.settings import ROLLUPS
+
+from .imports import batched
+from .models import CENT, AccountDailyVolume, ArchivedTransaction, DailyVolume, Transaction
+from .pagination import keyset_after
+
+
+# (src_account, dest_account, amount, created_at)
+Row = tuple[UUID, UUID, Decimal, datetime]
+
+
+def add_transfers(transfers: Iterable[Transaction]) -> None:
+    """Add saved transfers to the rollups; call it in the atomic block that saved them."""
+    _add(_aggregate((t.src_account_id, t.dest_account_id, t.amount, t.created_at) for t in transfers))
+
+
+def rebuild_rollups(batch_size: int | None = None) -> int:
+    """Recompute the rollups from every transaction, archived ones included, returning how many were read."""
+    batch_size = batch_size or ROLLUPS["rebuild_batch_size"]
+    read = 0
+    with transaction.atomic():
+        AccountDailyVolume.objects.all().delete()
+        DailyVolume.objects.all().delete()
+        for model in (ArchivedTransaction, Transaction):
+            last = None
+            while True:
+                transactions = model.objects.order_by("created_at", "id")
+                if last is not None:
+                    transactions = transactions.filter(keyset_after(["created_at", "id"], last))
+                batch = list(
+                    transactions.values_list("created_at", "id", "src_account_id", "dest_account_id", "amount")[:batch_size]
+                )
+                if not batch:
+                    break
+                _add(_aggregate((src, dest, amount, created_at) for created_at, _, src, dest, amount in batch))
+                read += len(batch)
+                last = list(batch[-1][:2])
+    return read
+
+
+def _aggregate(rows: Iterable[Row]) -> tuple[dict, dict]:
+    days: dict[date, list] = defaultdict(lambda: [0, Decimal(0)])
+    accounts: dict[tuple[UUID, date], list] = defaultdict(lambda: [0, 0, Decimal(0), Decimal(0)])
+    for src, dest, amount, created_at in rows:
+        day = timezone.localdate(created_at)
+        days[day][0] += 1
+        days[day][1] += amount
+        accounts[(dest, day)][0] += 1
+        accounts[(dest, day)][2] += amount
+        accounts[(src, day)][1] += 1
+        accounts[(src, day)][3] += amount
+    return days, accounts
+
+
+def _add(aggregates: tuple[dict, dict]) -> None:
+    # runs in the caller's transaction, which keeps the rows locked until it commits
+    days, accounts = aggregates
+    slot = random.randrange(ROLLUPS["slots"])
+    rows = _locked_rows(
+        DailyVolume,
+        list(days),
+        key=lambda row: row.day,
+        lookup=lambda keys: {"slot": slot, "day__in": keys},
+        new=lambda day: DailyVolume(day=day, slot=slot),
+    )
+    for day, (transfers, amount) in days.items():
+        rows[day].transfers += transfers
+        rows[day].amount += amount
+    DailyVolume.objects.bulk_update(rows.values(), ["transfers", "amount"])
+
+    rows = _locked_rows(
+        AccountDailyVolume,
+        list(accounts),
+        key=lambda row: (row.account_id, row.day),
+        lookup=lambda keys: {"slot": slot, "account_id__in": {a for a, _ in keys}, "day__in": {d for _, d in keys}},
+        new=lambda key: AccountDailyVolume(account_id=key[0], day=key[1], slot=slot),
+    )
+    for key, (transfers_in, transfers_out, inflow, outflow) in accounts.items():
+        row = rows[key]
+        row.transfers_in += transfers_in
+        row.transfers_out += transfers_out
+        row.inflow += inflow
+        row.outflow += outflow
+    AccountDailyVolume.objects.bulk_update(
+        [rows[key] for key in accounts], ["transfers_in", "transfers_out", "inflow", "outflow"]
+    )
+
+
+def _locked_rows(model: type[models.Model], keys: list, key: Callable, lookup: Callable, new: Callable) -> dict:
+    """
+    Rollup rows for `keys`, locked until the transaction ends.
+
+    Missing rows are inserted empty first (ignoring ones a concurrent transfer just
+    inserted), so the read-add-write that follows always works on locked rows.
+    """
+    rows = {}
+    for chunk in batched(keys, ROLLUPS["write_batch_size"]):
+        rows.update((key(row), row) for row in model.objects.select_for_update().filter(**lookup(chunk)))
+    missing = [k for k in keys if k not in rows]
+    if missing:
+        model.objects.bulk_create((new(k) for k in missing), ignore_conflicts=True)
+        for chunk in batched(missing, ROLLUPS["write_batch_size"]):
+            rows.update((key(row), row) for row in model.objects.select_for_update().filter(**lookup(chunk)))
+    return rows
+
+
+def daily_volume(since: date | None = None, until: date | None = None) -> list[dict]:
+    days = (
+        _in_range(DailyVolume.objects.all(), since, until)
+        .values("day")
+        .annotate(transfers=Sum("transfers"), amount=Sum("amount"))
+        .order_by("day")
+    )
+    return [{**row, "amount": Decimal(row["amount"]).quantize(CENT)} for row in days]
+
+
+def account_daily_volume(account_id: UUID, since: date | None = None, until: date | None = None) -> list[dict]:
+    days = (
+        _in_range(AccountDailyVolume.objects.filter(account_id=account_id), since, until)
+        .values("day")
+        .annotate(
+            transfers_in=Sum("transfers_in"),
+            transfers_out=Sum("transfers_out"),
+            inflow=Sum("inflow"),
+            outflow=Sum("outflow"),
+        )
+        .order_by("day")
+    )
+    return [
+        {**row, "inflow": Decimal(row["inflow"]).quantize(CENT), "outflow": Decimal(row["outflow"]).quantize(CENT)}
+        for row in days
+    ]
+
+
+def top_accounts(limit: int, since: date | None = None, until: date | None = None) -> list[dict]:
+    """Accounts that moved the most money (received plus sent) over the range."""
+    totals = (
+        _in_range(AccountDailyVolume.objects.all(), since, until)
+        .values("account_id")
+        .annotate(
+            transfers_in=Sum("transfers_in"),
+            transfers_out=Sum("transfers_out"),
+            inflow=Sum("inflow"),
+            outflow=Sum("outflow"),
+        )
+        .annotate(volume=F("inflow") + F("outflow"))
+        .order_by("-volume", "account_id")
+    )
+    return [
+        {
+            "account": row["account_id"],
+            "transfers_in": row["transfers_in"],
+            "transfers_out": row["transfers_out"],
+            # aggregates aren't quantized by the field's converter
+            "inflow": Decimal(row["inflow"]).quantize(CENT),
+            "outflow": Decimal(row["outflow"]).quantize(CENT),
+        }
+        for row in totals[:limit]
+    ]
+
+
+def _in_range(queryset, since: date | None, until: date | None):
+    if since is not None:
+        queryset = queryset.filter(day__gte=since)
+    if until is not None:
+        queryset = queryset.filter(day__lt=until)
+    return queryset
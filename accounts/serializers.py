@@ -1,13 +1,91 @@
+from decimal import Decimal
+from typing import Iterable
+
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+from account_transactions.settings import ACCOUNTS, ROLLUPS, TRANSFERS
+
+from .imports import MERGE, REPLACE, batched
+from .models import DECIMAL_MAX_DIGITS, DECIMAL_PLACES, Account, ImportJob, ReconciliationRun, Transaction
+from .reconciliation import ReconciliationReport
+from .transfers import (
+    INSUFFICIENT_BALANCE_ERROR,
+    SAME_ACCOUNT_ERROR,
+    Transfer,
+    TransferError,
+    TransferResult,
+    apply_transfers,
+    execute_transfer,
+)
+
+
+class UniqueInList:
+    """
+    Replaces an id field's UniqueValidator while a list is validated: `taken` holds the
+    ids that already exist, fetched up front, and grows with every id accepted so
+    repeats within the list are rejected too.
+    """
+
+    def __init__(self, taken: set, message: str):
+        self.taken = taken
+        self.message = message
+
+    def __call__(self, value):
+        if value in self.taken:
+            raise serializers.ValidationError(self.message, code="unique")
+        self.taken.add(value)
 
-from .models import Account, Transaction
+
+class AccountListSerializer(serializers.ListSerializer):
+    """Creates many accounts with one existence query and one INSERT per batch, in one transaction."""
+
+    def to_internal_value(self, data):
+        # anything else is rejected by ListSerializer before the items are validated
+        if isinstance(data, list) and (self.max_length is None or len(data) <= self.max_length):
+            id_field = self.child.fields["id"]
+            unique = next(v for v in id_field.validators if isinstance(v, UniqueValidator))
+            id_field.validators = [
+                *(v for v in id_field.validators if v is not unique),
+                UniqueInList(self._existing_ids(id_field, data), unique.message),
+            ]
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def _existing_ids(id_field: serializers.Field, data: list) -> set:
+        ids = []
+        for item in data:
+            try:
+                ids.append(id_field.to_internal_value(item["id"]))
+            except (TypeError, KeyError, serializers.ValidationError):
+                # no id, or one the item's own validation rejects
+                continue
+        existing = set()
+        for batch in batched(ids, ACCOUNTS["batch_write_size"]):
+            existing.update(Account.objects.filter(pk__in=batch).values_list("pk", flat=True))
+        return existing
+
+    def create(self, validated_data):
+        accounts = [Account(**item) for item in validated_data]
+        with transaction.atomic():
+            Account.objects.bulk_create(accounts, batch_size=ACCOUNTS["batch_write_size"])
+        return accounts
 
 
 class AccountSerializer(serializers.ModelSerializer):
     class Meta:
         model = Account
         fields = ["id", "name", "balance"]
+        list_serializer_class = AccountListSerializer
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.buckets:
+            data["balance"] = self.fields["balance"].to_representation(instance.total_balance)
+        return data
 
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -17,30 +95,200 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         if data["src_account"] == data["dest_account"]:
-            raise serializers.ValidationError("Transfer must be done between two different accounts.")
-        if data["src_account"].balance < data["amount"]:
-            raise serializers.ValidationError("Source account doesn't have enough balance to transfer the specified amount.")
+            raise serializers.ValidationError(SAME_ACCOUNT_ERROR)
+        if data["src_account"].total_balance < data["amount"]:
+            raise serializers.ValidationError(INSUFFICIENT_BALANCE_ERROR)
         return data
 
-    def save(self, **kwargs):
-        def transfer():
-            src_account: Account = self.validated_data["src_account"] # type: ignore
-            dest_account: Account = self.validated_data["dest_account"] # type: ignore
-            amount = self.validated_data["amount"] # type: ignore
-
-            src_account.balance -= amount
-            dest_account.balance += amount
-            
-            src_account.save()
-            dest_account.save()
-        
-        with transaction.atomic():
-            transfer()
-            return super().save(**kwargs)
+    def create(self, validated_data):
+        try:
+            return execute_transfer(Transaction(**validated_data))
+        except TransferError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class TransactionTimeRangeSerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def filter_time_range(self, queryset):
+        data = self.validated_data
+        if "since" in data: # type: ignore
+            queryset = queryset.filter(created_at__gte=data["since"]) # type: ignore
+        if "until" in data: # type: ignore
+            queryset = queryset.filter(created_at__lt=data["until"]) # type: ignore
+        return queryset
+
+
+class ArchiveQuerySerializer(serializers.Serializer):
+    include_archived = serializers.BooleanField(default=False)
+
+
+class AccountTransactionFilterSerializer(TransactionTimeRangeSerializer, ArchiveQuerySerializer):
+    IN = "in"
+    OUT = "out"
+    ALL = "all"
+
+    direction = serializers.ChoiceField(choices=[IN, OUT, ALL], default=ALL)
+    min_amount = serializers.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES, required=False)
+    max_amount = serializers.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES, required=False)
+
+    def filter(self, queryset, account_id):
+        data = self.validated_data
+        if data["direction"] == self.IN: # type: ignore
+            queryset = queryset.filter(dest_account=account_id)
+        elif data["direction"] == self.OUT: # type: ignore
+            queryset = queryset.filter(src_account=account_id)
+        else:
+            queryset = queryset.filter(Q(src_account=account_id) | Q(dest_account=account_id))
+
+        queryset = self.filter_time_range(queryset)
+        if "min_amount" in data: # type: ignore
+            queryset = queryset.filter(amount__gte=data["min_amount"]) # type: ignore
+        if "max_amount" in data: # type: ignore
+            queryset = queryset.filter(amount__lte=data["max_amount"]) # type: ignore
+        return queryset
+
+
+class AccountBalanceQuerySerializer(serializers.Serializer):
+    at = serializers.DateTimeField(required=False)
+
+
+class TransferItemSerializer(serializers.Serializer):
+    src_account = serializers.UUIDField()
+    dest_account = serializers.UUIDField()
+    amount = serializers.DecimalField(
+        max_digits=DECIMAL_MAX_DIGITS,
+        decimal_places=DECIMAL_PLACES,
+        min_value=Decimal(1),
+    )
+
+
+class BatchTransferSerializer(serializers.Serializer):
+    ATOMIC = "atomic"
+    BEST_EFFORT = "best_effort"
+
+    mode = serializers.ChoiceField(choices=[ATOMIC, BEST_EFFORT], default=ATOMIC)
+    transfers = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=TRANSFERS["batch_max_size"],
+    )
+
+    @staticmethod
+    def validate_items(items: Iterable[dict]) -> tuple[list[tuple[int, Transfer]], list[TransferResult]]:
+        """Split raw transfer items into `(index, transfer)` pairs and results for the invalid ones."""
+        invalid: list[TransferResult] = []
+        valid: list[tuple[int, Transfer]] = []
+
+        for index, item in enumerate(items):
+            item_serializer = TransferItemSerializer(data=item)
+            if item_serializer.is_valid():
+                valid.append((index, Transfer(**item_serializer.validated_data))) # type: ignore
+            else:
+                invalid.append(TransferResult(index, errors=item_serializer.errors))
+        return valid, invalid
+
+    def save(self, **kwargs) -> list[TransferResult]:
+        valid, invalid = self.validate_items(self.validated_data["transfers"]) # type: ignore
+
+        atomic = self.validated_data["mode"] == self.ATOMIC # type: ignore
+        if atomic and invalid:
+            applied = [TransferResult(index) for index, _ in valid]
+        else:
+            applied = apply_transfers(valid, atomic=atomic)
+
+        results = sorted(invalid + applied, key=lambda r: r.index)
+        self.instance = results
+        return results
+
+    def to_representation(self, results: list[TransferResult]):
+        rolled_back = self.validated_data["mode"] == self.ATOMIC and not all(r.ok for r in results) # type: ignore
+        items = []
+        for r in results:
+            if not r.ok:
+                items.append({"index": r.index, "status": "error", "errors": r.errors})
+            elif rolled_back:
+                items.append({"index": r.index, "status": "rolled_back"})
+            else:
+                items.append({"index": r.index, "status": "ok", "transaction": TransactionSerializer(r.transaction).data})
+        failed = sum(not r.ok for r in results)
+        return {
+            "mode": self.validated_data["mode"], # type: ignore
+            "succeeded": 0 if rolled_back else len(results) - failed,
+            "failed": failed,
+            "results": items,
+        }
 
 
 class UploadSerializer(serializers.Serializer):
     accounts_file = serializers.FileField()
+    background = serializers.BooleanField(default=False)
+    mode = serializers.ChoiceField(choices=[MERGE, REPLACE], default=MERGE)
+    dry_run = serializers.BooleanField(default=False)
     
     class Meta:
-        fields = ['accounts_file']
+        fields = ['accounts_file', 'background', 'mode', 'dry_run']
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.SerializerMethodField()
+    eta_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id", "status", "file_size", "bytes_processed",
+            "rows_parsed", "rows_upserted", "rows_rejected",
+            "rows_per_second", "eta_seconds", "error",
+            "created_at", "started_at", "finished_at",
+        ]
+
+    def get_rows_per_second(self, job: ImportJob) -> float | None:
+        elapsed = self._elapsed(job)
+        return round(job.rows_parsed / elapsed, 1) if elapsed else None
+
+    def get_eta_seconds(self, job: ImportJob) -> float | None:
+        if job.status != ImportJob.Status.RUNNING or not job.bytes_processed:
+            return None
+        elapsed = self._elapsed(job)
+        remaining = job.file_size - job.bytes_processed
+        return round(elapsed * remaining / job.bytes_processed, 1)
+
+    def _elapsed(self, job: ImportJob) -> float:
+        if not job.started_at:
+            return 0
+        return ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+
+
+class ReconciliationRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReconciliationRun
+        fields = [
+            "id", "watermark_created_at", "watermark_id", "transactions",
+            "accounts_baselined", "accounts_updated", "drifted", "repaired", "created_at",
+        ]
+
+
+class DriftSerializer(serializers.Serializer):
+    account_id = serializers.UUIDField()
+    balance = serializers.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES)
+    expected = serializers.DecimalField(max_digits=DECIMAL_MAX_DIGITS, decimal_places=DECIMAL_PLACES)
+
+
+class StatsQuerySerializer(serializers.Serializer):
+    # days in [since, until)
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+    account = serializers.UUIDField(required=False)
+    top = serializers.IntegerField(min_value=0, max_value=100, default=ROLLUPS["top_accounts"])
+
+
+class ReconcileSerializer(serializers.Serializer):
+    repair = serializers.BooleanField(default=False)
+
+    def to_representation(self, report: ReconciliationReport):
+        return {
+            **ReconciliationRunSerializer(report.run).data,
+            "drifts": DriftSerializer(report.drifts, many=True).data,
+        }
@@ -1,7 +1,16 @@
 import pytest
+from rest_framework import status
 from rest_framework.test import APIClient
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from accounts.models import LedgerEntry, Transaction
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
 
 @pytest.fixture
 def api_client():
@@ -14,6 +23,12 @@ def create_account(api_client):
         return api_client.post("/accounts/", account)
     return send_request
 
+@pytest.fixture
+def create_accounts(api_client):
+    def send_request(accounts):
+        return api_client.post("/accounts/", accounts, format="json")
+    return send_request
+
 @pytest.fixture
 def get_account(api_client):
     def send_request(id):
@@ -32,8 +47,84 @@ def create_transaction(api_client):
         return api_client.post("/accounts/transfer/", transaction)
     return send_request
 
+@pytest.fixture
+def transfer():
+    """Request data of a transfer between two accounts."""
+    def build(src, dest, amount):
+        return {"src_account": str(src.id), "dest_account": str(dest.id), "amount": amount}
+    return build
+
+@pytest.fixture
+def make_transfer(create_transaction, transfer):
+    """Post a transfer that must succeed."""
+    def send_request(src, dest, amount):
+        response = create_transaction(transfer(src, dest, amount))
+        assert response.status_code == status.HTTP_201_CREATED
+        return response
+    return send_request
+
+@pytest.fixture
+def backdate():
+    """Move a saved transfer and its ledger entries back in time."""
+    def update(obj: Transaction, when):
+        Transaction.objects.filter(pk=obj.pk).update(created_at=when)
+        LedgerEntry.objects.filter(transaction=obj).update(created_at=when)
+    return update
+
 @pytest.fixture
 def upload_file(api_client):
-    def send_request(file):
-        return api_client.put("/accounts/import/", {"accounts_file": file})
+    def send_request(file, **options):
+        return api_client.put("/accounts/import/", {"accounts_file": file, **options})
+    return send_request
+
+@pytest.fixture
+def create_batch_transfer(api_client):
+    def send_request(transfers, mode=None):
+        data = {"transfers": transfers}
+        if mode:
+            data["mode"] = mode
+        return api_client.post("/accounts/transfer/batch/", data, format="json")
+    return send_request
+
+@pytest.fixture
+def get_import_job(api_client):
+    def send_request(id):
+        return api_client.get(f"/accounts/import/{id}/")
+    return send_request
+
+@pytest.fixture
+def list_transactions(api_client):
+    def send_request(**params):
+        return api_client.get("/accounts/transfer/", params)
+    return send_request
+
+@pytest.fixture
+def list_account_transactions(api_client):
+    def send_request(id, **params):
+        return api_client.get(f"/accounts/{id}/transactions/", params)
+    return send_request
+
+@pytest.fixture
+def get_balance(api_client):
+    def send_request(id, at=None):
+        return api_client.get(f"/accounts/{id}/balance/", {"at": at.isoformat()} if at else {})
+    return send_request
+
+@pytest.fixture
+def create_idempotent_transaction(api_client):
+    def send_request(transaction, key):
+        return api_client.post("/accounts/transfer/", transaction, format="json", HTTP_IDEMPOTENCY_KEY=key)
+    return send_request
+
+@pytest.fixture
+def export(api_client):
+    def send_request(path, **params):
+        return api_client.get(path, params)
+    return send_request
+
+
+@pytest.fixture
+def get_stats(api_client):
+    def send_request(**params):
+        return api_client.get("/accounts/stats/", params)
     return send_request
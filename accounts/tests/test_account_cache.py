@@ -0,0 +1,93 @@
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.models import Account
+from accounts.reconciliation import reconcile
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAccountCache:
+    def test_repeated_reads_served_from_cache(self, django_assert_num_queries, get_account):
+        account = baker.make(Account, balance=10)
+        first: Response = get_account(account.id)
+
+        with django_assert_num_queries(0):
+            second: Response = get_account(account.id)
+
+        assert second.status_code == status.HTTP_200_OK
+        assert second.data == first.data
+        assert second["ETag"] == first["ETag"]
+
+    def test_if_none_match_304_without_queries(self, django_assert_num_queries, api_client, get_account):
+        account = baker.make(Account)
+        etag = get_account(account.id)["ETag"]
+
+        with django_assert_num_queries(0):
+            response: Response = api_client.get(f"/accounts/{account.id}/", HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+
+    def test_transfer_invalidates(self, api_client, get_account, create_transaction):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account, balance=0)
+        etag = get_account(src.id)["ETag"]
+        get_account(dest.id)
+
+        create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": 40})
+
+        response: Response = api_client.get(f"/accounts/{src.id}/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["balance"] == 60
+        assert response["ETag"] != etag
+        assert get_account(dest.id).data["balance"] == 40
+
+    def test_batch_transfer_invalidates(self, get_account, create_batch_transfer):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account, balance=0)
+        get_account(src.id)
+
+        create_batch_transfer([{"src_account": str(src.id), "dest_account": str(dest.id), "amount": 25}])
+
+        assert get_account(src.id).data["balance"] == 75
+
+    def test_rolled_back_transfer_keeps_cache(self, django_assert_num_queries, get_account, create_transaction):
+        src = baker.make(Account, balance=10)
+        dest = baker.make(Account)
+        get_account(src.id)
+
+        create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": 40})
+
+        with django_assert_num_queries(0):
+            get_account(src.id)
+
+    def test_import_invalidates(self, get_account, upload_file):
+        account = baker.make(Account, balance=10)
+        get_account(account.id)
+
+        upload_file(SimpleUploadedFile(
+            name="accounts.csv",
+            content=f"id,name,balance\n{str(account.id).upper()},{account.name},55\n".encode(),
+            content_type="text/csv",
+        ))
+
+        assert get_account(account.id).data["balance"] == 55
+
+    def test_reconcile_repair_invalidates(self, get_account):
+        account = baker.make(Account, balance=10)
+        reconcile()
+        Account.objects.filter(pk=account.id).update(balance=99)
+        get_account(account.id)
+
+        reconcile(repair=True)
+
+        assert get_account(account.id).data["balance"] == 10
+
+    def test_missing_account_not_cached_404(self, get_account):
+        account = baker.make(Account)
+        account_id = account.id
+        account.delete()
+        assert get_account(account_id).status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.models import Account, Transaction
+from accounts.serializers import AccountTransactionFilterSerializer
+
+
+@pytest.fixture
+def history():
+    account, other = baker.make(Account, _quantity=2)
+    now = timezone.now()
+    rows = [
+        # (src, dest, amount, age in days)
+        (account, other, 10, 3),
+        (other, account, 20, 2),
+        (account, other, 30, 1),
+        (other, account, 40, 0),
+    ]
+    transactions = Transaction.objects.bulk_create(
+        Transaction(src_account=src, dest_account=dest, amount=amount) for src, dest, amount, _ in rows
+    )
+    for t, (*_, age) in zip(transactions, rows):
+        Transaction.objects.filter(pk=t.pk).update(created_at=now - timedelta(days=age))
+    baker.make(Transaction, amount=5, _quantity=3)  # unrelated
+    return account, now
+
+
+def amounts(response: Response) -> list[Decimal]:
+    return [t["amount"] for t in response.data["results"]]
+
+
+@pytest.mark.django_db
+class TestAccountTransactions:
+    def test_all_directions_newest_first_200(self, list_account_transactions, history):
+        account, _ = history
+        response: Response = list_account_transactions(account.id)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 4
+        assert amounts(response) == [40, 30, 20, 10]
+
+    @pytest.mark.parametrize("direction, expected", [("in", [40, 20]), ("out", [30, 10])])
+    def test_direction_filter(self, list_account_transactions, history, direction, expected):
+        account, _ = history
+        response: Response = list_account_transactions(account.id, direction=direction)
+        assert amounts(response) == expected
+
+    def test_time_window_and_amount_filters(self, list_account_transactions, history):
+        account, now = history
+        response: Response = list_account_transactions(
+            account.id,
+            since=(now - timedelta(days=2, hours=1)).isoformat(),
+            until=(now - timedelta(hours=1)).isoformat(),
+            min_amount=25,
+        )
+        assert amounts(response) == [30]
+
+    def test_paginated_with_cursor(self, api_client, list_account_transactions, history):
+        account, _ = history
+        response: Response = list_account_transactions(account.id, page_size=3)
+        assert amounts(response) == [40, 30, 20]
+        response = api_client.get(response.data["next"])
+        assert amounts(response) == [10]
+        assert response.data["next"] is None
+
+    def test_invalid_filter_400(self, list_account_transactions, history):
+        account, _ = history
+        response: Response = list_account_transactions(account.id, direction="sideways")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_non_existing_account_404(self, list_account_transactions):
+        response: Response = list_account_transactions(uuid4())
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize("direction", ["in", "out", "all"])
+    def test_served_from_account_indexes(self, direction):
+        filters = AccountTransactionFilterSerializer(data={"direction": direction})
+        filters.is_valid(raise_exception=True)
+        queryset = filters.filter(Transaction.objects.all(), uuid4()).order_by("-created_at", "-id")[:5]
+
+        plan = queryset.explain()
+
+        assert "SCAN accounts_transaction" not in plan
+        if direction != "out":
+            assert "transaction_dest_created_idx" in plan
+        if direction != "in":
+            assert "transaction_src_created_idx" in plan
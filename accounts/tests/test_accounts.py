@@ -1,12 +1,16 @@
+import json
+from decimal import Decimal
 from uuid import uuid4
 
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from model_bakery import baker
 from rest_framework import status
 from rest_framework.response import Response
 
-from account_transactions.settings import REST_FRAMEWORK
+from account_transactions.settings import ACCOUNTS, REST_FRAMEWORK
 from accounts.models import Account
 
 
@@ -68,6 +72,59 @@ class TestCreateAccount:
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
+@pytest.mark.django_db
+class TestBulkCreateAccounts:
+    def test_valid_accounts_201(self, create_accounts):
+        id = uuid4()
+        response: Response = create_accounts([{"id": str(id), "name": "Ali", "balance": "10.50"}, {"name": "Sara"}])
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [account["name"] for account in response.data] == ["Ali", "Sara"]
+        assert response.data[0]["id"] == str(id)
+        assert Account.objects.get(pk=id).balance == Decimal("10.50")
+        assert Account.objects.get(pk=response.data[1]["id"]).balance == 0
+
+    def test_queries_independent_of_size(self, create_accounts, monkeypatch):
+        monkeypatch.setitem(ACCOUNTS, "batch_write_size", 50)
+        accounts = [{"id": str(uuid4()), "name": f"Account {i}"} for i in range(120)]
+        with CaptureQueriesContext(connection) as ctx:
+            response: Response = create_accounts(accounts)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Account.objects.count() == 120
+        # an existence check and an INSERT per batch of 50, plus the savepoint
+        assert len(ctx.captured_queries) == 3 + 3 + 2
+
+    def test_per_item_errors_400(self, create_accounts):
+        existing = baker.make(Account)
+        repeated = str(uuid4())
+        accounts = [
+            {"name": "Ali"},
+            {"id": str(existing.id), "name": "Taken"},
+            {"name": "", "balance": -1},
+            {"id": repeated, "name": "First"},
+            {"id": repeated, "name": "Repeat"},
+            {"id": "string", "name": "Bad id"},
+        ]
+        response: Response = create_accounts(accounts)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = {item["index"]: item["errors"] for item in response.data["errors"]}
+        assert set(errors) == {1, 2, 4, 5}
+        assert errors[1]["id"][0].code == errors[4]["id"][0].code == "unique"
+        assert set(errors[2]) == {"name", "balance"}
+        # nothing is created unless every account is valid
+        assert Account.objects.count() == 1
+
+    def test_empty_or_too_many_400(self, create_accounts, monkeypatch):
+        response: Response = create_accounts([])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "non_field_errors" in response.data
+
+        monkeypatch.setitem(ACCOUNTS, "batch_max_size", 2)
+        response = create_accounts([{"name": "A"}, {"name": "B"}, {"name": "C"}])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "non_field_errors" in response.data
+        assert not Account.objects.exists()
+
+
 @pytest.mark.django_db
 class TestGetAccount:
     def test_existing_account_200(self, get_account):
@@ -259,19 +316,21 @@ d0610e17-f072-4a94-8ab8-238740ed3fe4,Cacilie Stovold,208.47
             content_type="application/json"
         )
 
+        file_accounts = json.loads(file.read(), parse_float=Decimal)
+        file.seek(0)
+
         response: Response = upload_file(file)
 
-        response_accounts = response.data
-        database_accounts = Account.objects.all()
-            
         assert response.status_code == status.HTTP_200_OK
-        
-        for db_acc, res_acc in zip(database_accounts, response_accounts):
-            assert res_acc == {
+        assert response.data["imported"] == len(file_accounts)
+
+        for file_acc in file_accounts:
+            db_acc = Account.objects.get(pk=file_acc["id"])
+            assert {
                 "id": str(db_acc.id),
                 "name": db_acc.name,
                 "balance": db_acc.balance,
-            }
+            } == file_acc
 
     def test_unsupported_format_400(self, upload_file):
         file = SimpleUploadedFile(
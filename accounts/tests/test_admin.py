@@ -0,0 +1,168 @@
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from django.contrib.admin.models import LogEntry
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from account_transactions.settings import ADMIN_PAGINATION
+from accounts.admin import prefix_filter
+from accounts.models import Account, Transaction
+from accounts.transfers import INSUFFICIENT_BALANCE_ERROR, execute_transfer
+
+
+ACCOUNTS_URL = "/admin/accounts/account/"
+TRANSACTIONS_URL = "/admin/accounts/transaction/"
+
+
+def _transactions(n: int) -> list[Transaction]:
+    src, dest = baker.make(Account, balance=100, _quantity=2)
+    return Transaction.objects.bulk_create(
+        Transaction(src_account=src, dest_account=dest, amount=1) for _ in range(n)
+    )
+
+
+def _count_queries(captured) -> list[str]:
+    return [q["sql"] for q in captured.captured_queries if "COUNT(" in q["sql"].upper()]
+
+
+def _unbounded_counts(captured) -> list[str]:
+    return [sql for sql in _count_queries(captured) if "LIMIT" not in sql.upper()]
+
+
+@pytest.mark.django_db
+class TestChangeList:
+    @pytest.fixture(autouse=True)
+    def count_limit(self, monkeypatch):
+        monkeypatch.setitem(ADMIN_PAGINATION, "count_limit", 10)
+
+    def test_transaction_queries_dont_grow_with_the_table(self, admin_client):
+        _transactions(15)
+        with CaptureQueriesContext(connection) as small:
+            assert admin_client.get(TRANSACTIONS_URL).status_code == 200
+
+        _transactions(50)
+        with CaptureQueriesContext(connection) as large:
+            assert admin_client.get(TRANSACTIONS_URL).status_code == 200
+
+        assert len(large) == len(small)
+        assert not _unbounded_counts(large)
+
+    def test_account_queries_dont_grow_with_the_table(self, admin_client):
+        baker.make(Account, _quantity=15)
+        with CaptureQueriesContext(connection) as small:
+            assert admin_client.get(ACCOUNTS_URL).status_code == 200
+
+        baker.make(Account, _quantity=50)
+        with CaptureQueriesContext(connection) as large:
+            assert admin_client.get(ACCOUNTS_URL).status_code == 200
+
+        assert len(large) == len(small)
+        assert not _unbounded_counts(large)
+
+    def test_unfiltered_list_uses_estimated_count(self, admin_client):
+        _transactions(25)
+        response = admin_client.get(TRANSACTIONS_URL)
+        assert response.context["cl"].result_count == 25
+        assert response.context["cl"].full_result_count is None
+
+    def test_estimate_follows_deleted_rows(self, admin_client):
+        transactions = _transactions(25)
+        # archived oldest first
+        Transaction.objects.filter(pk__in=[t.pk for t in transactions[:10]]).delete()
+        assert admin_client.get(TRANSACTIONS_URL).context["cl"].result_count == 15
+
+        Transaction.objects.filter(pk__in=[t.pk for t in transactions[10:20]]).delete()
+        assert admin_client.get(TRANSACTIONS_URL).context["cl"].result_count == 5
+
+    def test_filtered_count_is_capped(self, admin_client, monkeypatch):
+        transactions = _transactions(25)
+        monkeypatch.setitem(ADMIN_PAGINATION, "count_limit", 12)
+        response = admin_client.get(TRANSACTIONS_URL, {"q": str(transactions[0].src_account_id)})
+        assert response.context["cl"].result_count == 12
+
+
+@pytest.mark.django_db
+class TestSearch:
+    def test_account_by_name_prefix(self, admin_client):
+        alice = baker.make(Account, name="Alice Smith")
+        baker.make(Account, name="Bob Alice")
+        response = admin_client.get(ACCOUNTS_URL, {"q": "Alice"})
+        assert [a.pk for a in response.context["cl"].result_list] == [alice.pk]
+
+    def test_account_by_id(self, admin_client):
+        account, _ = baker.make(Account, _quantity=2)
+        response = admin_client.get(ACCOUNTS_URL, {"q": str(account.pk).upper()})
+        assert [a.pk for a in response.context["cl"].result_list] == [account.pk]
+
+    def test_transaction_by_account_id(self, admin_client):
+        transactions = _transactions(3)
+        _transactions(2)
+        response = admin_client.get(TRANSACTIONS_URL, {"q": str(transactions[0].dest_account_id)})
+        assert {t.pk for t in response.context["cl"].result_list} == {t.pk for t in transactions}
+
+    def test_transaction_by_other_text_matches_nothing(self, admin_client):
+        _transactions(2)
+        response = admin_client.get(TRANSACTIONS_URL, {"q": "Alice"})
+        assert list(response.context["cl"].result_list) == []
+
+    def test_name_prefix_uses_the_index(self):
+        queryset = Account.objects.filter(prefix_filter("name", "Ali", "default"))
+        with connection.cursor() as cursor:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        assert "USING INDEX" in plan and "SCAN" not in plan
+
+
+@pytest.mark.django_db
+class TestTransactionForm:
+    def test_add_loads_each_account_once(self, admin_client):
+        src, dest = baker.make(Account, balance=100, _quantity=2)
+        data = {"id": uuid4(), "src_account": src.pk, "dest_account": dest.pk, "amount": "10.00"}
+        with CaptureQueriesContext(connection) as captured:
+            response = admin_client.post(f"{TRANSACTIONS_URL}add/", data)
+        assert response.status_code == 302
+
+        # once by each field's validation; the form's clean reuses those instances
+        account_loads = [q["sql"] for q in captured.captured_queries if '"accounts_account"."name"' in q["sql"]]
+        assert len(account_loads) == 2
+        src.refresh_from_db()
+        dest.refresh_from_db()
+        assert (src.balance, dest.balance) == (Decimal(90), Decimal(110))
+
+    def test_add_rejects_overdraft(self, admin_client):
+        src, dest = baker.make(Account, balance=5, _quantity=2)
+        data = {"id": uuid4(), "src_account": src.pk, "dest_account": dest.pk, "amount": "10.00"}
+        response = admin_client.post(f"{TRANSACTIONS_URL}add/", data)
+        assert response.status_code == 200
+        assert INSUFFICIENT_BALANCE_ERROR in response.context["adminform"].form.non_field_errors()
+        assert not Transaction.objects.exists()
+
+    def test_add_reports_balance_spent_after_the_check(self, admin_client, monkeypatch):
+        src, dest = baker.make(Account, balance=10, _quantity=2)
+
+        def spent_meanwhile(obj):
+            Account.objects.filter(pk=src.pk).update(balance=0)
+            return execute_transfer(obj)
+
+        monkeypatch.setattr("accounts.admin.execute_transfer", spent_meanwhile)
+        data = {"id": uuid4(), "src_account": src.pk, "dest_account": dest.pk, "amount": "10.00"}
+        response = admin_client.post(f"{TRANSACTIONS_URL}add/", data, follow=True)
+
+        assert response.status_code == 200
+        assert [str(m) for m in response.context["messages"]] == [INSUFFICIENT_BALANCE_ERROR]
+        assert not Transaction.objects.exists()
+        assert not LogEntry.objects.exists()
+
+    def test_saved_transaction_is_read_only(self, admin_client):
+        transaction = _transactions(1)[0]
+        response = admin_client.post(
+            f"{TRANSACTIONS_URL}{transaction.pk}/change/",
+            {"src_account": transaction.src_account_id, "dest_account": transaction.dest_account_id, "amount": "5.00"},
+        )
+        assert response.status_code == 403
+        transaction.refresh_from_db()
+        assert transaction.amount == 1
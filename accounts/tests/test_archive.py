@@ -0,0 +1,170 @@
+from datetime import timedelta
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import ProtectedError
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+
+from account_transactions.settings import ARCHIVE, RECONCILIATION
+from accounts.archive import archive_transactions
+from accounts.buckets import set_buckets
+from accounts.ledger import balance_at
+from accounts.models import (
+    Account,
+    ArchivedLedgerEntry,
+    ArchivedTransaction,
+    BalanceCheckpoint,
+    DailyVolume,
+    LedgerEntry,
+    ReconciliationRun,
+    Transaction,
+)
+from accounts.reconciliation import reconcile
+from accounts.rollups import rebuild_rollups
+
+
+@pytest.fixture
+def history(create_transaction, backdate):
+    """Five transfers from src to dest, made 5, 4, 3, 2 and 1 days ago."""
+    src = baker.make(Account, balance=100)
+    dest = baker.make(Account, balance=0)
+    now = timezone.now()
+    for days_ago in range(5, 0, -1):
+        response = create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": days_ago})
+        backdate(Transaction.objects.get(pk=response.data["id"]), now - timedelta(days=days_ago))
+    return src, dest, now
+
+
+@pytest.mark.django_db
+class TestArchiveTransactions:
+    def test_moves_old_transactions_in_batches(self, history):
+        _, _, now = history
+
+        result = archive_transactions(before=now - timedelta(days=2, hours=12), batch_size=2)
+
+        assert (result.transactions, result.ledger_entries) == (3, 6)
+        assert sorted(ArchivedTransaction.objects.values_list("amount", flat=True)) == [3, 4, 5]
+        assert sorted(Transaction.objects.values_list("amount", flat=True)) == [1, 2]
+        assert ArchivedLedgerEntry.objects.count() == 6 and LedgerEntry.objects.count() == 4
+        assert not LedgerEntry.objects.filter(transaction__amount__gte=3).exists()
+
+    def test_default_horizon(self, history, monkeypatch):
+        monkeypatch.setitem(ARCHIVE, "horizon_days", 3)
+        assert archive_transactions().transactions == 3
+
+    def test_balance_history_survives(self, history):
+        src, dest, now = history
+        times = [now - timedelta(days=days, hours=hours) for days in range(6) for hours in (0, 12)]
+        before = [(balance_at(src.id, at), balance_at(dest.id, at)) for at in times]
+
+        result = archive_transactions(before=now - timedelta(days=2, hours=12))
+
+        # one checkpoint per account, at its last archived movement
+        assert result.checkpoints == 2
+        assert dict(BalanceCheckpoint.objects.values_list("account", "balance")) == {src.id: 88, dest.id: 12}
+        assert [(balance_at(src.id, at), balance_at(dest.id, at)) for at in times] == before
+
+    def test_everything_archived(self, history):
+        src, _, now = history
+        archive_transactions(before=now)
+        assert balance_at(src.id, now - timedelta(days=10)) == 100
+        assert balance_at(src.id, now - timedelta(days=3, hours=12)) == 91
+        assert balance_at(src.id, now) == 85
+
+    def test_checkpoints_bucketed_accounts(self, history, create_transaction, backdate):
+        src, dest, now = history
+        set_buckets(dest.id, 2)
+        response = create_transaction({"src_account": dest.id, "dest_account": src.id, "amount": 5})
+        backdate(Transaction.objects.get(pk=response.data["id"]), now - timedelta(hours=12))
+
+        archive_transactions(before=now)
+
+        checkpoint = BalanceCheckpoint.objects.get(account=dest, created_at=now - timedelta(hours=12))
+        assert checkpoint.balance == 10
+        assert balance_at(dest.id, now) == 10
+
+    def test_respects_reconciliation_watermark(self, history, create_transaction, monkeypatch):
+        src, dest, _ = history
+        monkeypatch.setitem(RECONCILIATION, "settle_seconds", 0)
+        reconcile()
+        response = create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": 10})
+
+        # older than the cutoff, but not reconciled yet
+        archive_transactions(before=timezone.now())
+
+        assert Transaction.objects.filter(pk=response.data["id"]).exists()
+        assert ArchivedTransaction.objects.count() == 5
+        assert reconcile().run.transactions == 1
+
+    def test_nothing_reconciled(self, history):
+        _, _, now = history
+        ReconciliationRun.objects.create()
+        assert archive_transactions(before=now).transactions == 0
+
+    def test_archived_accounts_are_protected(self, history, upload_file):
+        src, dest, now = history
+        archive_transactions(before=now)
+        BalanceCheckpoint.objects.all().delete()
+
+        with pytest.raises(ProtectedError):
+            Account.objects.filter(pk=src.id).delete()
+
+        file = SimpleUploadedFile("accounts.csv", f"id,name,balance\n{src.id},Src,85\n".encode(), content_type="text/csv")
+        response = upload_file(file, mode="replace")
+        assert response.data["protected"] == 1
+        assert Account.objects.filter(pk=dest.id).exists()
+
+    def test_rebuilt_rollups_include_archive(self, history):
+        _, _, now = history
+        archive_transactions(before=now - timedelta(days=2, hours=12))
+        assert rebuild_rollups(batch_size=2) == 5
+        assert sum(DailyVolume.objects.values_list("amount", flat=True)) == 15
+
+    def test_command(self, history, capsys):
+        call_command("archive_transactions", days=2, batch_size=1)
+        assert "4 transactions created before" in capsys.readouterr().out
+        assert ArchivedTransaction.objects.count() == 4
+
+
+@pytest.mark.django_db
+class TestArchivedListings:
+    @pytest.fixture
+    def archived(self, history):
+        src, dest, now = history
+        archive_transactions(before=now - timedelta(days=2, hours=12))
+        return src, dest
+
+    def test_hot_table_by_default(self, archived, list_transactions, list_account_transactions):
+        src, _ = archived
+        assert list_transactions().data["count"] == 2
+        assert [t["amount"] for t in list_account_transactions(src.id).data["results"]] == [1, 2]
+
+    def test_include_archived(self, api_client, archived, list_transactions, list_account_transactions):
+        src, _ = archived
+        response = list_transactions(include_archived="true", page_size=2)
+        assert response.data["count"] == 5
+
+        pages = [response]
+        while pages[-1].data["next"]:
+            pages.append(api_client.get(pages[-1].data["next"]))
+        assert [t["amount"] for page in pages for t in page.data["results"]] == [1, 2, 3, 4, 5]
+
+        previous = api_client.get(pages[-1].data["previous"])
+        assert previous.data["results"] == pages[-2].data["results"]
+
+        response = list_account_transactions(src.id, include_archived="true", min_amount=2, max_amount=4)
+        assert [t["amount"] for t in response.data["results"]] == [2, 3, 4]
+
+    def test_browsable_api_includes_archived(self, api_client, archived):
+        response = api_client.get("/accounts/transfer/", {"include_archived": "true"}, HTTP_ACCEPT="text/html")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.context["response"].data["count"] == 5
+
+    def test_admin(self, admin_client, archived):
+        response = admin_client.get("/admin/accounts/archivedtransaction/")
+        assert response.status_code == 200
+        assert len(response.context["cl"].result_list) == 3
+        assert admin_client.get("/admin/accounts/archivedtransaction/add/").status_code == 403
@@ -0,0 +1,97 @@
+from uuid import uuid4
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.models import Account, Transaction
+
+
+@pytest.mark.django_db
+class TestBatchTransfer:
+    def test_successful_batch_201(self, transfer, create_batch_transfer):
+        a = baker.make(Account, balance=100)
+        b = baker.make(Account, balance=0)
+        c = baker.make(Account, balance=0)
+
+        response: Response = create_batch_transfer([
+            transfer(a, b, 60),
+            transfer(b, c, 50),  # only possible after the first transfer is applied
+            transfer(a, c, 40),
+        ])
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["succeeded"] == 3
+        assert [r["status"] for r in response.data["results"]] == ["ok", "ok", "ok"]
+        assert Transaction.objects.count() == 3
+        assert Account.objects.get(pk=a.id).balance == 0
+        assert Account.objects.get(pk=b.id).balance == 10
+        assert Account.objects.get(pk=c.id).balance == 90
+
+    def test_atomic_batch_rolls_back_on_error_400(self, transfer, create_batch_transfer):
+        a = baker.make(Account, balance=100)
+        b = baker.make(Account, balance=0)
+
+        response: Response = create_batch_transfer([
+            transfer(a, b, 60),
+            transfer(a, b, 60),
+        ])
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [r["status"] for r in response.data["results"]] == ["rolled_back", "error"]
+        assert Transaction.objects.count() == 0
+        assert Account.objects.get(pk=a.id).balance == 100
+
+    def test_atomic_batch_invalid_item_400(self, transfer, create_batch_transfer):
+        a = baker.make(Account, balance=100)
+        b = baker.make(Account, balance=0)
+
+        response: Response = create_batch_transfer([
+            transfer(a, b, 10),
+            {"src_account": str(a.id), "dest_account": str(b.id), "amount": 0},
+        ])
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [r["status"] for r in response.data["results"]] == ["rolled_back", "error"]
+        assert "amount" in response.data["results"][1]["errors"]
+        assert Transaction.objects.count() == 0
+
+    def test_best_effort_batch_skips_invalid_201(self, transfer, create_batch_transfer):
+        a = baker.make(Account, balance=100)
+        b = baker.make(Account, balance=0)
+
+        response: Response = create_batch_transfer([
+            transfer(a, b, 60),
+            transfer(a, b, 60),
+            transfer(a, a, 10),
+            {"src_account": str(uuid4()), "dest_account": str(b.id), "amount": 10},
+            transfer(a, b, 40),
+        ], mode="best_effort")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["succeeded"] == 2
+        assert response.data["failed"] == 3
+        assert [r["status"] for r in response.data["results"]] == ["ok", "error", "error", "error", "ok"]
+        assert "src_account" in response.data["results"][3]["errors"]
+        assert Transaction.objects.count() == 2
+        assert Account.objects.get(pk=a.id).balance == 0
+        assert Account.objects.get(pk=b.id).balance == 100
+
+    def test_empty_batch_400(self, create_batch_transfer):
+        response: Response = create_batch_transfer([])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_query_count_independent_of_batch_size(self, transfer, create_batch_transfer):
+        accounts = baker.make(Account, balance=1000, _quantity=20, _bulk_create=True)
+        transfers = [transfer(accounts[i % 20], accounts[(i + 1) % 20], 1) for i in range(200)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response: Response = create_batch_transfer(transfers)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Transaction.objects.count() == 200
+        # 8 of them create and update the day's rollup rows
+        assert len(ctx.captured_queries) <= 16
@@ -0,0 +1,61 @@
+import pytest
+
+from accounts.models import Account
+from benchmarks.suite import BENCHMARKS, Options, compare, run_benchmarks
+
+
+def result(name="transfer", **values):
+    return {
+        "name": name, "operations": 10, "throughput": 100.0, "unit": "requests",
+        "p50_ms": 10.0, "p99_ms": 20.0, "queries": 5.0, **values,
+    }
+
+
+class TestCompare:
+    def test_within_threshold(self):
+        assert compare([result(p50_ms=11.0, throughput=90.0)], [result()], threshold=0.2) == []
+
+    def test_slower(self):
+        regressions = compare([result(p99_ms=30.0)], [result()], threshold=0.2)
+
+        assert regressions == ["transfer: p99_ms 30.0, was 20.0"]
+
+    def test_lower_throughput(self):
+        assert len(compare([result(throughput=70.0)], [result()], threshold=0.2)) == 1
+
+    def test_any_extra_query(self):
+        regressions = compare([result(queries=6.0)], [result()], threshold=0.2)
+
+        assert regressions == ["transfer: 6.0 queries per operation, was 5.0"]
+
+    def test_more_memory(self):
+        regressions = compare([result(peak_mib=13.0)], [result(peak_mib=10.0)], threshold=0.2)
+
+        assert regressions == ["transfer: peak 13.0 MiB, was 10.0"]
+
+    def test_new_benchmarks_ignored(self):
+        assert compare([result(name="new", queries=100.0)], [result()], threshold=0.2) == []
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBenchmarks:
+    def test_every_benchmark_runs(self):
+        results = run_benchmarks(list(BENCHMARKS), Options(iterations=10, import_sizes=(20,), table_size=50))
+
+        assert [r.name for r in results] == [
+            "transfer", "batch_transfer", "account_create", "account_create_bulk[100]", "import_csv[20]", "import_json[20]",
+            "validate_accounts[20]", "validate_per_row[20]", "import_xlsx[20]", "import_ods[20]", "admin_import_xlsx[20]",
+            "account_list_deep", "transfer_list_deep", "account_detail",
+        ]
+        assert all(r.throughput > 0 and r.p50_ms <= r.p99_ms for r in results)
+        assert [r.name for r in results if r.peak_mib] == ["import_xlsx[20]", "import_ods[20]", "admin_import_xlsx[20]"]
+        assert not Account.objects.exists()
+
+    def test_query_counts(self):
+        results = {r.name: r for r in run_benchmarks(["detail", "list"], Options(iterations=10, table_size=50))}
+
+        assert results["account_detail"].queries == 1
+        assert results["transfer_list_deep"].queries == 1
+        # page of accounts plus the count
+        assert results["account_list_deep"].queries == 2
+
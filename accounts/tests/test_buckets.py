@@ -0,0 +1,196 @@
+from decimal import Decimal
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from account_transactions.settings import RECONCILIATION
+from accounts.buckets import set_buckets
+from accounts.ledger import balance_at
+from accounts.models import Account, BalanceBucket, BalanceCheckpoint, LedgerEntry
+from accounts.reconciliation import reconcile
+
+
+def bucket_balances(account) -> list[Decimal]:
+    return list(BalanceBucket.objects.filter(account=account).order_by("index").values_list("balance", flat=True))
+
+
+@pytest.mark.django_db
+class TestBucketedAccount:
+    def test_balance_spread_over_buckets(self, get_account):
+        account = baker.make(Account, balance=Decimal("100.01"))
+
+        set_buckets(account.id, 3)
+
+        account.refresh_from_db()
+        assert account.buckets == 3
+        assert bucket_balances(account) == [Decimal("33.33")] * 3
+        assert account.balance == Decimal("0.02")
+        assert get_account(account.id).data["balance"] == Decimal("100.01")
+
+    def test_credit_leaves_account_row_alone(self, create_transaction, get_account):
+        hot = baker.make(Account, balance=0)
+        set_buckets(hot.id, 4)
+        src = baker.make(Account, balance=100)
+
+        for _ in range(5):
+            response: Response = create_transaction({"src_account": src.id, "dest_account": hot.id, "amount": 10})
+            assert response.status_code == status.HTTP_201_CREATED
+
+        hot.refresh_from_db()
+        assert hot.balance == 0
+        assert sum(bucket_balances(hot)) == 50
+        assert get_account(hot.id).data["balance"] == 50
+
+    def test_debit_from_a_bucket(self, create_transaction):
+        hot = baker.make(Account, balance=40)
+        set_buckets(hot.id, 2)
+        dest = baker.make(Account, balance=0)
+
+        response: Response = create_transaction({"src_account": hot.id, "dest_account": dest.id, "amount": 15})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert sorted(bucket_balances(hot)) == [5, 20]
+
+    def test_debit_spanning_buckets_consolidates(self, create_transaction):
+        hot = baker.make(Account, balance=40)
+        set_buckets(hot.id, 4)
+        dest = baker.make(Account, balance=0)
+
+        response: Response = create_transaction({"src_account": hot.id, "dest_account": dest.id, "amount": 35})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        hot.refresh_from_db()
+        assert hot.balance == 5
+        assert bucket_balances(hot) == [0] * 4
+
+    def test_debit_over_total_rejected(self, create_transaction):
+        hot = baker.make(Account, balance=40)
+        set_buckets(hot.id, 4)
+        dest = baker.make(Account, balance=0)
+
+        response: Response = create_transaction({"src_account": hot.id, "dest_account": dest.id, "amount": 41})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert sum(bucket_balances(hot)) == 40
+
+    def test_ledger_replays_bucketed_balances(self, create_transaction):
+        before = timezone.now()
+        hot = baker.make(Account, balance=40)
+        set_buckets(hot.id, 4)
+        src = baker.make(Account, balance=10)
+        dest = baker.make(Account, balance=0)
+
+        create_transaction({"src_account": src.id, "dest_account": hot.id, "amount": 10})
+        between = timezone.now()
+        create_transaction({"src_account": hot.id, "dest_account": dest.id, "amount": 15})
+
+        # the total includes buckets other transfers may be moving, so it isn't recorded
+        assert list(LedgerEntry.objects.filter(account=hot).values_list("balance", flat=True)) == [None, None]
+        assert LedgerEntry.objects.get(account=src).balance == 0
+        assert balance_at(hot.id, between) == 50
+        assert balance_at(hot.id, timezone.now()) == 35
+        BalanceCheckpoint.objects.all().delete()
+        assert balance_at(hot.id, before) == 40
+        assert balance_at(hot.id, between) == 50
+
+    def test_list_annotates_total_balance(self, django_assert_num_queries, api_client):
+        for _ in range(3):
+            account = baker.make(Account, balance=30)
+            set_buckets(account.id, 3)
+
+        with django_assert_num_queries(2):
+            response: Response = api_client.get("/accounts/")
+
+        assert [acc["balance"] for acc in response.data["results"]] == [30] * 3
+
+    def test_batch_transfer_with_bucketed_accounts(self, create_batch_transfer, get_account):
+        hot = baker.make(Account, balance=40)
+        set_buckets(hot.id, 4)
+        other = baker.make(Account, balance=0)
+
+        response: Response = create_batch_transfer([
+            {"src_account": str(hot.id), "dest_account": str(other.id), "amount": 5},
+            {"src_account": str(other.id), "dest_account": str(hot.id), "amount": 2},
+        ])
+
+        assert response.status_code == status.HTTP_201_CREATED
+        # the net debit comes out of one bucket, like a single transfer's
+        hot.refresh_from_db()
+        assert hot.balance == 0
+        assert sorted(bucket_balances(hot)) == [7, 10, 10, 10]
+        assert get_account(hot.id).data["balance"] == 37
+
+    def test_batch_credit_goes_to_a_bucket(self, create_batch_transfer):
+        hot = baker.make(Account, balance=40)
+        set_buckets(hot.id, 4)
+        other = baker.make(Account, balance=10)
+
+        create_batch_transfer([{"src_account": str(other.id), "dest_account": str(hot.id), "amount": 3}])
+
+        hot.refresh_from_db()
+        assert hot.balance == 0
+        assert sorted(bucket_balances(hot)) == [10, 10, 10, 13]
+
+    def test_reconcile_sees_bucketed_balances(self, create_transaction, monkeypatch):
+        monkeypatch.setitem(RECONCILIATION, "settle_seconds", 0)
+        hot = baker.make(Account, balance=40)
+        set_buckets(hot.id, 4)
+        src = baker.make(Account, balance=100)
+        reconcile()
+
+        create_transaction({"src_account": src.id, "dest_account": hot.id, "amount": 10})
+
+        assert reconcile().run.drifted == 0
+
+    def test_import_replaces_bucketed_balance(self, upload_file, get_account):
+        hot = baker.make(Account, name="hot", balance=40)
+        set_buckets(hot.id, 4)
+        file = SimpleUploadedFile("accounts.csv", f"id,name,balance\n{hot.id},hot,7\n".encode(), content_type="text/csv")
+
+        upload_file(file)
+
+        assert get_account(hot.id).data["balance"] == 7
+
+    def test_admin_import_replaces_bucketed_balance(self, admin_client, get_account):
+        hot = baker.make(Account, name="hot", balance=40)
+        set_buckets(hot.id, 4)
+        file = SimpleUploadedFile("accounts.csv", f"id,name,balance\n{hot.id},hot,7\n".encode(), content_type="text/csv")
+
+        response = admin_client.post("/admin/accounts/account/import/", {"import_file": file, "input_format": 0})
+        assert not response.context["result"].has_errors()
+        admin_client.post("/admin/accounts/account/process_import/", response.context["confirm_form"].initial)
+
+        assert get_account(hot.id).data["balance"] == 7
+        assert bucket_balances(hot) == [0] * 4
+
+    def test_admin_edit_replaces_bucketed_balance(self, admin_client, get_account):
+        hot = baker.make(Account, name="hot", balance=40)
+        set_buckets(hot.id, 4)
+
+        response = admin_client.post(f"/admin/accounts/account/{hot.id}/change/", {"id": hot.id, "name": "hot", "balance": "7.00"})
+        assert response.status_code == status.HTTP_302_FOUND
+        assert get_account(hot.id).data["balance"] == 7
+        assert bucket_balances(hot) == [0] * 4
+
+    def test_export_writes_total_balance(self, export):
+        hot = baker.make(Account, balance=Decimal("40.10"))
+        set_buckets(hot.id, 4)
+
+        body = b"".join(export("/accounts/export/").streaming_content).decode()
+
+        assert body.splitlines()[1].endswith(",40.10")
+
+    def test_turning_buckets_off(self):
+        hot = baker.make(Account, balance=40)
+        set_buckets(hot.id, 4)
+
+        call_command("set_account_buckets", str(hot.id), "0")
+
+        hot.refresh_from_db()
+        assert (hot.balance, hot.buckets) == (40, 0)
+        assert not BalanceBucket.objects.exists()
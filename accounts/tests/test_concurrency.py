@@ -0,0 +1,112 @@
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from model_bakery import baker
+from rest_framework.exceptions import ValidationError
+
+from account_transactions.settings import SQLITE_PROFILES
+from accounts.models import Account, Transaction
+from accounts.serializers import TransactionSerializer
+from accounts.transfers import TransferError, move_balance
+
+
+@pytest.fixture
+def file_database(transactional_db, tmp_path):
+    """
+    Point every thread's connection at a file copy of the test database, with the production profile.
+
+    The shared-cache in-memory test database fails concurrent writers with "database
+    table is locked" at once; a file database with a busy timeout makes them queue,
+    so a failed transfer is a bug rather than contention.
+    """
+    path = tmp_path / "db.sqlite3"
+    connection.ensure_connection()
+    with sqlite3.connect(path) as target:
+        connection.connection.backup(target)
+    target.close()
+
+    in_memory = connections.settings["default"]
+    connection.close()
+    connections.settings["default"] = {**in_memory, **SQLITE_PROFILES["production"], "NAME": str(path)}
+    del connections["default"]
+    try:
+        yield
+    finally:
+        connections["default"].close()
+        connections.settings["default"] = in_memory
+        del connections["default"]
+
+
+@pytest.mark.usefixtures("file_database")
+class TestConcurrentTransfers:
+    NUM_ACCOUNTS = 5
+    NUM_WORKERS = 8
+    TRANSFERS_PER_WORKER = 50
+
+    def test_parallel_transfers_preserve_total_balance(self):
+        accounts = baker.make(Account, balance=100, _quantity=self.NUM_ACCOUNTS, _bulk_create=True)
+        ids = [acc.id for acc in accounts]
+        total = Account.objects.aggregate(total=Sum("balance"))["total"]
+
+        def worker(seed: int) -> int:
+            rnd = random.Random(seed)
+            applied = 0
+            try:
+                for _ in range(self.TRANSFERS_PER_WORKER):
+                    src, dest = rnd.sample(ids, 2)
+                    amount = Decimal(rnd.randint(1, 60))
+                    try:
+                        with transaction.atomic():
+                            move_balance(src, dest, amount)
+                            Transaction.objects.create(src_account_id=src, dest_account_id=dest, amount=amount)
+                        applied += 1
+                    except TransferError:
+                        pass
+            finally:
+                connection.close()
+            return applied
+
+        with ThreadPoolExecutor(max_workers=self.NUM_WORKERS) as pool:
+            applied = sum(pool.map(worker, range(self.NUM_WORKERS)))
+
+        assert applied > 0
+        assert Transaction.objects.count() == applied
+        assert Account.objects.aggregate(total=Sum("balance"))["total"] == total
+        assert not Account.objects.filter(balance__lt=0).exists()
+
+
+@pytest.mark.django_db
+class TestStaleValidation:
+    def test_debit_rechecks_balance_spent_after_validation(self):
+        src = baker.make(Account, balance=50)
+        dest = baker.make(Account, balance=0)
+        serializer = TransactionSerializer(data={"src_account": src.id, "dest_account": dest.id, "amount": 40})
+        assert serializer.is_valid()
+
+        # another transfer spends the balance between validation and the write
+        Account.objects.filter(pk=src.id).update(balance=10)
+
+        with pytest.raises(ValidationError):
+            serializer.save()
+        assert Account.objects.get(pk=src.id).balance == 10
+        assert Account.objects.get(pk=dest.id).balance == 0
+        assert not Transaction.objects.exists()
+
+
+@pytest.mark.django_db
+class TestMoveBalance:
+    def test_fractional_amounts_do_not_accumulate_rounding_errors(self):
+        src = baker.make(Account, balance=Decimal("0.3"))
+        dest = baker.make(Account, balance=0)
+
+        for _ in range(3):
+            move_balance(src.id, dest.id, Decimal("0.1"))
+
+        assert Account.objects.get(pk=src.id).balance == 0
+        assert Account.objects.get(pk=dest.id).balance == Decimal("0.3")
+        move_balance(dest.id, src.id, Decimal("0.3"))
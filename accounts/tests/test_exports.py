@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+
+from account_transactions.settings import EXPORTS
+from accounts.models import Account, Transaction
+
+
+def content(response) -> str:
+    assert response.streaming
+    return b"".join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+class TestAccountExport:
+    def test_csv(self, export):
+        accounts = baker.make(Account, balance=Decimal("12.34"), _quantity=3)
+
+        response = export("/accounts/export/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/csv; charset=utf-8"
+        assert response["Content-Disposition"] == 'attachment; filename="accounts.csv"'
+        rows = list(csv.DictReader(io.StringIO(content(response))))
+        assert rows == [
+            {"id": str(a.id), "name": a.name, "balance": "12.34"}
+            for a in sorted(accounts, key=lambda a: a.id)
+        ]
+
+    def test_ndjson_keeps_decimals_exact(self, export):
+        account = baker.make(Account, name='quote " and, comma', balance=Decimal("12345678.10"))
+
+        response = export("/accounts/export/", format="ndjson")
+
+        assert response["Content-Type"] == "application/x-ndjson; charset=utf-8"
+        lines = content(response).splitlines()
+        assert [json.loads(line, parse_float=Decimal) for line in lines] == [
+            {"id": str(account.id), "name": account.name, "balance": Decimal("12345678.10")}
+        ]
+
+    def test_format_from_accept_header(self, api_client):
+        baker.make(Account)
+
+        response = api_client.get("/accounts/export/", HTTP_ACCEPT="application/x-ndjson")
+
+        assert response["Content-Type"].startswith("application/x-ndjson")
+
+    def test_empty_csv_has_header(self, export):
+        assert content(export("/accounts/export/")) == "id,name,balance\r\n"
+
+    def test_unknown_format(self, export):
+        assert export("/accounts/export/", format="xml").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_single_query_in_chunks(self, django_assert_num_queries, monkeypatch, export):
+        monkeypatch.setitem(EXPORTS, "chunk_size", 10)
+        baker.make(Account, _quantity=25)
+
+        with django_assert_num_queries(1):
+            body = content(export("/accounts/export/", format="ndjson"))
+
+        assert len(body.splitlines()) == 25
+
+    def test_export_can_be_imported(self, export, upload_file):
+        accounts = baker.make(Account, balance=Decimal("7.50"), _quantity=3)
+        body = content(export("/accounts/export/")).encode()
+        Account.objects.update(balance=0)
+
+        response = upload_file(SimpleUploadedFile("accounts.csv", body, content_type="text/csv"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert {a.balance for a in Account.objects.all()} == {Decimal("7.50")}
+        assert Account.objects.count() == len(accounts)
+
+
+@pytest.mark.django_db
+class TestTransferExport:
+    def make_transactions(self, n):
+        src = baker.make(Account, balance=1000)
+        dest = baker.make(Account)
+        start = timezone.now() - timedelta(days=n)
+        transactions = baker.make(Transaction, src_account=src, dest_account=dest, amount=Decimal("1.50"), _quantity=n)
+        for i, t in enumerate(transactions):
+            t.created_at = start + timedelta(days=i)
+        Transaction.objects.bulk_update(transactions, ["created_at"])
+        return transactions
+
+    def test_ndjson_in_creation_order(self, export):
+        transactions = self.make_transactions(3)
+
+        rows = [json.loads(line) for line in content(export("/accounts/transfer/export/", format="ndjson")).splitlines()]
+
+        assert [row["id"] for row in rows] == [str(t.id) for t in transactions]
+        assert set(rows[0]) == {"id", "src_account", "dest_account", "amount", "created_at"}
+        assert rows[0]["src_account"] == str(transactions[0].src_account_id)
+        assert rows[0]["amount"] == 1.5
+        assert rows[0]["created_at"].endswith("Z")
+
+    def test_time_range(self, export):
+        transactions = self.make_transactions(5)
+
+        response = export(
+            "/accounts/transfer/export/",
+            since=transactions[1].created_at.isoformat(),
+            until=transactions[3].created_at.isoformat(),
+        )
+
+        rows = list(csv.DictReader(io.StringIO(content(response))))
+        assert [row["id"] for row in rows] == [str(t.id) for t in transactions[1:3]]
+
+    def test_invalid_filter_reported_as_json(self, export):
+        response = export("/accounts/transfer/export/", since="yesterday")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response["Content-Type"] == "application/json"
+        assert "since" in response.json()
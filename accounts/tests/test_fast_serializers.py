@@ -0,0 +1,106 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from model_bakery import baker
+
+from accounts import views
+from accounts.buckets import set_buckets
+from accounts.models import Account, Transaction
+
+
+NAMES = ['plain', 'quote " and \\ backslash', "unicode é ✓ 中文", "line\u2028separator\u2029", "new\nline", ""]
+BALANCES = [Decimal("0"), Decimal("0.10"), Decimal("12345678.99"), Decimal("1.05"), Decimal("100"), Decimal("3.33")]
+
+
+def both_paths(monkeypatch, view, get):
+    fast = get()
+    monkeypatch.setattr(view, "fast_list", False)
+    slow = get()
+    monkeypatch.setattr(view, "fast_list", True)
+    return fast, slow
+
+
+@pytest.fixture
+def accounts():
+    accounts = [baker.make(Account, name=name, balance=balance) for name, balance in zip(NAMES, BALANCES)]
+    set_buckets(accounts[2].id, 3)
+    return accounts
+
+
+@pytest.fixture
+def transactions(accounts):
+    now = timezone.now().replace(microsecond=0)
+    transactions = baker.make(
+        Transaction,
+        src_account=accounts[0],
+        dest_account=accounts[1],
+        amount=Decimal("7.50"),
+        _quantity=12,
+    )
+    for i, t in enumerate(transactions):
+        # whole seconds and fractions of one, in both isoformat spellings
+        t.created_at = now - timedelta(seconds=i, microseconds=i % 2 * 1500)
+    Transaction.objects.bulk_update(transactions, ["created_at"])
+    return transactions
+
+
+@pytest.mark.django_db
+class TestFastListOutput:
+    def test_account_list(self, monkeypatch, api_client, accounts):
+        fast, slow = both_paths(monkeypatch, views.AccountList, lambda: api_client.get("/accounts/", {"page": 1}))
+
+        assert fast.status_code == 200
+        assert fast.content == slow.content
+        assert fast.data == slow.data
+        assert fast["Content-Type"] == slow["Content-Type"]
+
+    def test_bucketed_account_balance(self, api_client, accounts):
+        results = api_client.get("/accounts/", {"page": 1}).data["results"] + api_client.get("/accounts/", {"page": 2}).data["results"]
+
+        balances = {item["id"]: item["balance"] for item in results}
+        assert balances[str(accounts[2].id)] == Decimal("12345678.99")
+
+    def test_transfer_list_pages(self, monkeypatch, api_client, transactions):
+        url = "/accounts/transfer/?page_size=5"
+        while url:
+            fast, slow = both_paths(monkeypatch, views.TransferList, lambda: api_client.get(url))
+            assert fast.content == slow.content
+            assert fast.data == slow.data
+            url = fast.data["next"]
+
+    def test_account_transactions(self, monkeypatch, api_client, accounts, transactions):
+        fast, slow = both_paths(
+            monkeypatch,
+            views.AccountTransactionList,
+            lambda: api_client.get(f"/accounts/{accounts[0].id}/transactions/", {"count": "false", "page_size": 20}),
+        )
+
+        assert fast.content == slow.content
+        assert len(fast.data["results"]) == len(transactions)
+
+    def test_decimals_coerced_to_string(self, monkeypatch, settings, api_client, transactions):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "COERCE_DECIMAL_TO_STRING": True}
+        fast, slow = both_paths(monkeypatch, views.TransferList, lambda: api_client.get("/accounts/transfer/"))
+
+        assert fast.content == slow.content
+        assert fast.data["results"][0]["amount"] == "7.50"
+        assert b'"amount":"7.50"' in fast.content
+
+    def test_browsable_api_uses_serializer(self, api_client, transactions):
+        response = api_client.get("/accounts/transfer/", HTTP_ACCEPT="text/html")
+
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/html")
+
+    def test_indented_json_uses_serializer(self, monkeypatch, api_client, transactions):
+        get = lambda: api_client.get("/accounts/transfer/", HTTP_ACCEPT="application/json; indent=2")
+        fast, slow = both_paths(monkeypatch, views.TransferList, get)
+
+        assert fast.content == slow.content
+        assert b"\n  " in fast.content
+
+    def test_single_query_per_page(self, django_assert_num_queries, api_client, transactions):
+        with django_assert_num_queries(1):
+            api_client.get("/accounts/transfer/", {"count": "false", "page_size": 10})
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.db.models import Sum
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from account_transactions.settings import TRANSFERS
+from accounts import group_commit
+from accounts.models import Account, LedgerEntry, Transaction
+from accounts.transfers import INSUFFICIENT_BALANCE_ERROR, Transfer
+
+
+@pytest.fixture
+def groups(monkeypatch):
+    """Enable group commit and record the size of every group the writer applies."""
+    monkeypatch.setitem(TRANSFERS, "group_commit", True)
+    monkeypatch.setitem(TRANSFERS, "group_commit_max_wait", 0.2)
+    monkeypatch.setitem(TRANSFERS, "group_commit_max_size", 4)
+    sizes = []
+    apply_transfers = group_commit.apply_transfers
+
+    def recording(transfers, atomic=True):
+        sizes.append(len(transfers))
+        return apply_transfers(transfers, atomic)
+
+    monkeypatch.setattr(group_commit, "apply_transfers", recording)
+    return sizes
+
+
+def post_concurrently(transfers: list[dict], headers: list[dict] | None = None) -> list:
+    def post(i):
+        try:
+            return APIClient().post("/accounts/transfer/", transfers[i], headers=(headers or [{}] * len(transfers))[i])
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(transfers)) as pool:
+        return list(pool.map(post, range(len(transfers))))
+
+
+@pytest.mark.django_db(transaction=True)
+class TestGroupCommit:
+    def test_concurrent_transfers_share_commits(self, transfer, groups):
+        accounts = baker.make(Account, balance=100, _quantity=4)
+        transfers = [transfer(accounts[i % 4], accounts[(i + 1) % 4], 1) for i in range(8)]
+
+        responses = post_concurrently(transfers)
+
+        assert [r.status_code for r in responses] == [status.HTTP_201_CREATED] * 8
+        assert sum(groups) == 8 and len(groups) < 8 and max(groups) <= 4
+        assert {r.data["id"] for r in responses} == {str(pk) for pk in Transaction.objects.values_list("pk", flat=True)}
+        assert LedgerEntry.objects.count() == 16
+        assert Account.objects.aggregate(total=Sum("balance"))["total"] == 400
+
+    def test_invalid_transfer_is_rejected_alone(self, transfer, groups):
+        rich, poor, dest = baker.make(Account, balance=10, _quantity=3)
+        Account.objects.filter(pk=poor.pk).update(balance=0)
+
+        responses = post_concurrently([transfer(rich, dest, 5), transfer(poor, dest, 5), transfer(rich, dest, 5)])
+
+        assert [r.status_code for r in responses] == [
+            status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST, status.HTTP_201_CREATED,
+        ]
+        assert responses[1].data == {"non_field_errors": [INSUFFICIENT_BALANCE_ERROR]}
+        assert Account.objects.get(pk=dest.pk).balance == 20
+        assert Account.objects.get(pk=rich.pk).balance == 0
+
+    def test_field_errors_never_reach_the_writer(self, groups, create_transaction):
+        response = create_transaction({"src_account": "x", "amount": 0})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data) == {"src_account", "dest_account", "amount"}
+        assert groups == []
+
+    def test_idempotent_requests_commit_on_their_own(self, transfer, groups):
+        src, dest = baker.make(Account, balance=10, _quantity=2)
+        responses = post_concurrently([transfer(src, dest, 1)], headers=[{"Idempotency-Key": "k1"}])
+        assert responses[0].status_code == status.HTTP_201_CREATED
+        assert groups == []
+
+    def test_writer_survives_database_errors(self, groups, monkeypatch):
+        src, dest = baker.make(Account, balance=10, _quantity=2)
+        apply_transfers = group_commit.apply_transfers
+        calls = []
+
+        def fail_once(transfers, atomic=True):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("disk full")
+            return apply_transfers(transfers, atomic)
+
+        monkeypatch.setattr(group_commit, "apply_transfers", fail_once)
+        with pytest.raises(RuntimeError):
+            group_commit.submit(Transfer(src.id, dest.id, Decimal(1)))
+
+        result = group_commit.submit(Transfer(src.id, dest.id, Decimal(1)))
+        assert result.ok
+        assert Account.objects.get(pk=dest.pk).balance == 11
@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.models import Account, IdempotencyKey, Transaction
+
+
+@pytest.mark.django_db
+class TestIdempotentTransfer:
+    def transfer(self, src, dest, amount=10):
+        return {"src_account": str(src.id), "dest_account": str(dest.id), "amount": amount}
+
+    def test_retry_replays_stored_response(self, create_idempotent_transaction):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account, balance=0)
+
+        first: Response = create_idempotent_transaction(self.transfer(src, dest), "key-1")
+        retry: Response = create_idempotent_transaction(self.transfer(src, dest), "key-1")
+
+        assert first.status_code == status.HTTP_201_CREATED
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry.content == first.content
+        assert retry["Idempotent-Replayed"] == "true"
+        assert not first.has_header("Idempotent-Replayed")
+        assert Transaction.objects.count() == 1
+        src.refresh_from_db()
+        assert src.balance == 90
+
+    def test_replay_is_a_single_query(self, django_assert_num_queries, create_idempotent_transaction):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account)
+        create_idempotent_transaction(self.transfer(src, dest), "key-1")
+
+        with django_assert_num_queries(1):
+            retry: Response = create_idempotent_transaction(self.transfer(src, dest), "key-1")
+
+        assert retry.status_code == status.HTTP_201_CREATED
+
+    def test_key_reused_with_different_body(self, create_idempotent_transaction):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account)
+        create_idempotent_transaction(self.transfer(src, dest), "key-1")
+
+        response: Response = create_idempotent_transaction(self.transfer(src, dest, amount=20), "key-1")
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert Transaction.objects.count() == 1
+
+    def test_failed_transfer_is_not_stored(self, create_idempotent_transaction):
+        src = baker.make(Account, balance=5)
+        dest = baker.make(Account)
+
+        failed: Response = create_idempotent_transaction(self.transfer(src, dest), "key-1")
+        Account.objects.filter(pk=src.pk).update(balance=50)
+        retry: Response = create_idempotent_transaction(self.transfer(src, dest), "key-1")
+
+        assert failed.status_code == status.HTTP_400_BAD_REQUEST
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert Transaction.objects.count() == 1
+
+    def test_distinct_keys_are_independent(self, create_idempotent_transaction):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account)
+
+        create_idempotent_transaction(self.transfer(src, dest), "key-1")
+        create_idempotent_transaction(self.transfer(src, dest), "key-2")
+
+        assert Transaction.objects.count() == 2
+
+    def test_invalid_key(self, create_idempotent_transaction):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account)
+
+        response: Response = create_idempotent_transaction(self.transfer(src, dest), "k" * 256)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Transaction.objects.exists()
+
+    def test_batch_transfer_replayed(self, api_client):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account)
+        data = {"transfers": [self.transfer(src, dest)]}
+
+        first: Response = api_client.post("/accounts/transfer/batch/", data, format="json", HTTP_IDEMPOTENCY_KEY="batch-1")
+        retry: Response = api_client.post("/accounts/transfer/batch/", data, format="json", HTTP_IDEMPOTENCY_KEY="batch-1")
+
+        assert retry.content == first.content
+        assert Transaction.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestExpiredKeys:
+    def test_expired_key_is_not_replayed(self, settings, create_idempotent_transaction):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account)
+        transfer = {"src_account": str(src.id), "dest_account": str(dest.id), "amount": 10}
+        create_idempotent_transaction(transfer, "key-1")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        response: Response = create_idempotent_transaction(transfer, "key-1")
+
+        assert not response.has_header("Idempotent-Replayed")
+        assert Transaction.objects.count() == 2
+
+    def test_purge_command(self):
+        old = timezone.now() - timedelta(days=2)
+        for i in range(5):
+            baker.make(IdempotencyKey, key=f"old-{i}", response={})
+        IdempotencyKey.objects.update(created_at=old)
+        baker.make(IdempotencyKey, key="fresh", response={})
+
+        call_command("purge_idempotency_keys", batch_size=2)
+
+        assert list(IdempotencyKey.objects.values_list("key", flat=True)) == ["fresh"]
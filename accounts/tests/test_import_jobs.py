@@ -0,0 +1,191 @@
+from concurrent.futures import Future
+from datetime import timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+import tablib
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from account_transactions.settings import UPLOADED_FILES
+from accounts import jobs, views
+from accounts.imports import XLSX
+from accounts.jobs import create_import_job, recover_import_jobs, run_import_job, submit_import_job
+from accounts.models import Account, ImportJob
+
+
+@pytest.fixture(autouse=True)
+def jobs_dir(monkeypatch, tmp_path):
+    monkeypatch.setitem(UPLOADED_FILES, "jobs_dir", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def submitted_jobs(monkeypatch) -> list[Future]:
+    # the test database is a shared-cache in-memory SQLite database, which fails
+    # concurrent readers with "table is locked", so wait for jobs instead of polling
+    futures = []
+
+    def submit(job):
+        futures.append(submit_import_job(job))
+        return futures[-1]
+
+    monkeypatch.setattr(views, "submit_import_job", submit)
+    return futures
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBackgroundImport:
+    def test_csv_job_parsed_in_parallel_202(self, monkeypatch, api_client, get_import_job, jobs_dir, submitted_jobs):
+        monkeypatch.setitem(UPLOADED_FILES, "job_chunk_size", 256)
+        monkeypatch.setitem(UPLOADED_FILES, "job_parse_processes", 2)
+        lines = [f"{uuid4()},Account {i},{i}.25" for i in range(100)]
+        lines[10] = f"{uuid4()},,5"  # missing name
+        lines[20] = f"{uuid4()}"  # missing columns
+        file = SimpleUploadedFile(
+            name="accounts.csv",
+            content=("id,name,balance\n" + "\n".join(lines) + "\n").encode(),
+            content_type="text/csv",
+        )
+
+        response: Response = api_client.put("/accounts/import/", {"accounts_file": file, "background": True})
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response["Location"] == f"/accounts/import/{response.data['id']}/"
+
+        submitted_jobs[0].result(timeout=60)
+        response = get_import_job(response.data["id"])
+
+        assert response.data["status"] == ImportJob.Status.SUCCEEDED
+        assert response.data["rows_parsed"] == 100
+        assert response.data["rows_upserted"] == 98
+        assert response.data["rows_rejected"] == 2
+        assert response.data["bytes_processed"] == response.data["file_size"]
+        assert Account.objects.count() == 98
+        assert not any(jobs_dir.iterdir())
+
+    def test_unsupported_format_400(self, api_client):
+        file = SimpleUploadedFile(name="accounts.txt", content=b"asdf", content_type="text/plain")
+        response: Response = api_client.put("/accounts/import/", {"accounts_file": file, "background": True})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not ImportJob.objects.exists()
+
+
+@pytest.mark.django_db
+class TestRunImportJob:
+    def test_json_job_reports_progress(self, monkeypatch, get_import_job):
+        monkeypatch.setitem(UPLOADED_FILES, "batch_size", 2)
+        ids = [uuid4() for _ in range(3)]
+        file = SimpleUploadedFile(
+            name="accounts.json",
+            content=f"""[
+                {{"id": "{ids[0]}", "name": "Ali", "balance": 1}},
+                {{"id": "{ids[1]}", "name": "Mona", "balance": 2.5}},
+                {{"id": "{ids[2]}", "balance": 3}},
+                {{"id": "not-a-uuid", "name": "Sara", "balance": 4}}
+            ]""".encode(),
+            content_type="application/json",
+        )
+        job = create_import_job(file)
+
+        run_import_job(job.id)
+
+        response: Response = get_import_job(job.id)
+        assert response.data["status"] == ImportJob.Status.SUCCEEDED
+        assert response.data["rows_parsed"] == 4
+        assert response.data["rows_upserted"] == 2
+        # one without a name, one with an invalid id
+        assert response.data["rows_rejected"] == 2
+        assert response.data["rows_per_second"] is not None
+        assert Account.objects.count() == 2
+
+    def test_xlsx_job(self, monkeypatch):
+        monkeypatch.setitem(UPLOADED_FILES, "batch_size", 2)
+        rows = [(str(uuid4()), f"Account {i}", i + 0.5) for i in range(5)] + [("not-a-uuid", "Mona", 1)]
+        file = SimpleUploadedFile(
+            name="accounts.xlsx",
+            content=tablib.Dataset(*rows, headers=["id", "name", "balance"]).export("xlsx"),
+            content_type=XLSX,
+        )
+        job = create_import_job(file)
+
+        run_import_job(job.id)
+
+        job.refresh_from_db()
+        assert job.status == ImportJob.Status.SUCCEEDED
+        assert (job.rows_parsed, job.rows_upserted, job.rows_rejected) == (6, 5, 1)
+        assert Account.objects.get(name="Account 4").balance == Decimal("4.5")
+
+    def test_failed_job_keeps_committed_progress(self, monkeypatch):
+        monkeypatch.setitem(UPLOADED_FILES, "job_chunk_size", 1)
+        monkeypatch.setitem(UPLOADED_FILES, "job_parse_processes", 0)
+        file = SimpleUploadedFile(
+            name="accounts.csv",
+            content=f"id,name,balance\n{uuid4()},Ali,1\n{uuid4()},Mona,2\n".encode(),
+            content_type="text/csv",
+        )
+        job = create_import_job(file)
+        upsert_accounts = jobs.upsert_accounts
+        calls = []
+
+        def fail_second_chunk(rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError("disk full")
+            return upsert_accounts(rows)
+
+        monkeypatch.setattr(jobs, "upsert_accounts", fail_second_chunk)
+        run_import_job(job.id)
+
+        job.refresh_from_db()
+        assert job.status == ImportJob.Status.FAILED
+        assert job.error == "disk full"
+        assert job.rows_upserted == 1
+        assert Account.objects.count() == 1
+
+    def test_csv_with_quoted_newlines_is_streamed(self, monkeypatch):
+        monkeypatch.setitem(UPLOADED_FILES, "job_chunk_size", 1)
+        monkeypatch.setitem(UPLOADED_FILES, "job_parse_processes", 0)
+        ids = [uuid4(), uuid4()]
+        file = SimpleUploadedFile(
+            name="accounts.csv",
+            content=f'id,name,balance\n{ids[0]},"Ali\nSmith",1\n{ids[1]},Mona,2\n'.encode(),
+            content_type="text/csv",
+        )
+        job = create_import_job(file)
+
+        run_import_job(job.id)
+
+        job.refresh_from_db()
+        assert (job.status, job.rows_upserted, job.rows_rejected) == (ImportJob.Status.SUCCEEDED, 2, 0)
+        assert Account.objects.get(pk=ids[0]).name == "Ali\nSmith"
+
+    def test_recover_jobs(self, monkeypatch):
+        submitted = []
+        monkeypatch.setattr(jobs, "submit_import_job", lambda job: submitted.append(job.id))
+        pending, running, stale = (
+            baker.make(ImportJob, file_path=str(uuid4()), status=status)
+            for status in (ImportJob.Status.PENDING, ImportJob.Status.RUNNING, ImportJob.Status.RUNNING)
+        )
+        ImportJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        futures, failed = recover_import_jobs()
+
+        assert (submitted, failed) == ([pending.id], 1)
+        stale.refresh_from_db()
+        assert (stale.status, stale.error) == (ImportJob.Status.FAILED, jobs.INTERRUPTED_ERROR)
+        assert ImportJob.objects.get(pk=running.pk).status == ImportJob.Status.RUNNING
+
+    def test_job_runs_once(self, monkeypatch):
+        job = baker.make(ImportJob, status=ImportJob.Status.RUNNING)
+        monkeypatch.setattr(jobs, "_parsed_chunks", lambda job: pytest.fail("claimed job run again"))
+        run_import_job(job.id)
+        assert ImportJob.objects.get(pk=job.pk).status == ImportJob.Status.RUNNING
+
+    def test_unknown_job_404(self, get_import_job):
+        response: Response = get_import_job(uuid4())
+        assert response.status_code == status.HTTP_404_NOT_FOUND
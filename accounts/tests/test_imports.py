@@ -0,0 +1,361 @@
+import io
+import zipfile
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+import pytest
+import tablib
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from account_transactions.settings import UPLOADED_FILES
+from accounts.buckets import set_buckets
+from accounts.imports import (
+    DUPLICATE_ID_ERROR,
+    ODS,
+    XLSX,
+    ImportFileError,
+    RowError,
+    iter_json_array,
+    validate_accounts,
+)
+from accounts.models import Account, BalanceBucket, BalanceCheckpoint
+
+
+def csv_file(rows: list[tuple]) -> SimpleUploadedFile:
+    content = "id,name,balance\n" + "".join(f"{id},{name},{balance}\n" for id, name, balance in rows)
+    return SimpleUploadedFile(name="accounts.csv", content=content.encode(), content_type="text/csv")
+
+
+class TestJsonArrayStream:
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+    def test_items_decoded_across_chunks(self, chunk_size):
+        text = io.StringIO('[ {"id": "a", "balance": 12.5}, {"id": "b", "balance": 1234567} ]')
+        assert list(iter_json_array(text, chunk_size)) == [
+            {"id": "a", "balance": Decimal("12.5")},
+            {"id": "b", "balance": 1234567},
+        ]
+
+    @pytest.mark.parametrize("content", ['{"id": "a"}', '[{"id": "a"}', '[{"id": "a"},]', '[{"id": "a"} {}]'])
+    def test_malformed_json_raises(self, content):
+        with pytest.raises(ImportFileError):
+            list(iter_json_array(io.StringIO(content), 4))
+
+
+class TestValidateAccounts:
+    def test_slow_path_accepts_what_the_fields_accept(self):
+        id = uuid4()
+        valid, errors = validate_accounts([
+            {"id": f"{{{id}}}", "name": 42, "balance": Decimal("10.500")},
+            {"id": id.int + 1, "name": "Int id", "balance": "  7 "},
+        ])
+
+        assert errors == []
+        assert valid == [(id, "42", Decimal("10.500")), (UUID(int=id.int + 1), "Int id", Decimal(7))]
+
+    def test_rows_numbered_from_first_row(self):
+        _, errors = validate_accounts([{"id": str(uuid4()), "name": "A", "balance": "NaN"}, None], first_row=11)
+        assert errors == [
+            RowError(11, "balance", "A valid number is required."),
+            RowError(12, "__all__", "Expected an object with id, name and balance."),
+        ]
+
+
+@pytest.mark.django_db
+class TestStreamingImport:
+    def test_disk_backed_upload_200(self, settings, upload_file):
+        settings.FILE_UPLOAD_MAX_MEMORY_SIZE = 16
+        rows = [(uuid4(), f"Account {i}", f"{i}.50") for i in range(50)]
+
+        response: Response = upload_file(csv_file(rows))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["imported"] == len(rows)
+        assert Account.objects.count() == len(rows)
+
+    def test_import_in_batches_upserts_existing(self, monkeypatch, upload_file):
+        monkeypatch.setitem(UPLOADED_FILES, "batch_size", 3)
+        existing = baker.make(Account, name="Old", balance=1)
+        rows = [(existing.id, "Old", "99.99")] + [(uuid4(), f"Account {i}", "10") for i in range(9)]
+
+        response: Response = upload_file(csv_file(rows))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {
+            "mode": "merge", "dry_run": False, "imported": 10, "batches": 4,
+            "inserted": 9, "updated": 1, "unchanged": 0, "rejected": 0, "errors": [], "deleted": 0, "protected": 0,
+        }
+        assert Account.objects.count() == 10
+        assert Account.objects.get(pk=existing.id).balance == Decimal("99.99")
+
+    @pytest.mark.parametrize("mode, kept", [("merge", 2), ("replace", 0)])
+    def test_merge_commits_each_batch(self, monkeypatch, upload_file, mode, kept):
+        monkeypatch.setitem(UPLOADED_FILES, "batch_size", 2)
+        items = ", ".join(f'{{"id": "{uuid4()}", "name": "A", "balance": 1}}' for _ in range(3))
+        file = SimpleUploadedFile("accounts.json", f"[{items}".encode(), content_type="application/json")
+
+        response: Response = upload_file(file, mode=mode)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Account.objects.count() == kept
+
+    def test_ndjson_import_200(self, upload_file):
+        ids = [uuid4(), uuid4()]
+        file = SimpleUploadedFile(
+            name="accounts.ndjson",
+            content=f"""{{"id": "{ids[0]}", "name": "Ali", "balance": 10.25}}
+
+{{"id": "{ids[1]}", "name": "Mona", "balance": 3}}
+""".encode(),
+            content_type="application/x-ndjson",
+        )
+
+        response: Response = upload_file(file)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert Account.objects.get(pk=ids[0]).balance == Decimal("10.25")
+        assert Account.objects.get(pk=ids[1]).name == "Mona"
+
+    def test_invalid_rows_reported_and_skipped_200(self, monkeypatch, upload_file):
+        monkeypatch.setitem(UPLOADED_FILES, "batch_size", 2)
+        ids = [uuid4() for _ in range(3)]
+        file = SimpleUploadedFile(
+            name="accounts.json",
+            content=f"""[
+                {{"id": "{ids[0]}", "name": "Ali", "balance": 1}},
+                {{"id": "{ids[1]}", "balance": 1}},
+                {{"id": "not-a-uuid", "name": "Mona", "balance": -1}},
+                {{"id": "{ids[2]}", "name": "Sara", "balance": 1.005}},
+                {{"id": "{str(ids[0]).upper()}", "name": "Ali", "balance": 123456789}},
+                {{"id": "{ids[2]}", "name": "Sara", "balance": 2}},
+                [1, 2, 3]
+            ]""".encode(),
+            content_type="application/json",
+        )
+
+        response: Response = upload_file(file)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data["imported"], response.data["rejected"], response.data["batches"]) == (2, 5, 4)
+        assert [(e["row"], e["field"]) for e in response.data["errors"]] == [
+            (2, "name"), (3, "id"), (3, "balance"), (4, "balance"), (5, "balance"), (7, "__all__"),
+        ]
+        assert dict(Account.objects.values_list("pk", "balance")) == {ids[0]: 1, ids[2]: 2}
+
+    def test_duplicate_ids_within_a_batch(self, upload_file):
+        id = uuid4()
+
+        response: Response = upload_file(csv_file([(id, "First", "1"), (str(id).replace("-", ""), "Second", "2")]))
+
+        assert response.data["errors"] == [{"row": 2, "field": "id", "error": DUPLICATE_ID_ERROR}]
+        assert Account.objects.get().name == "First"
+
+    def test_reported_errors_are_capped(self, monkeypatch, upload_file):
+        monkeypatch.setitem(UPLOADED_FILES, "batch_size", 3)
+        monkeypatch.setitem(UPLOADED_FILES, "max_reported_errors", 4)
+
+        response: Response = upload_file(csv_file([(uuid4(), f"Account {i}", "-1") for i in range(10)]))
+
+        assert response.data["rejected"] == 10
+        assert [e["row"] for e in response.data["errors"]] == [1, 2, 3, 4]
+        assert not Account.objects.exists()
+
+
+def _counts(data: dict) -> tuple:
+    return tuple(data[key] for key in ("inserted", "updated", "unchanged", "deleted", "protected"))
+
+
+@pytest.mark.django_db
+class TestDiffImport:
+    @pytest.fixture
+    def accounts(self):
+        return [
+            baker.make(Account, name="Same", balance=10),
+            baker.make(Account, name="Old name", balance=20),
+            baker.make(Account, name="Rebalanced", balance=30),
+        ]
+
+    def test_only_changed_rows_are_written(self, accounts, upload_file):
+        same, renamed, rebalanced = accounts
+        rows = [
+            (same.id, "Same", "10.00"),
+            (renamed.id, "New name", "20"),
+            (rebalanced.id, "Rebalanced", "31.50"),
+            (uuid4(), "New", "1"),
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response: Response = upload_file(csv_file(rows))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert _counts(response.data) == (1, 2, 1, 0, 0)
+        assert Account.objects.get(pk=renamed.id).name == "New name"
+        assert Account.objects.get(pk=rebalanced.id).balance == Decimal("31.50")
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "accounts_account"')]
+        assert len(updates) == 2
+        assert all(str(same.id).replace("-", "") not in sql for sql in updates)
+
+    def test_unchanged_file_writes_nothing(self, accounts, upload_file):
+        rows = [(account.id, account.name, str(account.balance)) for account in accounts]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response: Response = upload_file(csv_file(rows))
+
+        assert _counts(response.data) == (0, 0, 3, 0, 0)
+        assert not [q for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+
+    def test_bucketed_account_compares_total_balance(self, upload_file):
+        account = baker.make(Account, name="Hot", balance=100)
+        set_buckets(account.id, 4)
+
+        response: Response = upload_file(csv_file([(account.id, "Hot", "100")]))
+
+        assert _counts(response.data) == (0, 0, 1, 0, 0)
+        assert BalanceBucket.objects.filter(account=account, balance=25).count() == 4
+
+    def test_replace_deletes_missing_unreferenced_accounts(self, accounts, upload_file, create_transaction):
+        same, renamed, rebalanced = accounts
+        create_transaction({"src_account": str(renamed.id), "dest_account": str(same.id), "amount": 1})
+
+        response: Response = upload_file(csv_file([(same.id, "Same", "11")]), mode="replace")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert _counts(response.data) == (0, 0, 1, 1, 1)
+        assert set(Account.objects.values_list("pk", flat=True)) == {same.id, renamed.id}
+
+    def test_replace_deletes_accounts_with_only_checkpoints(self, accounts, upload_file):
+        same, renamed, rebalanced = accounts
+        upload_file(csv_file([(rebalanced.id, "Rebalanced", "31")]))
+        assert BalanceCheckpoint.objects.filter(account=rebalanced).exists()
+
+        response: Response = upload_file(csv_file([(same.id, "Same", "10")]), mode="replace")
+
+        assert _counts(response.data) == (0, 0, 1, 2, 0)
+        assert set(Account.objects.values_list("pk", flat=True)) == {same.id}
+        assert not BalanceCheckpoint.objects.exists()
+
+    def test_replace_keeps_accounts_of_rejected_rows(self, accounts, upload_file):
+        same, renamed, rebalanced = accounts
+
+        response: Response = upload_file(
+            csv_file([(same.id, "Same", "10"), (renamed.id, "Typo", "1O.00"), (rebalanced.id, "", "30")]), mode="replace"
+        )
+
+        assert response.data["rejected"] == 2
+        assert _counts(response.data) == (0, 0, 1, 0, 0)
+        assert Account.objects.get(pk=renamed.id).name == "Old name"
+        assert Account.objects.count() == 3
+
+    def test_dry_run_reports_without_writing(self, accounts, upload_file):
+        same, _, rebalanced = accounts
+        rows = [(same.id, "Same", "10"), (rebalanced.id, "Rebalanced", "1"), (uuid4(), "New", "1")]
+
+        response: Response = upload_file(csv_file(rows), mode="replace", dry_run=True)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["dry_run"] is True
+        assert _counts(response.data) == (1, 1, 1, 1, 0)
+        assert Account.objects.count() == 3
+        assert Account.objects.get(pk=rebalanced.id).balance == 30
+
+    def test_invalid_mode_400(self, upload_file):
+        response: Response = upload_file(csv_file([(uuid4(), "A", "1")]), mode="overwrite")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "mode" in response.data
+
+    def test_background_import_only_merges_400(self, upload_file):
+        response: Response = upload_file(csv_file([(uuid4(), "A", "1")]), background=True, dry_run=True)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Account.objects.exists()
+
+
+ODS_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content
+    xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">
+<office:body><office:spreadsheet>
+<table:table table:name="Accounts">
+<table:table-column table:number-columns-repeated="3"/>
+<table:table-header-rows><table:table-row>
+  <table:table-cell office:value-type="string"><text:p>id</text:p></table:table-cell>
+  <table:table-cell office:value-type="string"><text:p>name</text:p></table:table-cell>
+  <table:table-cell office:value-type="string"><text:p>balance</text:p></table:table-cell>
+  <table:table-cell table:number-columns-repeated="16381"/>
+</table:table-row></table:table-header-rows>
+{rows}
+<table:table-row table:number-rows-repeated="1048574"><table:table-cell table:number-columns-repeated="16384"/></table:table-row>
+</table:table>
+<table:table table:name="Notes"><table:table-row>
+  <table:table-cell office:value-type="string"><text:p>not accounts</text:p></table:table-cell>
+</table:table-row></table:table>
+</office:spreadsheet></office:body>
+</office:document-content>"""
+
+
+def ods_row(id, name, balance) -> str:
+    return (
+        "<table:table-row>"
+        f'<table:table-cell office:value-type="string"><text:p>{id}</text:p></table:table-cell>'
+        f'<table:table-cell office:value-type="string"><text:p>{name}</text:p>'
+        "<office:annotation><text:p>a comment</text:p></office:annotation></table:table-cell>"
+        f'<table:table-cell office:value-type="float" office:value="{balance}"><text:p>{balance}</text:p></table:table-cell>'
+        '<table:table-cell table:number-columns-repeated="16381"/>'
+        "</table:table-row>"
+    )
+
+
+def ods_file(rows: list[tuple]) -> SimpleUploadedFile:
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as archive:
+        archive.writestr("mimetype", ODS)
+        archive.writestr("content.xml", ODS_CONTENT.format(rows="".join(ods_row(*row) for row in rows)))
+    return SimpleUploadedFile(name="accounts.ods", content=content.getvalue(), content_type=ODS)
+
+
+def xlsx_file(rows: list[tuple], headers=("id", "name", "balance")) -> SimpleUploadedFile:
+    data = tablib.Dataset(*rows, headers=list(headers))
+    return SimpleUploadedFile(name="accounts.xlsx", content=data.export("xlsx"), content_type=XLSX)
+
+
+@pytest.mark.django_db
+class TestSpreadsheetImport:
+    def test_xlsx_import_200(self, monkeypatch, upload_file):
+        monkeypatch.setitem(UPLOADED_FILES, "batch_size", 2)
+        existing = baker.make(Account, name="Old", balance=1)
+        id = uuid4()
+        rows = [(str(existing.id), "New", 1.0), (str(id), "Ali", 10.25), (None, None, None), ("not-a-uuid", "Mona", 5)]
+
+        response: Response = upload_file(xlsx_file(rows))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data["inserted"], response.data["updated"], response.data["batches"]) == (1, 1, 2)
+        # the empty row is skipped, not numbered
+        assert response.data["errors"] == [{"row": 3, "field": "id", "error": "Must be a valid UUID."}]
+        assert Account.objects.get(pk=id).balance == Decimal("10.25")
+        assert Account.objects.get(pk=existing.id).name == "New"
+
+    def test_ods_import_200(self, upload_file):
+        ids = [uuid4(), uuid4()]
+
+        response: Response = upload_file(ods_file([(ids[0], "Ali", "10.25"), (ids[1], "Mona", "3")]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data["imported"], response.data["rejected"]) == (2, 0)
+        assert dict(Account.objects.values_list("pk", "name")) == {ids[0]: "Ali", ids[1]: "Mona"}
+        assert Account.objects.get(pk=ids[0]).balance == Decimal("10.25")
+
+    def test_missing_column_400(self, upload_file):
+        response: Response = upload_file(xlsx_file([(str(uuid4()), "Ali")], headers=("id", "name")))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Account.objects.exists()
+
+    @pytest.mark.parametrize("content_type", [XLSX, ODS])
+    def test_corrupt_file_400(self, upload_file, content_type):
+        file = SimpleUploadedFile(name="accounts", content=b"id,name,balance\n", content_type=content_type)
+        response: Response = upload_file(file)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,131 @@
+from datetime import timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.ledger import balance_at
+from accounts.models import Account, BalanceCheckpoint, LedgerEntry, Transaction
+from accounts.reconciliation import reconcile
+
+
+@pytest.mark.django_db
+class TestLedger:
+    def test_transfer_appends_running_balances(self, create_transaction):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account, balance=5)
+
+        create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": 30})
+
+        entries = {e.account_id: e for e in LedgerEntry.objects.all()}
+        assert entries[src.id].amount == -30
+        assert entries[src.id].balance == 70
+        assert entries[dest.id].amount == 30
+        assert entries[dest.id].balance == 35
+
+    def test_rejected_transfer_leaves_no_entries(self, create_transaction):
+        src = baker.make(Account, balance=10)
+        dest = baker.make(Account)
+        create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": 30})
+        assert not LedgerEntry.objects.exists()
+
+    def test_batch_transfer_appends_running_balances(self, create_batch_transfer):
+        a = baker.make(Account, balance=100)
+        b = baker.make(Account, balance=0)
+        create_batch_transfer([
+            {"src_account": str(a.id), "dest_account": str(b.id), "amount": 60},
+            {"src_account": str(b.id), "dest_account": str(a.id), "amount": 10},
+        ])
+
+        balances = list(LedgerEntry.objects.filter(account=a).order_by("id").values_list("balance", flat=True))
+        assert balances == [40, 50]
+
+    def test_checkpoint_command(self):
+        baker.make(Account, balance=7, _quantity=3)
+        call_command("checkpoint_balances", batch_size=2)
+        assert sorted(BalanceCheckpoint.objects.values_list("balance", flat=True)) == [7, 7, 7]
+
+
+@pytest.mark.django_db
+class TestBalanceAt:
+    @pytest.fixture
+    def history(self, create_transaction, backdate):
+        src = baker.make(Account, balance=100)
+        dest = baker.make(Account, balance=0)
+        now = timezone.now()
+        for days_ago, amount in [(3, 10), (2, 20), (1, 30)]:
+            create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": amount})
+            backdate(Transaction.objects.get(amount=amount), now - timedelta(days=days_ago))
+        return src, dest, now
+
+    def test_balance_after_each_transfer(self, get_balance, history):
+        src, dest, now = history
+        response: Response = get_balance(src.id, now - timedelta(days=1, hours=12))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["balance"] == 70
+        assert get_balance(dest.id, now - timedelta(days=1, hours=12)).data["balance"] == 30
+        assert get_balance(src.id, now).data["balance"] == 40
+
+    def test_balance_before_first_transfer(self, get_balance, history):
+        src, _, now = history
+        assert get_balance(src.id, now - timedelta(days=10)).data["balance"] == 100
+
+    def test_current_balance_without_at(self, get_balance, history):
+        src, *_ = history
+        assert get_balance(src.id).data["balance"] == 40
+
+    def test_imported_balance_is_checkpointed(self, get_balance, upload_file, history):
+        src, _, now = history
+        content = f"id,name,balance\n{src.id},{src.name},500.00\n".encode()
+        upload_file(SimpleUploadedFile("accounts.csv", content, content_type="text/csv"))
+
+        assert get_balance(src.id, timezone.now()).data["balance"] == 500
+        assert get_balance(src.id, now).data["balance"] == 40
+
+    def test_repaired_balance_is_checkpointed(self, history):
+        src, _, now = history
+        reconcile()
+        Account.objects.filter(pk=src.id).update(balance=7)
+
+        reconcile(repair=True)
+
+        assert balance_at(src.id, timezone.now()) == 40
+        assert BalanceCheckpoint.objects.get(account=src).balance == 40
+
+    def test_admin_balance_edit_is_checkpointed(self, admin_client, history):
+        src, _, _ = history
+        url = f"/admin/accounts/account/{src.id}/change/"
+        response = admin_client.post(url, {"id": src.id, "name": src.name, "balance": "12.00"})
+        assert response.status_code == 302
+
+        assert balance_at(src.id, timezone.now()) == 12
+        admin_client.post(url, {"id": src.id, "name": "Renamed", "balance": "12.00"})
+        assert BalanceCheckpoint.objects.filter(account=src).count() == 1
+
+    def test_newer_checkpoint_wins(self, history):
+        src, _, now = history
+        Account.objects.filter(pk=src.id).update(balance=500)  # e.g. re-imported
+        BalanceCheckpoint.objects.create(account=src, balance=500, created_at=now - timedelta(hours=12))
+        assert balance_at(src.id, now - timedelta(hours=13)) == 40
+        assert balance_at(src.id, now) == 500
+
+    def test_replay_from_checkpoint_when_entries_pruned(self, history):
+        src, _, now = history
+        BalanceCheckpoint.objects.create(account=src, balance=90, created_at=now - timedelta(days=2, hours=12))
+        LedgerEntry.objects.all().delete()
+        assert balance_at(src.id, now - timedelta(hours=1)) == Decimal(40)
+
+    def test_non_existing_account_404(self, get_balance):
+        response: Response = get_balance(uuid4(), timezone.now())
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_single_lookup_per_source(self, django_assert_max_num_queries, history):
+        src, _, now = history
+        with django_assert_max_num_queries(2):
+            balance_at(src.id, now)
@@ -0,0 +1,132 @@
+import json
+import re
+
+import pytest
+from model_bakery import baker
+
+from account_transactions.settings import METRICS
+from accounts import metrics
+from accounts.models import Account
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    return registry
+
+
+def scrape(api_client) -> dict[str, float]:
+    response = api_client.get("/metrics")
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.content.decode().splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+    def test_request_latency_and_queries(self, api_client, get_account):
+        account = baker.make(Account)
+        get_account(account.id)
+        get_account(account.id)
+
+        samples = scrape(api_client)
+
+        assert samples['http_requests_total{view="AccountDetail",method="GET",status="200"}'] == 2
+        assert samples['http_request_duration_seconds_count{view="AccountDetail"}'] == 2
+        assert samples['http_request_duration_seconds_bucket{view="AccountDetail",le="+Inf"}'] == 2
+        assert samples['http_request_duration_seconds_sum{view="AccountDetail"}'] > 0
+        # the second read is served from the cache
+        assert samples['db_queries_total{view="AccountDetail"}'] == 1
+        assert samples['db_query_duration_seconds_total{view="AccountDetail"}'] > 0
+        assert samples['http_response_size_bytes_count{view="AccountDetail"}'] == 2
+
+    def test_histogram_buckets_are_cumulative(self, api_client, get_account):
+        get_account(baker.make(Account).id)
+
+        samples = scrape(api_client)
+
+        buckets = [value for name, value in samples.items() if name.startswith('http_request_duration_seconds_bucket{view="AccountDetail"')]
+        assert buckets == sorted(buckets)
+        assert len(buckets) == len(metrics.LATENCY_BUCKETS) + 1
+
+    def test_unresolved_requests(self, api_client):
+        api_client.get("/nowhere/")
+
+        assert scrape(api_client)['http_requests_total{view="unresolved",method="GET",status="404"}'] == 1
+
+
+@pytest.mark.django_db
+class TestTransferMetrics:
+    def test_results_by_reason(self, api_client, create_transaction):
+        src = baker.make(Account, balance=10)
+        dest = baker.make(Account)
+
+        create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": 5})
+        create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": 50})
+        create_transaction({"src_account": src.id, "dest_account": src.id, "amount": 1})
+        create_transaction({"src_account": src.id, "dest_account": "7b1e4b4e-0000-4000-8000-000000000000", "amount": 1})
+        create_transaction({"src_account": src.id, "dest_account": dest.id, "amount": -1})
+
+        samples = scrape(api_client)
+        assert samples['transfers_total{result="succeeded"}'] == 1
+        assert samples['transfers_total{result="rejected",reason="insufficient_balance"}'] == 1
+        assert samples['transfers_total{result="rejected",reason="same_account"}'] == 1
+        assert samples['transfers_total{result="rejected",reason="account_not_found"}'] == 1
+        assert samples['transfers_total{result="rejected",reason="invalid"}'] == 1
+
+    def test_batch_results(self, api_client, create_batch_transfer):
+        src = baker.make(Account, balance=10)
+        dest = baker.make(Account)
+        transfers = [
+            {"src_account": str(src.id), "dest_account": str(dest.id), "amount": 5},
+            {"src_account": str(src.id), "dest_account": str(dest.id), "amount": 50},
+        ]
+
+        create_batch_transfer(transfers)
+        create_batch_transfer(transfers, mode="best_effort")
+
+        samples = scrape(api_client)
+        assert samples['transfers_total{result="succeeded"}'] == 1
+        assert samples['transfers_total{result="rejected",reason="insufficient_balance"}'] == 2
+        assert samples['transfers_total{result="rejected",reason="rolled_back"}'] == 1
+
+
+@pytest.mark.django_db
+class TestMultiProcess:
+    def test_totals_across_processes(self, monkeypatch, tmp_path, api_client, get_account):
+        monkeypatch.setitem(METRICS, "dir", str(tmp_path))
+        other = metrics.Registry()
+        other.inc("http_requests_total", (("view", "AccountDetail"), ("method", "GET"), ("status", "200")), 3)
+        other.observe("http_request_duration_seconds", (("view", "AccountDetail"),), 0.02)
+        (tmp_path / "1.json").write_text(json.dumps(other.dump()))
+
+        get_account(baker.make(Account).id)
+        samples = scrape(api_client)
+
+        assert samples['http_requests_total{view="AccountDetail",method="GET",status="200"}'] == 4
+        assert samples['http_request_duration_seconds_count{view="AccountDetail"}'] == 2
+
+    def test_flush_is_throttled(self, monkeypatch, tmp_path, registry):
+        monkeypatch.setitem(METRICS, "dir", str(tmp_path))
+        registry.inc("transfers_total", (("result", "succeeded"),))
+
+        registry.flush()
+        assert not list(tmp_path.iterdir())
+
+        registry.flush(force=True)
+        assert [p.suffix for p in tmp_path.iterdir()] == [".json"]
+
+
+class TestExposition:
+    def test_label_values_escaped(self, registry):
+        registry.inc("transfers_total", (("result", 'a "quoted"\\ \nvalue'),))
+
+        text = metrics.render(registry)
+
+        assert re.search(r'transfers_total\{result="a \\"quoted\\"\\\\ \\nvalue"\} 1', text)
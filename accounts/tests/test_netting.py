@@ -0,0 +1,135 @@
+import json
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from account_transactions.settings import ROLLUPS
+
+from accounts.models import Account, LedgerEntry, Transaction
+from accounts.transfers import INSUFFICIENT_BALANCE_ERROR, Transfer, apply_transfers, net_transfers
+
+
+A, B, C = uuid4(), uuid4(), uuid4()
+INSERTS = ('INSERT INTO "accounts_transaction"', 'INSERT INTO "accounts_ledgerentry"')
+
+
+class TestNetTransfers:
+    def test_nets_into_one_delta_per_account(self):
+        netting = net_transfers(
+            list(enumerate([Transfer(A, B, Decimal(60)), Transfer(B, C, Decimal(50)), Transfer(C, A, Decimal(10))])),
+            {A: Decimal(100), B: Decimal(0), C: Decimal(0)},
+        )
+
+        assert all(r.ok for r in netting.results)
+        assert netting.deltas == {A: Decimal(-50), B: Decimal(10), C: Decimal(40)}
+        assert netting.running == [(Decimal(40), Decimal(60)), (Decimal(10), Decimal(50)), (Decimal(40), Decimal(50))]
+        assert [t.amount for t in netting.transactions] == [60, 50, 10]
+
+    def test_checks_in_order(self):
+        # the total is feasible, but B can't pay before it is paid
+        netting = net_transfers(
+            list(enumerate([Transfer(B, C, Decimal(50)), Transfer(A, B, Decimal(60))])),
+            {A: Decimal(100), B: Decimal(0), C: Decimal(0)},
+        )
+
+        assert netting.results[0].errors == {"non_field_errors": [INSUFFICIENT_BALANCE_ERROR]}
+        assert netting.deltas == {A: Decimal(-60), B: Decimal(60)}
+
+    def test_unknown_accounts_and_cancelling_transfers(self):
+        netting = net_transfers(
+            list(enumerate([Transfer(A, uuid4(), Decimal(1)), Transfer(A, B, Decimal(5)), Transfer(B, A, Decimal(5))])),
+            {A: Decimal(10), B: Decimal(0)},
+        )
+
+        assert "dest_account" in netting.results[0].errors
+        assert len(netting.transactions) == 2
+        assert netting.deltas == {}
+
+
+@pytest.mark.django_db
+class TestApplyTransfers:
+    def test_writes_grow_with_accounts_not_transfers(self, monkeypatch):
+        # every run adds to the same rollup rows
+        monkeypatch.setitem(ROLLUPS, "slots", 1)
+        accounts = baker.make(Account, balance=1000, _quantity=4)
+
+        def run(n):
+            transfers = [(i, Transfer(accounts[i % 2].id, accounts[2 + i % 2].id, Decimal(1))) for i in range(n)]
+            with CaptureQueriesContext(connection) as ctx:
+                assert all(r.ok for r in apply_transfers(transfers))
+            # the transaction and ledger inserts are split by the database's parameter limit
+            return [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith(INSERTS)]
+
+        run(4)  # creates the day's rollup rows
+        few, many = run(8), run(400)
+        assert len(few) == len(many)
+        assert len([sql for sql in many if sql.startswith('UPDATE "accounts_account"')]) == 1
+        assert Transaction.objects.count() == 412
+        assert LedgerEntry.objects.count() == 824
+
+
+@pytest.mark.django_db
+class TestApplyTransfersCommand:
+    @pytest.fixture
+    def accounts(self):
+        a = baker.make(Account, balance=100)
+        b, c = baker.make(Account, balance=0, _quantity=2)
+        return a, b, c
+
+    def write(self, tmp_path, name, content):
+        path = tmp_path / name
+        path.write_text(content)
+        return str(path)
+
+    def test_csv(self, tmp_path, accounts, capsys):
+        a, b, c = accounts
+        path = self.write(tmp_path, "payroll.csv", f"src_account,dest_account,amount\n{a.id},{b.id},60\n{b.id},{c.id},50.5\n")
+
+        call_command("apply_transfers", path)
+
+        assert "2 transfers applied, 0 skipped." in capsys.readouterr().out
+        assert dict(Account.objects.values_list("pk", "balance")) == {a.id: 40, b.id: Decimal("9.5"), c.id: Decimal("50.5")}
+
+    def test_atomic_applies_nothing_on_error(self, tmp_path, accounts, capsys):
+        a, b, _ = accounts
+        items = [{"src_account": str(a.id), "dest_account": str(b.id), "amount": 60}] * 2
+        path = self.write(tmp_path, "payouts.json", json.dumps(items))
+
+        with pytest.raises(CommandError, match="1 invalid transfers, none applied"):
+            call_command("apply_transfers", path)
+
+        assert "1: " in capsys.readouterr().out
+        assert not Transaction.objects.exists()
+
+    def test_best_effort(self, tmp_path, accounts):
+        a, b, _ = accounts
+        lines = [json.dumps({"src_account": str(a.id), "dest_account": str(b.id), "amount": amount}) for amount in (60, 60, 0, 40)]
+        path = self.write(tmp_path, "payouts.ndjson", "\n".join(lines))
+
+        call_command("apply_transfers", path, best_effort=True)
+
+        assert Transaction.objects.count() == 2
+        assert Account.objects.get(pk=b.id).balance == 100
+
+    def test_dry_run(self, tmp_path, accounts, capsys):
+        a, b, c = accounts
+        path = self.write(tmp_path, "payroll.csv", f"src_account,dest_account,amount\n{a.id},{b.id},60\n{a.id},{c.id},10\n")
+
+        call_command("apply_transfers", path, dry_run=True)
+
+        out = capsys.readouterr().out
+        assert f"{a.id}: -70.00" in out and f"{c.id}: +10.00" in out
+        assert "2 transfers would change 3 accounts" in out
+        assert not Transaction.objects.exists()
+        assert Account.objects.get(pk=a.id).balance == 100
+
+    def test_bad_files(self, tmp_path):
+        with pytest.raises(CommandError, match="Unsupported file type"):
+            call_command("apply_transfers", self.write(tmp_path, "t.xml", ""))
+        with pytest.raises(CommandError, match="CSV header"):
+            call_command("apply_transfers", self.write(tmp_path, "t.csv", "from,to,amount\n"))
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.models import Transaction
+from accounts.pagination import KeysetPagination
+
+
+@pytest.fixture
+def transactions():
+    # pairs of transactions share a timestamp so ordering must fall back to the id
+    now = timezone.now()
+    objs = baker.prepare(Transaction, amount=1, _quantity=23, _save_related=True)
+    for obj in objs:
+        obj.src_account.save()
+        obj.dest_account.save()
+    Transaction.objects.bulk_create(objs)
+    for i, obj in enumerate(objs):
+        Transaction.objects.filter(pk=obj.pk).update(created_at=now - timedelta(seconds=i // 2))
+    return sorted(Transaction.objects.all(), key=lambda t: (t.created_at, t.id), reverse=True)
+
+
+@pytest.mark.django_db
+class TestTransactionPagination:
+    def test_walk_forward_and_back(self, api_client, list_transactions, transactions):
+        response: Response = list_transactions(page_size=4)
+        pages = []
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            pages.append(response)
+            if not response.data["next"]:
+                break
+            response = api_client.get(response.data["next"])
+
+        ids = [t["id"] for page in pages for t in page.data["results"]]
+        assert ids == [str(t.id) for t in transactions]
+        assert pages[0].data["count"] == len(transactions)
+        assert pages[0].data["previous"] is None
+
+        response = api_client.get(pages[-1].data["previous"])
+        assert response.data["results"] == pages[-2].data["results"]
+
+    def test_page_cost_independent_of_depth(self, api_client, list_transactions, transactions):
+        response: Response = list_transactions(page_size=2, count="false")
+        assert "count" not in response.data
+
+        with CaptureQueriesContext(connection) as first:
+            api_client.get(response.data["next"])
+        response = list_transactions(page_size=20, count="false")
+        with CaptureQueriesContext(connection) as deep:
+            api_client.get(response.data["next"])
+
+        assert len(first.captured_queries) == len(deep.captured_queries) == 1
+        assert "OFFSET" not in deep.captured_queries[0]["sql"].upper()
+
+    def test_page_size_capped(self, monkeypatch, list_transactions, transactions):
+        monkeypatch.setattr(KeysetPagination, "max_page_size", 10)
+        response: Response = list_transactions(page_size=1000)
+        assert len(response.data["results"]) == 10
+
+    def test_invalid_cursor_404(self, list_transactions):
+        response: Response = list_transactions(cursor="garbage")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
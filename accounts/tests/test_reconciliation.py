@@ -0,0 +1,165 @@
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.response import Response
+
+from account_transactions.settings import RECONCILIATION
+from accounts.models import Account, ReconciledBalance
+from accounts.reconciliation import Drift, _repair, reconcile
+
+
+@pytest.mark.django_db
+class TestReconcile:
+    @pytest.fixture(autouse=True)
+    def settled(self, monkeypatch):
+        # transfers made in a test count as settled at once
+        monkeypatch.setitem(RECONCILIATION, "settle_seconds", 0)
+
+    @pytest.fixture
+    def accounts(self):
+        return baker.make(Account, balance=100, _quantity=3)
+
+    def test_first_run_baselines_accounts(self, accounts):
+        report = reconcile()
+        assert report.run.accounts_baselined == 3
+        assert report.run.drifted == 0
+        assert ReconciledBalance.objects.count() == 3
+
+    def test_only_new_transactions_are_processed(self, make_transfer, accounts):
+        a, b, c = accounts
+        make_transfer(a, b, 10)
+        reconcile()
+
+        make_transfer(b, c, Decimal("20.50"))
+        make_transfer(c, a, 5)
+        report = reconcile()
+
+        assert report.run.transactions == 2
+        assert report.run.accounts_updated == 3
+        assert report.run.drifted == 0
+        assert reconcile().run.transactions == 0
+
+    def test_drift_reported_and_repaired(self, make_transfer, accounts):
+        a, b, _ = accounts
+        reconcile()
+        make_transfer(a, b, 10)
+        Account.objects.filter(pk=b.id).update(balance=999)
+
+        report = reconcile()
+        assert report.run.drifted == 1
+        assert report.drifts[0].account_id == b.id
+        assert report.drifts[0].expected == 110
+        assert Account.objects.get(pk=b.id).balance == 999
+
+        report = reconcile(repair=True)
+        assert report.run.repaired == 1
+        assert Account.objects.get(pk=b.id).balance == 110
+        assert reconcile().run.drifted == 0
+
+    def test_recent_transactions_left_to_next_run(self, make_transfer, monkeypatch, accounts):
+        a, b, _ = accounts
+        reconcile()
+        make_transfer(a, b, 10)
+
+        monkeypatch.setitem(RECONCILIATION, "settle_seconds", 60)
+        assert reconcile().run.transactions == 0
+        monkeypatch.setitem(RECONCILIATION, "settle_seconds", 0)
+        assert reconcile().run.transactions == 1
+
+    def test_accounts_moved_after_watermark_are_left_to_next_run(self, make_transfer, monkeypatch, accounts):
+        a, b, c = accounts
+        reconcile()
+        make_transfer(a, b, 10)
+        Account.objects.filter(pk=c.id).update(balance=1)
+
+        monkeypatch.setitem(RECONCILIATION, "settle_seconds", 60)
+        report = reconcile(repair=True)
+
+        # the transfer isn't covered yet, so a and b aren't checked
+        assert [d.account_id for d in report.drifts] == [c.id]
+        assert report.run.repaired == 1
+        assert Account.objects.get(pk=a.id).balance == 90
+
+    def test_new_account_baselined_before_its_transfers_settle(self, make_transfer, monkeypatch, accounts):
+        a, b, _ = accounts
+        make_transfer(a, b, 1)
+        reconcile()
+        new = baker.make(Account, balance=50)
+        make_transfer(a, new, 10)
+        make_transfer(new, b, 5)
+
+        monkeypatch.setitem(RECONCILIATION, "settle_seconds", 60)
+        report = reconcile(repair=True)
+        assert (report.run.accounts_baselined, report.run.drifted, report.run.repaired) == (1, 0, 0)
+
+        monkeypatch.setitem(RECONCILIATION, "settle_seconds", 0)
+        report = reconcile(repair=True)
+        assert (report.run.transactions, report.run.drifted, report.run.repaired) == (2, 0, 0)
+        assert ReconciledBalance.objects.get(account=new).balance == 55
+        assert Account.objects.get(pk=new.id).balance == 55
+
+    def test_repair_rechecks_under_lock(self, make_transfer, accounts):
+        a, b, _ = accounts
+        reconcile()
+        drift = Drift(a.id, Decimal(100), Decimal(100))
+
+        # a transfer committed between finding the drift and repairing it
+        make_transfer(a, b, 10)
+
+        assert _repair([drift], watermark=None) == []
+        assert Account.objects.get(pk=a.id).balance == 90
+
+    def test_imported_balance_is_new_baseline(self, upload_file, accounts):
+        a, *_ = accounts
+        reconcile()
+        file = SimpleUploadedFile(
+            name="accounts.csv",
+            content=f"id,name,balance\n{a.id},{a.name},42\n".encode(),
+            content_type="text/csv",
+        )
+        upload_file(file)
+
+        report = reconcile()
+        assert report.run.drifted == 0
+        assert report.run.accounts_baselined == 1
+
+    def test_query_count_independent_of_transactions(self, make_transfer, accounts):
+        a, b, _ = accounts
+        reconcile()
+
+        def count_queries(transfers: int) -> int:
+            for _ in range(transfers):
+                make_transfer(a, b, 1)
+            with CaptureQueriesContext(connection) as ctx:
+                reconcile()
+            return len(ctx.captured_queries)
+
+        assert count_queries(2) == count_queries(20)
+
+
+@pytest.mark.django_db
+class TestReconcileInterfaces:
+    def test_api_200(self, api_client):
+        baker.make(Account, balance=5)
+        response: Response = api_client.post("/accounts/reconcile/", {"repair": True}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["accounts_baselined"] == 1
+        assert response.data["drifts"] == []
+
+    def test_command_reports_drift(self):
+        account = baker.make(Account, balance=5)
+        call_command("reconcile", stdout=StringIO())
+        Account.objects.filter(pk=account.id).update(balance=6)
+
+        out = StringIO()
+        call_command("reconcile", stdout=out)
+
+        assert f"{account.id}: balance 6.00, expected 5.00" in out.getvalue()
+        assert "1 drifted accounts." in out.getvalue()
@@ -0,0 +1,155 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+
+from account_transactions.settings import ROLLUPS
+from accounts.models import Account, AccountDailyVolume, DailyVolume, Transaction
+from accounts.rollups import account_daily_volume, daily_volume, rebuild_rollups
+
+
+def _rollups():
+    """Both rollups with their slots summed."""
+    return (
+        [(row["day"], row["transfers"], row["amount"]) for row in daily_volume()],
+        sorted(
+            AccountDailyVolume.objects
+            .values_list("account_id", "day")
+            .annotate(Sum("transfers_in"), Sum("transfers_out"), Sum("inflow"), Sum("outflow"))
+        ),
+    )
+
+
+@pytest.mark.django_db
+class TestIncrementalRollups:
+    def test_transfer_updates_rollups(self, transfer, create_transaction):
+        a, b = baker.make(Account, balance=100, _quantity=2)
+        create_transaction(transfer(a, b, "10.50"))
+        create_transaction(transfer(b, a, "1.25"))
+
+        today = timezone.localdate()
+        assert _rollups()[0] == [(today, 2, Decimal("11.75"))]
+        assert account_daily_volume(a.id) == [
+            {"day": today, "transfers_in": 1, "transfers_out": 1, "inflow": Decimal("1.25"), "outflow": Decimal("10.50")}
+        ]
+        assert account_daily_volume(b.id)[0]["inflow"] == Decimal("10.50")
+
+    def test_transfers_spread_over_slots(self, transfer, create_transaction, monkeypatch):
+        monkeypatch.setitem(ROLLUPS, "slots", 4)
+        a, b = baker.make(Account, balance=100, _quantity=2)
+        for _ in range(20):
+            create_transaction(transfer(a, b, 1))
+
+        # each transfer locked one of the day's rows, not the day
+        assert 1 < DailyVolume.objects.count() <= 4
+        assert 1 < AccountDailyVolume.objects.filter(account=b).count() <= 4
+        assert daily_volume()[0]["transfers"] == 20
+        assert account_daily_volume(b.id)[0]["inflow"] == 20
+
+    def test_batch_updates_rollups(self, transfer, create_batch_transfer):
+        a, b, c = baker.make(Account, balance=100, _quantity=3)
+        response = create_batch_transfer([transfer(a, b, 1), transfer(a, c, 2), transfer(b, c, 3)])
+        assert response.status_code == status.HTTP_201_CREATED
+
+        assert daily_volume()[0]["amount"] == Decimal(6)
+        outflow = {pk: account_daily_volume(pk)[0]["outflow"] for pk in (a.id, b.id, c.id)}
+        assert outflow == {a.id: Decimal(3), b.id: Decimal(3), c.id: Decimal(0)}
+
+    def test_rejected_batch_leaves_rollups_untouched(self, transfer, create_batch_transfer):
+        a, b = baker.make(Account, balance=1, _quantity=2)
+        response = create_batch_transfer([transfer(a, b, 1), transfer(a, b, 1)])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not DailyVolume.objects.exists()
+        assert not AccountDailyVolume.objects.exists()
+
+    def test_rebuild_from_transactions(self, transfer, create_transaction, create_batch_transfer):
+        accounts = baker.make(Account, balance=1000, _quantity=4)
+        for i in range(6):
+            create_transaction(transfer(accounts[i % 4], accounts[(i + 1) % 4], f"{i + 1}.10"))
+        create_batch_transfer([transfer(accounts[i % 4], accounts[(i + 2) % 4], 2) for i in range(8)])
+        # spread them over several days
+        for i, pk in enumerate(Transaction.objects.order_by("created_at").values_list("pk", flat=True)):
+            Transaction.objects.filter(pk=pk).update(created_at=timezone.now() - timedelta(days=i % 3))
+
+        # backdating bypassed the rollups, so the rebuild corrects them
+        assert rebuild_rollups(batch_size=4) == 14
+        rebuilt = _rollups()
+        assert len(rebuilt[0]) == 3
+        assert sum(transfers for _, transfers, _ in rebuilt[0]) == 14
+
+        DailyVolume.objects.all().delete()
+        AccountDailyVolume.objects.all().delete()
+        call_command("rebuild_rollups", batch_size=5)
+        assert _rollups() == rebuilt
+
+
+@pytest.mark.django_db
+class TestStats:
+    @pytest.fixture
+    def history(self, transfer, create_transaction):
+        a, b, c = baker.make(Account, balance=1000, _quantity=3)
+        create_transaction(transfer(a, b, 100))
+        create_transaction(transfer(a, c, 10))
+        create_transaction(transfer(c, a, 1))
+        yesterday = timezone.localdate() - timedelta(days=1)
+        DailyVolume.objects.create(day=yesterday, transfers=4, amount=40)
+        AccountDailyVolume.objects.create(account=c, day=yesterday, transfers_in=4, inflow=40)
+        return a, b, c
+
+    def test_reads_only_rollups(self, get_stats, history):
+        a, _, _ = history
+        with CaptureQueriesContext(connection) as ctx:
+            response = get_stats(account=str(a.id))
+        assert response.status_code == status.HTTP_200_OK
+        assert not [q for q in ctx.captured_queries if "accounts_transaction" in q["sql"]]
+
+    def test_days_and_top_accounts(self, get_stats, history):
+        a, b, c = history
+        today = timezone.localdate()
+        response = get_stats()
+        assert response.status_code == status.HTTP_200_OK
+
+        assert [(d["day"], d["transfers"], d["amount"]) for d in response.data["days"]] == [
+            (today - timedelta(days=1), 4, Decimal(40)),
+            (today, 3, Decimal(111)),
+        ]
+        top = response.data["top_accounts"]
+        assert [row["account"] for row in top] == [a.id, b.id, c.id]
+        assert (top[0]["inflow"], top[0]["outflow"]) == (Decimal(1), Decimal(110))
+        assert (top[2]["transfers_in"], top[2]["inflow"]) == (5, Decimal(50))
+        assert "account" not in response.data
+
+    def test_range_and_top(self, get_stats, history):
+        a, b, c = history
+        today = timezone.localdate()
+        response = get_stats(since=today.isoformat(), top=1)
+        assert [d["day"] for d in response.data["days"]] == [today]
+        assert [row["account"] for row in response.data["top_accounts"]] == [a.id]
+
+        response = get_stats(until=today.isoformat())
+        assert [d["day"] for d in response.data["days"]] == [today - timedelta(days=1)]
+        assert [row["account"] for row in response.data["top_accounts"]] == [c.id]
+
+    def test_account_days(self, get_stats, history):
+        _, _, c = history
+        response = get_stats(account=str(c.id))
+        assert [(d["transfers_in"], d["transfers_out"], d["inflow"], d["outflow"]) for d in response.data["account"]["days"]] == [
+            (4, 0, Decimal(40), Decimal(0)),
+            (1, 1, Decimal(10), Decimal(1)),
+        ]
+
+    def test_unknown_account(self, get_stats):
+        response = get_stats(account="00000000-0000-0000-0000-000000000000")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_invalid_query(self, get_stats):
+        response = get_stats(since="yesterday", top=1000)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data) == {"since", "top"}
@@ -0,0 +1,45 @@
+import pytest
+from django.db.utils import ConnectionHandler
+from django.test.utils import CaptureQueriesContext
+
+from account_transactions.settings import SQLITE_PROFILES
+
+
+@pytest.fixture
+def production_connection(tmp_path, django_db_blocker):
+    # a file database of its own, outside the test database
+    connections = ConnectionHandler({
+        "default": {"NAME": str(tmp_path / "db.sqlite3"), **SQLITE_PROFILES["production"]},
+    })
+    connection = connections["default"]
+    with django_db_blocker.unblock():
+        yield connection
+        connection.close()
+
+
+class TestProductionProfile:
+    def test_pragmas_applied_on_connect(self, production_connection):
+        with production_connection.cursor() as cursor:
+            values = {}
+            for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "temp_store"):
+                cursor.execute(f"PRAGMA {name}")
+                values[name] = cursor.fetchone()[0]
+
+        assert values == {
+            "journal_mode": "wal",
+            "synchronous": 1,
+            "busy_timeout": 20_000,
+            "cache_size": -64_000,
+            "temp_store": 2,
+        }
+
+    def test_transactions_begin_immediate(self, production_connection):
+        production_connection.ensure_connection()
+
+        with CaptureQueriesContext(production_connection) as queries:
+            # what transaction.atomic() does on entering the outermost block
+            production_connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+            production_connection.rollback()
+            production_connection.set_autocommit(True)
+
+        assert queries[0]["sql"] == "BEGIN IMMEDIATE"
@@ -0,0 +1,195 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Round
+
+from account_transactions.settings import TRANSFERS
+
+from .buckets import credit_buckets, debit_buckets, locked_bucket_totals
+from .cache import invalidate_accounts
+from .ledger import entries_for, record_transfer
+from .models import DECIMAL_PLACES, Account, LedgerEntry, Transaction
+from .rollups import add_transfers
+
+
+SAME_ACCOUNT_ERROR = "Transfer must be done between two different accounts."
+INSUFFICIENT_BALANCE_ERROR = "Source account doesn't have enough balance to transfer the specified amount."
+ACCOUNT_NOT_FOUND_ERROR = 'Invalid pk "{pk}" - object does not exist.'
+
+
+class TransferError(Exception):
+    pass
+
+
+@dataclass
+class Transfer:
+    src_account: UUID
+    dest_account: UUID
+    amount: Decimal
+
+
+@dataclass
+class TransferResult:
+    index: int
+    transaction: Transaction | None = None
+    errors: dict | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.errors is None
+
+
+def move_balance(src_account: UUID, dest_account: UUID, amount: Decimal) -> None:
+    """
+    Move `amount` between two accounts without a read-modify-write in Python.
+
+    The debit is a single conditional `UPDATE ... WHERE balance >= amount`, so
+    concurrent transfers can neither lose updates nor overdraw the source account.
+    Results are rounded to the field's decimal places because SQLite does the
+    arithmetic in floating point. Bucketed accounts are debited and credited through
+    one of their buckets instead of the account row. Must be called inside the atomic
+    block that also records the transaction.
+    """
+    if src_account == dest_account:
+        raise TransferError(SAME_ACCOUNT_ERROR)
+
+    debited = (
+        Account.objects
+        .filter(pk=src_account, buckets=0, balance__gte=amount)
+        .update(balance=Round(F("balance") - amount, DECIMAL_PLACES))
+    )
+    if not debited and not debit_buckets(src_account, amount):
+        raise TransferError(INSUFFICIENT_BALANCE_ERROR)
+
+    credited = (
+        Account.objects
+        .filter(pk=dest_account, buckets=0)
+        .update(balance=Round(F("balance") + amount, DECIMAL_PLACES))
+    )
+    if not credited and not credit_buckets(dest_account, amount):
+        raise TransferError(ACCOUNT_NOT_FOUND_ERROR.format(pk=dest_account))
+
+
+def execute_transfer(obj: Transaction) -> Transaction:
+    """Move the balance of an unsaved transfer, save it and append its ledger entries, atomically."""
+    with transaction.atomic():
+        move_balance(obj.src_account_id, obj.dest_account_id, obj.amount)
+        obj.save()
+        record_transfer(obj)
+        add_transfers([obj])
+        invalidate_accounts([obj.src_account_id, obj.dest_account_id])
+    return obj
+
+
+@dataclass
+class Netting:
+    opening: dict[UUID, Decimal]
+    closing: dict[UUID, Decimal]
+    results: list[TransferResult]
+    # source and destination balances after each accepted transfer, for the ledger
+    running: list[tuple[Decimal, Decimal]]
+
+    @property
+    def transactions(self) -> list[Transaction]:
+        return [r.transaction for r in self.results if r.ok]
+
+    @property
+    def deltas(self) -> dict[UUID, Decimal]:
+        """The net balance change of every account the accepted transfers changed."""
+        return {pk: self.closing[pk] - balance for pk, balance in self.opening.items() if self.closing[pk] != balance}
+
+
+def net_transfers(transfers: list[tuple[int, Transfer]], balances: dict[UUID, Decimal]) -> Netting:
+    """
+    Check `(index, transfer)` pairs in order and net the valid ones into one delta per account.
+
+    Every transfer is checked against the running balances left by the ones before it,
+    so no intermediate balance goes negative. Accounts missing from `balances` don't
+    exist. Nothing is written; the accepted transfers come back as unsaved transactions.
+    """
+    closing = dict(balances)
+    results: list[TransferResult] = []
+    running: list[tuple[Decimal, Decimal]] = []
+
+    for index, t in transfers:
+        errors = _check_transfer(t, closing)
+        if errors:
+            results.append(TransferResult(index, errors=errors))
+            continue
+
+        closing[t.src_account] -= t.amount
+        closing[t.dest_account] += t.amount
+        obj = Transaction(src_account_id=t.src_account, dest_account_id=t.dest_account, amount=t.amount)
+        running.append((closing[t.src_account], closing[t.dest_account]))
+        results.append(TransferResult(index, transaction=obj))
+
+    return Netting(balances, closing, results, running)
+
+
+def apply_transfers(transfers: list[tuple[int, Transfer]], atomic: bool = True) -> list[TransferResult]:
+    """
+    Apply `(index, transfer)` pairs in order inside one database transaction.
+
+    Involved accounts (and the buckets of bucketed ones) are locked up front and the
+    transfers are netted with `net_transfers`, so the writes grow with the number of
+    distinct accounts rather than transfers: one `bulk_update` (an `UPDATE ... CASE`
+    per batch) for the changed balances plus bulk inserts of the transactions and
+    their ledger entries. Bucketed accounts take their net change through one of their
+    buckets. In atomic mode nothing is written unless all transfers are valid;
+    otherwise invalid ones are skipped.
+    """
+    account_ids = {t.src_account for _, t in transfers} | {t.dest_account for _, t in transfers}
+
+    with transaction.atomic():
+        accounts = Account.objects.select_for_update().in_bulk(account_ids)
+        bucket_totals = locked_bucket_totals(pk for pk, acc in accounts.items() if acc.buckets)
+        netting = net_transfers(transfers, {pk: acc.balance + bucket_totals.get(pk, 0) for pk, acc in accounts.items()})
+        to_create = netting.transactions
+
+        if atomic and len(to_create) != len(transfers):
+            return netting.results
+
+        changed = []
+        for pk in netting.deltas:
+            if not accounts[pk].buckets:
+                accounts[pk].balance = netting.closing[pk]
+                changed.append(accounts[pk])
+
+        batch_size = TRANSFERS["batch_write_size"]
+        Transaction.objects.bulk_create(to_create, batch_size=batch_size)
+        Account.objects.bulk_update(changed, ["balance"], batch_size=batch_size)
+        # bucketed accounts take their net change through their buckets, as in single transfers
+        for pk, delta in netting.deltas.items():
+            if not accounts[pk].buckets:
+                continue
+            if delta > 0:
+                credit_buckets(pk, delta)
+            elif not debit_buckets(pk, -delta):
+                raise TransferError(INSUFFICIENT_BALANCE_ERROR)
+        invalidate_accounts(netting.deltas)
+        LedgerEntry.objects.bulk_create(
+            (entry for obj, (src, dest) in zip(to_create, netting.running) for entry in entries_for(obj, src, dest)),
+            batch_size=batch_size,
+        )
+        add_transfers(to_create)
+
+    return netting.results
+
+
+def _check_transfer(t: Transfer, balances: dict[UUID, Decimal]) -> dict | None:
+    errors = {}
+    for field in ("src_account", "dest_account"):
+        pk = getattr(t, field)
+        if pk not in balances:
+            errors[field] = [ACCOUNT_NOT_FOUND_ERROR.format(pk=pk)]
+    if errors:
+        return errors
+
+    if t.src_account == t.dest_account:
+        return {"non_field_errors": [SAME_ACCOUNT_ERROR]}
+    if balances[t.src_account] < t.amount:
+        return {"non_field_errors": [INSUFFICIENT_BALANCE_ERROR]}
+    return None
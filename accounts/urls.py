@@ -4,6 +4,14 @@ from . import views
 urlpatterns = [
     path(route="", view=views.AccountList.as_view()),
     path(route="<uuid:pk>/", view=views.AccountDetail.as_view()),
+    path(route="<uuid:pk>/balance/", view=views.AccountBalance.as_view()),
+    path(route="<uuid:pk>/transactions/", view=views.AccountTransactionList.as_view()),
+    path(route="export/", view=views.AccountExport.as_view()),
     path(route="import/", view=views.UploadViewSet.as_view()),
+    path(route="import/<uuid:pk>/", view=views.ImportJobDetail.as_view()),
+    path(route="reconcile/", view=views.ReconcileView.as_view()),
+    path(route="stats/", view=views.StatsView.as_view()),
     path(route="transfer/", view=views.TransferList.as_view()),
+    path(route="transfer/export/", view=views.TransferExport.as_view()),
+    path(route="transfer/batch/", view=views.BatchTransferView.as_view()),
 ]
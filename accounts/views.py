@@ -1,31 +1,246 @@
-import csv
-import io
-
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils.http import parse_etags
 from rest_framework import status
-from rest_framework.generics import ListCreateAPIView, RetrieveAPIView, UpdateAPIView
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import CreateAPIView, ListAPIView, ListCreateAPIView, RetrieveAPIView, UpdateAPIView
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from account_transactions.settings import UPLOADED_FILES
+from account_transactions.settings import ACCOUNTS, TRANSFERS
 
-from .models import Account, Transaction
-from .serializers import AccountSerializer, TransactionSerializer, UploadSerializer
+from . import group_commit, metrics
+from .cache import get_account, set_account
+from .exports import CSVRenderer, NDJSONRenderer, stream_export
+from .fast_serializers import FastListMixin, FastSerializer
+from .idempotency import idempotent
+from .imports import ACCOUNT_KEYS, MERGE, ImportFileError, import_accounts, read_accounts
+from .jobs import create_import_job, submit_import_job
+from .ledger import balance_at
+from .models import Account, ArchivedTransaction, ImportJob, Transaction, total_balance_expression
+from .pagination import KeysetChain, KeysetPagination
+from .reconciliation import reconcile
+from .rollups import account_daily_volume, daily_volume, top_accounts
+from .serializers import (
+    AccountBalanceQuerySerializer,
+    AccountSerializer,
+    AccountTransactionFilterSerializer,
+    ArchiveQuerySerializer,
+    BatchTransferSerializer,
+    ImportJobSerializer,
+    ReconcileSerializer,
+    StatsQuerySerializer,
+    TransactionSerializer,
+    TransactionTimeRangeSerializer,
+    TransferItemSerializer,
+    UploadSerializer,
+)
+from .transfers import Transfer
 
 
-class AccountList(ListCreateAPIView):
-    queryset = Account.objects.all()
+class AccountList(FastListMixin, ListCreateAPIView):
+    queryset = Account.objects.with_total_balance()
     serializer_class = AccountSerializer
+    fast_serializer = FastSerializer(AccountSerializer, sources={"balance": "total_balance"})
+
+    def create(self, request: Request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=ACCOUNTS["batch_max_size"]
+        )
+        if not serializer.is_valid():
+            if not isinstance(serializer.errors, list):
+                raise ValidationError(serializer.errors)
+            # nothing is created unless every account is valid
+            errors = [{"index": index, "errors": item} for index, item in enumerate(serializer.errors) if item]
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 class AccountDetail(RetrieveAPIView):
-    queryset = Account.objects.all()
+    queryset = Account.objects.with_total_balance()
     serializer_class = AccountSerializer
 
+    def retrieve(self, request: Request, *args, **kwargs):
+        pk = kwargs["pk"]
+        generation, data = get_account(pk)
+        etag = f'"{generation}"'
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            set_account(pk, generation, data)
+        return Response(data, headers={"ETag": etag})
+
+
+class ExportView(APIView):
+    """Streams rows in the format picked by `?format=` or the Accept header (CSV by default)."""
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def handle_exception(self, exc):
+        # errors are reported as JSON whatever export format was requested
+        self.request.accepted_renderer = JSONRenderer()
+        self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
+
+class AccountExport(ExportView):
+    def get(self, request: Request):
+        return stream_export(
+            Account.objects.order_by("pk"),
+            ACCOUNT_KEYS,
+            request.accepted_renderer,
+            "accounts",
+            expressions={"balance": total_balance_expression()},
+        )
+
+
+class TransferExport(ExportView):
+    def get(self, request: Request):
+        filters = TransactionTimeRangeSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        queryset = filters.filter_time_range(Transaction.objects.order_by("created_at", "id"))
+        return stream_export(queryset, TransactionSerializer.Meta.fields, request.accepted_renderer, "transactions")
+
 
-class TransferList(ListCreateAPIView):
+class AccountBalance(APIView):
+    def get(self, request: Request, pk):
+        query = AccountBalanceQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        at = query.validated_data.get("at") # type: ignore
+
+        try:
+            if at is None:
+                balance = Account.objects.values_list(total_balance_expression(), flat=True).get(pk=pk)
+            else:
+                balance = balance_at(pk, at)
+        except Account.DoesNotExist:
+            raise NotFound()
+
+        return Response({"id": str(pk), "balance": balance, "at": at})
+
+
+class AccountTransactionList(FastListMixin, ListAPIView):
+    serializer_class = TransactionSerializer
+    pagination_class = KeysetPagination
+    fast_serializer = FastSerializer(TransactionSerializer)
+
+    def get_queryset(self):
+        account_id = self.kwargs["pk"]
+        if not Account.objects.filter(pk=account_id).exists():
+            raise NotFound()
+
+        filters = AccountTransactionFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        queryset = filters.filter(Transaction.objects.all(), account_id)
+        if filters.validated_data["include_archived"]: # type: ignore
+            return KeysetChain(filters.filter(ArchivedTransaction.objects.all(), account_id), queryset)
+        return queryset
+
+
+class TransferList(FastListMixin, ListCreateAPIView):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    pagination_class = KeysetPagination
+    fast_serializer = FastSerializer(TransactionSerializer)
+
+    def get_queryset(self):
+        query = ArchiveQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        if query.validated_data["include_archived"]: # type: ignore
+            # archived transactions are all older than the hot ones
+            return KeysetChain(ArchivedTransaction.objects.all(), Transaction.objects.all())
+        return super().get_queryset()
+
+    @idempotent
+    def create(self, request: Request, *args, **kwargs):
+        try:
+            if self.use_group_commit(request):
+                response = self.create_group_committed(request)
+            else:
+                response = super().create(request, *args, **kwargs)
+        except ValidationError as e:
+            metrics.record_transfer_result(e.detail)
+            raise
+        metrics.record_transfer_result()
+        return response
+
+    def use_group_commit(self, request: Request) -> bool:
+        return (
+            TRANSFERS["group_commit"]
+            # the transfer must commit with the request's own transaction, e.g. its idempotency key
+            and not transaction.get_connection().in_atomic_block
+            # the writer assigns ids itself
+            and "id" not in request.data
+        )
+
+    def create_group_committed(self, request: Request) -> Response:
+        item = TransferItemSerializer(data=request.data)
+        item.is_valid(raise_exception=True)
+        result = group_commit.submit(Transfer(**item.validated_data)) # type: ignore
+        if not result.ok:
+            raise ValidationError(result.errors)
+        return Response(TransactionSerializer(result.transaction).data, status=status.HTTP_201_CREATED)
+
+
+class BatchTransferView(CreateAPIView):
+    serializer_class = BatchTransferSerializer
+
+    @idempotent
+    def create(self, request: Request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        data = serializer.data
+        for item in data["results"]:
+            metrics.record_transfer_result(item.get("errors"), rolled_back=item["status"] == "rolled_back")
+
+        if data["succeeded"] == 0:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class StatsView(APIView):
+    """Transfer volume, read from the rollup tables only."""
+
+    def get(self, request: Request):
+        query = StatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+        since, until = data.get("since"), data.get("until") # type: ignore
+
+        stats = {
+            "since": since,
+            "until": until,
+            "days": daily_volume(since, until),
+            "top_accounts": top_accounts(data["top"], since, until), # type: ignore
+        }
+        if "account" in data: # type: ignore
+            account_id = data["account"] # type: ignore
+            if not Account.objects.filter(pk=account_id).exists():
+                raise NotFound()
+            stats["account"] = {"id": account_id, "days": account_daily_volume(account_id, since, until)}
+        return Response(stats)
+
+
+class ReconcileView(APIView):
+    def post(self, request: Request):
+        serializer = ReconcileSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report = reconcile(repair=serializer.validated_data["repair"]) # type: ignore
+        return Response(ReconcileSerializer(report).data, status=status.HTTP_200_OK)
+
+
+class ImportJobDetail(RetrieveAPIView):
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
 
 
 class UploadViewSet(UpdateAPIView):
@@ -34,9 +249,19 @@ class UploadViewSet(UpdateAPIView):
 
     def update(self, request: Request):
         accounts_file = request.data.get("accounts_file", None) # type: ignore
-        
+        options = UploadSerializer(partial=True, data=request.data)
+        options.is_valid(raise_exception=True)
+        background = options.validated_data.get("background", False) # type: ignore
+        mode = options.validated_data.get("mode", MERGE) # type: ignore
+        dry_run = options.validated_data.get("dry_run", False) # type: ignore
+        if background and (mode != MERGE or dry_run):
+            raise ValidationError("Background imports can only merge; replace and dry runs need a synchronous import.")
+
         try:
-            response = self.import_accounts(accounts_file)
+            if background:
+                response = self.enqueue_import(accounts_file)
+            else:
+                response = self.import_accounts(accounts_file, mode, dry_run)
         except Exception as e:
             response = Response(
                 f"Error while importing accounts: {e}",
@@ -46,53 +271,34 @@ class UploadViewSet(UpdateAPIView):
         return response
 
 
-    def import_accounts(self, file) -> Response:
-        if not isinstance(file, InMemoryUploadedFile):
+    def enqueue_import(self, file) -> Response:
+        if not isinstance(file, UploadedFile):
             return Response("No file chosen.", status=status.HTTP_400_BAD_REQUEST)
-        
-        SUPPORTED_FILE_FORMATS = UPLOADED_FILES["supported_formats"]
-
-        content_type = file.content_type
-        file = file.read().decode("utf-8")
-        io_file = io.StringIO(file) # type: ignore
-        accounts: list[dict] = []
-
-        if content_type == "text/csv":
-            accounts = [row for row in csv.DictReader(io_file)]
-        elif content_type == "application/json":
-            import json
-            accounts = json.load(io_file)
-        else:
-            return Response(
-                f"File format not supported. Supported formats are: {SUPPORTED_FILE_FORMATS}",
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
+
+        try:
+            job = create_import_job(file)
+        except ImportFileError as e:
+            return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+        submit_import_job(job)
+
+        return Response(
+            ImportJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": f"{self.request.path}{job.id}/"},
+        )
+
+    def import_accounts(self, file, mode: str, dry_run: bool) -> Response:
+        if not isinstance(file, UploadedFile):
+            return Response("No file chosen.", status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            db_accounts = [
-                Account(
-                    id=acc["id"],
-                    name=acc["name"],
-                    balance=acc["balance"],
-                )
-                for acc in accounts
-            ]
+            result = import_accounts(read_accounts(file, file.content_type), mode, dry_run)
+        except ImportFileError as e:
+            return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
         except KeyError:
             return Response(
-                f"Key error. Accounts keys must be {['id', 'name', 'balance']}",
+                f"Key error. Accounts keys must be {ACCOUNT_KEYS}",
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # merge or replace?
-        response_data = Account.objects.bulk_create(
-            db_accounts,
-            update_fields=["balance"],
-            update_conflicts=True,
-            unique_fields=["id"], # type: ignore
-        )
-        
-        return Response(
-            # f"{len(db_accounts)} Accounts imported successfully.",
-            [AccountSerializer(instance=acc).data for acc in response_data],
-            status=status.HTTP_200_OK
-        )
+
+        return Response(result, status=status.HTTP_200_OK)
@@ -0,0 +1,71 @@
+"""
+Latency of GET /accounts/<id>/transactions/ as the transactions table grows.
+
+Runs against a throwaway test database:
+
+    python -m benchmarks.account_history --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import statistics
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+import django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "account_transactions.settings")
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    from accounts.models import Account, Transaction
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    accounts = Account.objects.bulk_create(Account(name=f"Account {i}", balance=0) for i in range(args.accounts))
+    client = APIClient()
+    seeded = 0
+
+    print(f"{'transactions':>12} {'direction':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for size in sorted(args.sizes):
+        Transaction.objects.bulk_create(
+            (
+                Transaction(
+                    id=uuid4(),
+                    src_account=accounts[i % len(accounts)],
+                    dest_account=accounts[(i * 7 + 1) % len(accounts)],
+                    amount=Decimal(1),
+                )
+                for i in range(seeded, size)
+            ),
+            batch_size=5000,
+        )
+        seeded = size
+
+        for direction in ("in", "out", "all"):
+            latencies = []
+            for i in range(args.requests):
+                account = accounts[i % len(accounts)]
+                start = time.perf_counter()
+                response = client.get(f"/accounts/{account.id}/transactions/", {"direction": direction, "count": "false"})
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            print(f"{size:>12} {direction:>9} {statistics.median(latencies):>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Throughput and latency of concurrent POST /accounts/transfer/ requests, committed one
+by one and with group commit at several maximum waits.
+
+Each thread posts transfers between random accounts through the test client. Runs
+against a throwaway test database (a temporary file when the database is SQLite, so
+threads can share it); pick the SQLite profile with DATABASE_PROFILE:
+
+    python -m benchmarks.group_commit --threads 16 --waits 0.001 0.002 0.005
+
+Requests that fail (e.g. "database is locked" once the busy timeout runs out) are
+counted as errors rather than retried.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+import django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--transfers", type=int, default=100, help="transfers per thread")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--waits", type=float, nargs="+", default=[0.001, 0.002, 0.005], help="group commit max waits (s)")
+    parser.add_argument("--max-size", type=int, default=200, help="group commit max size")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "account_transactions.settings")
+    django.setup()
+
+    from django.db import connection, connections
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    from account_transactions.settings import TRANSFERS
+    from accounts.models import Account
+
+    setup_test_environment()
+    if connection.vendor == "sqlite":
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "group_commit.sqlite3")
+    connection.creation.create_test_db(verbosity=0)
+
+    accounts = [
+        str(account.pk)
+        for account in Account.objects.bulk_create(
+            Account(name=f"Account {i}", balance=Decimal(1_000_000)) for i in range(args.accounts)
+        )
+    ]
+    # the main thread's connection would hold the database file open in a transaction otherwise
+    connection.close()
+
+    def worker(seed: int, latencies: list[float], errors: list[int]):
+        client = APIClient()
+        rng = random.Random(seed)
+        try:
+            for _ in range(args.transfers):
+                src, dest = rng.sample(accounts, 2)
+                start = time.perf_counter()
+                try:
+                    response = client.post("/accounts/transfer/", {"src_account": src, "dest_account": dest, "amount": 1})
+                    ok = response.status_code == 201
+                except Exception:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors[0] += 1
+        finally:
+            connections.close_all()
+
+    TRANSFERS["group_commit_max_size"] = args.max_size
+    print(f"{'mode':>18} {'transfers/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for wait in [None, *args.waits]:
+        TRANSFERS["group_commit"] = wait is not None
+        TRANSFERS["group_commit_max_wait"] = wait or 0
+        latencies = [[] for _ in range(args.threads)]
+        errors = [[0] for _ in range(args.threads)]
+        threads = [threading.Thread(target=worker, args=(i, latencies[i], errors[i])) for i in range(args.threads)]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        all_latencies = sorted(latency for thread_latencies in latencies for latency in thread_latencies)
+        mode = "one commit each" if wait is None else f"group, {wait * 1000:g} ms"
+        print(
+            f"{mode:>18} {len(all_latencies) / elapsed:>12.0f} "
+            f"{statistics.median(all_latencies) * 1000:>8.2f} "
+            f"{all_latencies[max(0, int(len(all_latencies) * 0.99) - 1)] * 1000:>8.2f} "
+            f"{sum(e[0] for e in errors):>7}"
+        )
+
+    connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
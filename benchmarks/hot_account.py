@@ -0,0 +1,89 @@
+"""
+Throughput of concurrent transfers into one hot account as its number of buckets grows.
+
+Each thread moves money from its own source account into the same destination, so
+the destination is the only contended row. Runs against a throwaway test database
+(a temporary file when the database is SQLite, so threads can share it):
+
+    python -m benchmarks.hot_account --buckets 0 1 4 16 --threads 8
+
+SQLite serializes all writers on a database-wide lock, so buckets can't raise its
+throughput and their extra writes lower it (the output says so); run it against a
+server database to see the row-lock ceiling lift.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+import django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--buckets", type=int, nargs="+", default=[0, 1, 4, 16])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--transfers", type=int, default=200, help="transfers per thread")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "account_transactions.settings")
+    django.setup()
+
+    from django.db import OperationalError, connection, connections
+    from django.test.utils import setup_test_environment
+
+    from accounts.buckets import set_buckets
+    from accounts.models import Account, Transaction
+    from accounts.transfers import execute_transfer
+
+    setup_test_environment()
+    if connection.vendor == "sqlite":
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "hot_account.sqlite3")
+    connection.creation.create_test_db(verbosity=0)
+
+    hot = Account.objects.create(name="hot", balance=0)
+    sources = Account.objects.bulk_create(
+        Account(name=f"Source {i}", balance=Decimal(args.transfers)) for i in range(args.threads)
+    )
+
+    def worker(source: Account, retries: list[int]):
+        try:
+            for _ in range(args.transfers):
+                while True:
+                    try:
+                        execute_transfer(Transaction(src_account=source, dest_account=hot, amount=Decimal(1)))
+                        break
+                    except OperationalError:
+                        retries[0] += 1
+        finally:
+            connections.close_all()
+
+    if connection.vendor == "sqlite":
+        print(
+            "SQLite serializes all writers, so buckets only add work here: expect throughput to drop"
+            " as they grow. Run against PostgreSQL to see them scale."
+        )
+    print(f"{'buckets':>7} {'threads':>7} {'transfers/s':>12} {'retries':>8}")
+    for buckets in args.buckets:
+        set_buckets(hot.id, buckets)
+        Account.objects.filter(pk__in=[s.pk for s in sources]).update(balance=Decimal(args.transfers))
+        retries = [[0] for _ in sources]
+        threads = [threading.Thread(target=worker, args=(s, r)) for s, r in zip(sources, retries)]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        total = args.threads * args.transfers
+        print(f"{buckets:>7} {args.threads:>7} {total / elapsed:>12.0f} {sum(r[0] for r in retries):>8}")
+
+    connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
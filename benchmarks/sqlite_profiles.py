@@ -0,0 +1,130 @@
+"""
+Transfer throughput and error rate of each SQLite profile under concurrent load.
+
+Writer threads post transfers between a few shared accounts through the API while
+reader threads list transactions, against a throwaway file database per profile:
+
+    python -m benchmarks.sqlite_profiles --profiles default production --writers 8 --readers 4 --idempotency-keys
+
+Each profile runs in its own process, since the database settings are read once at startup.
+"""
+import argparse
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+import django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", nargs="+", default=["default", "production"])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--transfers", type=int, default=100, help="transfers per writer")
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument(
+        "--idempotency-keys", action="store_true",
+        help="send an Idempotency-Key, which reads before writing inside the transaction",
+    )
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args)
+        return
+
+    print(f"{'profile':>10} {'transfers/s':>12} {'errors':>7} {'error %':>8} {'reads/s':>8}")
+    for profile in args.profiles:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.sqlite_profiles", *sys.argv[1:], "--run", profile],
+            env={**os.environ, "DATABASE_PROFILE": profile},
+            check=True,
+        )
+
+
+def run(args):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "account_transactions.settings")
+    django.setup()
+
+    from django.db import DatabaseError, connection, connections
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    from accounts.models import Account
+
+    setup_test_environment()
+    # failed requests are counted, not logged
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "profile.sqlite3")
+    connection.creation.create_test_db(verbosity=0)
+
+    accounts = [
+        str(account.pk) for account in Account.objects.bulk_create(
+            Account(name=f"Account {i}", balance=Decimal(1_000_000)) for i in range(args.accounts)
+        )
+    ]
+    ok, errors, reads = [0] * args.writers, [0] * args.writers, [0] * args.readers
+    done = threading.Event()
+
+    def writer(n: int):
+        client = APIClient()
+        try:
+            for _ in range(args.transfers):
+                src, dest = random.sample(accounts, 2)
+                headers = {"HTTP_IDEMPOTENCY_KEY": str(uuid4())} if args.idempotency_keys else {}
+                try:
+                    response = client.post(
+                        "/accounts/transfer/", {"src_account": src, "dest_account": dest, "amount": 1}, **headers
+                    )
+                    if response.status_code == 201:
+                        ok[n] += 1
+                    else:
+                        errors[n] += 1
+                except DatabaseError:
+                    errors[n] += 1
+        finally:
+            connections.close_all()
+
+    def reader(n: int):
+        client = APIClient()
+        try:
+            while not done.is_set():
+                try:
+                    client.get("/accounts/transfer/", {"count": "false"})
+                    reads[n] += 1
+                except DatabaseError:
+                    pass
+        finally:
+            connections.close_all()
+
+    writers = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    readers = [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    start = time.perf_counter()
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    attempted = args.writers * args.transfers
+    print(
+        f"{args.run:>10} {sum(ok) / elapsed:>12.0f} {sum(errors):>7} "
+        f"{100 * sum(errors) / attempted:>8.1f} {sum(reads) / elapsed:>8.0f}",
+        flush=True,
+    )
+    connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Benchmarks of the API's hot paths, run by `python manage.py bench`.
+
+Each benchmark seeds the database it runs against, then times individual requests
+through the test client and counts their queries. Random choices are seeded, so
+query counts repeat exactly from run to run and can be compared against a saved
+baseline along with the timings.
+"""
+import csv
+import io
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from typing import Callable
+from uuid import UUID, uuid4
+
+import tablib
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from account_transactions.settings import UPLOADED_FILES
+from accounts.admin import AccountResource
+from accounts.imports import ODS, XLSX, batched, validate_accounts
+from accounts.models import CENT, Account, Transaction
+
+
+@dataclass
+class Result:
+    name: str
+    operations: int
+    # units (requests, transfers or rows) per second
+    throughput: float
+    unit: str
+    p50_ms: float
+    p99_ms: float
+    # per operation
+    queries: float
+    # largest Python allocation during one more, traced, call; only measured where memory is the point
+    peak_mib: float | None = None
+
+
+@dataclass
+class Options:
+    iterations: int = 200
+    # rows per import benchmark, one benchmark per size
+    import_sizes: tuple[int, ...] = (10_000,)
+    # rows seeded for the list and detail benchmarks
+    table_size: int = 10_000
+    batch_size: int = 100
+
+
+BENCHMARKS: dict[str, Callable[[Options], list[Result]]] = {}
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def run_benchmarks(names: list[str], options: Options) -> list[Result]:
+    results = []
+    for name in names:
+        results.extend(BENCHMARKS[name](options))
+        # every benchmark starts from an empty database
+        call_command("flush", interactive=False, verbosity=0)
+    return results
+
+
+def measure(name: str, operation: Callable[[int], object], iterations: int, units: int = 1, unit: str = "requests") -> Result:
+    """Call `operation(i)` `iterations` times, timing each call and counting its queries."""
+    latencies = []
+    queries = 0
+    for i in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            operation(i)
+            latencies.append(time.perf_counter() - start)
+        queries += len(captured)
+
+    latencies.sort()
+    return Result(
+        name=name,
+        operations=iterations,
+        throughput=round(iterations * units / sum(latencies), 1),
+        unit=unit,
+        p50_ms=round(statistics.median(latencies) * 1000, 3),
+        p99_ms=round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 3),
+        queries=round(queries / iterations, 2),
+    )
+
+
+def measure_peak_memory(result: Result, operation: Callable[[int], object]) -> Result:
+    """
+    Set `result.peak_mib` from one more call of `operation`, traced by tracemalloc.
+
+    Tracing slows every allocation down, so it gets a run of its own. C buffers
+    (e.g. of XML parsers) aren't traced.
+    """
+    tracemalloc.start()
+    try:
+        operation(result.operations)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    result.peak_mib = round(peak / 2**20, 1)
+    return result
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """
+    Regressions of `results` against `baseline`.
+
+    Latency, throughput and peak memory may vary by `threshold` (a fraction) before
+    counting as a regression. Query counts are deterministic, so any increase is one.
+    """
+    previous = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        name = result["name"]
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: {result['queries']} queries per operation, was {before['queries']}")
+        for key in ("p50_ms", "p99_ms"):
+            if result[key] > before[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {result[key]}, was {before[key]}")
+        if result["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(f"{name}: {result['throughput']} {result['unit']}/s, was {before['throughput']}")
+        if result.get("peak_mib") and before.get("peak_mib") and result["peak_mib"] > before["peak_mib"] * (1 + threshold):
+            regressions.append(f"{name}: peak {result['peak_mib']} MiB, was {before['peak_mib']}")
+    return regressions
+
+
+def to_json(results: list[Result]) -> str:
+    return json.dumps([asdict(result) for result in results], indent=2)
+
+
+def _accounts(n: int, balance: Decimal = Decimal(1_000_000)) -> list[Account]:
+    return Account.objects.bulk_create(
+        (Account(name=f"Account {i}", balance=balance) for i in range(n)), batch_size=5000
+    )
+
+
+def _ok(response, status: int = 200):
+    assert response.status_code == status, (response.status_code, getattr(response, "data", None))
+    return response
+
+
+@benchmark("transfer")
+def transfer(options: Options) -> list[Result]:
+    accounts = [str(account.pk) for account in _accounts(100)]
+    client = APIClient()
+    rng = random.Random(0)
+
+    def post(i):
+        src, dest = rng.sample(accounts, 2)
+        _ok(client.post("/accounts/transfer/", {"src_account": src, "dest_account": dest, "amount": 1}), 201)
+
+    return [measure("transfer", post, options.iterations)]
+
+
+@benchmark("batch_transfer")
+def batch_transfer(options: Options) -> list[Result]:
+    accounts = [str(account.pk) for account in _accounts(1000)]
+    client = APIClient()
+    rng = random.Random(0)
+
+    def post(i):
+        transfers = [
+            dict(zip(("src_account", "dest_account"), rng.sample(accounts, 2)), amount=1)
+            for _ in range(options.batch_size)
+        ]
+        _ok(client.post("/accounts/transfer/batch/", {"transfers": transfers}, format="json"), 201)
+
+    iterations = max(1, options.iterations // 10)
+    return [measure("batch_transfer", post, iterations, units=options.batch_size, unit="transfers")]
+
+
+@benchmark("account_create")
+def account_create(options: Options) -> list[Result]:
+    client = APIClient()
+
+    def post_one(i):
+        _ok(client.post("/accounts/", {"name": f"Account {i}", "balance": "10.00"}, format="json"), 201)
+
+    def post_batch(i):
+        accounts = [{"name": f"Account {i}.{j}", "balance": "10.00"} for j in range(options.batch_size)]
+        _ok(client.post("/accounts/", accounts, format="json"), 201)
+
+    iterations = max(1, options.iterations // 10)
+    return [
+        measure("account_create", post_one, options.iterations, unit="accounts"),
+        measure(f"account_create_bulk[{options.batch_size}]", post_batch, iterations, units=options.batch_size, unit="accounts"),
+    ]
+
+
+@benchmark("import")
+def import_accounts(options: Options) -> list[Result]:
+    client = APIClient()
+    results = []
+    for size in options.import_sizes:
+        for content_type, render in (("text/csv", _csv_file), ("application/json", _json_file)):
+            # the first run inserts the accounts, the others update them
+            content = render([{"id": str(uuid4()), "name": f"Account {i}", "balance": "10.00"} for i in range(size)])
+
+            def put(i):
+                file = SimpleUploadedFile("accounts", content, content_type=content_type)
+                _ok(client.put("/accounts/import/", {"accounts_file": file}))
+
+            fmt = content_type.split("/")[1]
+            results.append(measure(f"import_{fmt}[{size}]", put, 3, units=size, unit="rows"))
+    return results
+
+
+@benchmark("validate")
+def validate(options: Options) -> list[Result]:
+    """
+    Import row validation alone, in import-sized batches, next to a plain loop that
+    parses each row's id and balance in turn: the column checks should be no slower.
+    """
+    results = []
+    for size in options.import_sizes:
+        rows = [{"id": str(uuid4()), "name": f"Account {i}", "balance": "10.00"} for i in range(size)]
+        batches = list(batched(rows, UPLOADED_FILES["batch_size"]))
+        for name, check in (("validate_accounts", validate_accounts), ("validate_per_row", _validate_per_row)):
+            def run(i, check=check):
+                for batch in batches:
+                    check(batch)
+
+            results.append(measure(f"{name}[{size}]", run, 3, units=size, unit="rows"))
+    return results
+
+
+def _validate_per_row(rows: list[dict]) -> list[tuple]:
+    valid, seen = [], set()
+    for row in rows:
+        pk, balance = UUID(row["id"]), Decimal(row["balance"])
+        if pk not in seen and 0 < len(row["name"]) and 0 <= balance and balance == balance.quantize(CENT):
+            seen.add(pk)
+            valid.append((pk, row["name"], balance))
+    return valid
+
+
+@benchmark("spreadsheet_import")
+def spreadsheet_import(options: Options) -> list[Result]:
+    """
+    XLSX and ODS imports through the API (streamed, batched upserts), and XLSX through
+    the admin's django-import-export path, which loads the whole sheet and saves the
+    rows one by one (tablib can't load ODS). Both report their peak memory.
+    """
+    client = APIClient()
+    results = []
+    for size in options.import_sizes:
+        dataset = tablib.Dataset(headers=["id", "name", "balance"])
+        for i in range(size):
+            dataset.append([str(uuid4()), f"Account {i}", i % 100_000 + 0.25])
+        files = {fmt: dataset.export(fmt) for fmt in ("xlsx", "ods")}
+        del dataset
+
+        for fmt, content_type in (("xlsx", XLSX), ("ods", ODS)):
+            def put(i, content=files[fmt], fmt=fmt, content_type=content_type):
+                file = SimpleUploadedFile(f"accounts.{fmt}", content, content_type=content_type)
+                _ok(client.put("/accounts/import/", {"accounts_file": file}))
+
+            results.append(measure_peak_memory(measure(f"import_{fmt}[{size}]", put, 3, units=size, unit="rows"), put))
+
+        def admin_import(i):
+            result = AccountResource().import_data(tablib.Dataset().load(files["xlsx"], format="xlsx"), raise_errors=True)
+            assert not result.has_errors()
+
+        # far slower, and each run after the first updates the same accounts
+        result = measure(f"admin_import_xlsx[{size}]", admin_import, 1, units=size, unit="rows")
+        results.append(measure_peak_memory(result, admin_import))
+    return results
+
+
+def _csv_file(rows: list[dict]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["id", "name", "balance"])
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _json_file(rows: list[dict]) -> bytes:
+    return json.dumps(rows).encode()
+
+
+@benchmark("list")
+def list_pages(options: Options) -> list[Result]:
+    accounts = _accounts(options.table_size)
+    Transaction.objects.bulk_create(
+        (
+            Transaction(src_account=accounts[i % len(accounts)], dest_account=accounts[(i + 1) % len(accounts)], amount=1)
+            for i in range(options.table_size)
+        ),
+        batch_size=5000,
+    )
+    client = APIClient()
+    pages = max(2, options.table_size // 5)
+
+    def account_page(i):
+        # offset pagination, spread over the deep half of the table
+        _ok(client.get("/accounts/", {"page": pages // 2 + i % (pages // 2)}))
+
+    cursor = {"url": "/accounts/transfer/?count=false&page_size=5"}
+
+    def transfer_page(i):
+        # keyset pagination, following `next` one page deeper each time
+        response = _ok(client.get(cursor["url"]))
+        cursor["url"] = response.data["next"] or "/accounts/transfer/?count=false&page_size=5"
+
+    return [
+        measure("account_list_deep", account_page, options.iterations),
+        measure("transfer_list_deep", transfer_page, options.iterations),
+    ]
+
+
+@benchmark("detail")
+def detail(options: Options) -> list[Result]:
+    accounts = [str(account.pk) for account in _accounts(options.table_size)]
+    client = APIClient()
+    cache.clear()
+
+    def get(i):
+        # cache misses until every account has been read once
+        _ok(client.get(f"/accounts/{accounts[i % len(accounts)]}/"))
+
+    return [measure("account_detail", get, options.iterations)]
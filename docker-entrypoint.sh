@@ -3,6 +3,9 @@
 python manage.py makemigrations
 python manage.py migrate
 
+# background import jobs left behind by the previous run
+python manage.py recover_import_jobs &
+
 # python manage.py createsuperuser
 
 python manage.py runserver 0.0.0.0:8000